@@ -0,0 +1,367 @@
+"""
+GVDB 演員名稱模糊比對（程序內索引）
+
+對 actors.actor_tag 與 stage_names.stage_name 建立記憶體索引，供 /api/actors/suggestions
+與 /api/actors/search 自動補齊使用，拼錯或寫法略有不同的名稱也能找到：
+
+- 名稱正規化：NFKC、不分大小寫、去除空白與標點（'Kenta_Sato' 與 'kenta sato' 相同）
+- 前綴：排序後的名稱清單以二分搜尋取出
+- 模糊：三字元組（trigram，前後補空白，與 pg_trgm 相同）倒排索引取出候選，
+  再以 trigram 相似度與編輯距離評分
+- 排序：完全相符 > 前綴 > 包含 > 模糊，同級再依相似度（取到 0.1）與演員作品數
+
+啟動預熱時載入；add_actor / update_actor 後只重新載入該演員，
+其他 worker 的變更最晚在 ACTOR_MATCHER_RELOAD_INTERVAL 秒後的全量重新載入時生效。
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from itertools import chain
+
+from config import ACTOR_MATCHER_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_MATCHER_SQL = """
+    SELECT a.id AS actor_id, a.actor_tag, sn.id AS stage_name_id, sn.stage_name, s.name AS studio_name,
+           COALESCE(c.production_count, 0) AS production_count
+    FROM actors a
+    LEFT JOIN stage_names sn ON sn.actor_id = a.id
+    LEFT JOIN studios s ON s.id = sn.studio_id
+    LEFT JOIN (
+        SELECT sn.actor_id, COUNT(DISTINCT perf.production_id) AS production_count
+        FROM performances perf
+        JOIN stage_names sn ON sn.id = perf.stage_name_id
+        {count_filter}
+        GROUP BY sn.actor_id
+    ) c ON c.actor_id = a.id
+    {actor_filter}
+"""
+
+MATCHER_SQL = _MATCHER_SQL.format(count_filter='', actor_filter='')
+
+MATCHER_ACTORS_SQL = _MATCHER_SQL.format(
+    count_filter='WHERE sn.actor_id = ANY(%(ids)s)',
+    actor_filter='WHERE a.id = ANY(%(ids)s)',
+)
+
+# 比對等級
+EXACT, PREFIX, CONTAINS, FUZZY = 3, 2, 1, 0
+
+# 模糊比對的最低相似度，與每次查詢評分的候選數上限
+MIN_SIMILARITY = 0.45
+MAX_FUZZY_CANDIDATES = 64
+
+# 自動補齊會反覆送出相同的開頭（尤其是一、兩個字），保留最近的比對結果
+MATCH_CACHE_SIZE = 4096
+
+
+def normalize(text):
+    """NFKC、不分大小寫，只保留文字與數字"""
+    return ''.join(ch for ch in unicodedata.normalize('NFKC', text or '').casefold() if ch.isalnum())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein 距離；超過 limit 時提早回傳 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _similarity(query, query_gram_count, name, name_gram_count, shared):
+    """trigram 相似度；不夠高時再以編輯距離（整個名稱或同長度的開頭）補算，取較高者"""
+    score = shared / (query_gram_count + name_gram_count - shared)
+    if score >= 0.7:
+        return score
+    limit = max(1, len(query) // 3)
+    distance = edit_distance(query, name[:len(query)], limit)
+    if len(name) != len(query) and distance > 0:
+        distance = min(distance, edit_distance(query, name, limit))
+    if distance <= limit:
+        score = max(score, 1 - distance / len(query))
+    return score
+
+
+class _Index:
+    """名稱項目：(正規化名稱, actor_id, stage_name_id)；actor_tag 的 stage_name_id 為 None"""
+
+    def __init__(self):
+        self.names = []         # entry_id -> (name, actor_id, stage_name_id)，刪除後為 None
+        self.sorted = []        # [(name, entry_id)]，前綴查詢用
+        self.grams = {}         # trigram -> {entry_id}
+        self.chars = {}         # 單一字元 -> {entry_id}（一、兩個字的查詢）
+        self.gram_counts = []   # entry_id -> trigram 數
+        self.popularity = []    # entry_id -> 演員作品數（候選數過多時優先評分作品多的演員）
+        self.actors = {}        # actor_id -> {'actor_id', 'actor_tag', 'production_count', 'entries', 'stage_names'}
+        self._bulk = False
+        self.cache = OrderedDict()  # (query, limit) -> match 結果；索引變動時清空
+
+    def build(self, rows):
+        """全量建立：名稱清單最後一次排序"""
+        self._bulk = True
+        self.add_rows(rows)
+        self._bulk = False
+        self.cache = OrderedDict()  # (query, limit) -> match 結果；索引變動時清空
+        self.sorted.sort()
+
+    def add_rows(self, rows):
+        self.cache.clear()
+        for actor_id, actor_tag, stage_name_id, stage_name, studio_name, production_count in rows:
+            actor = self.actors.get(actor_id)
+            if actor is None:
+                actor = self.actors[actor_id] = {
+                    'actor_id': actor_id, 'actor_tag': actor_tag, 'production_count': production_count,
+                    'entries': [], 'stage_names': [],
+                }
+                self._add_entry(actor, actor_tag, actor_id, None)
+            if stage_name_id is not None:
+                actor['stage_names'].append((stage_name_id, stage_name, studio_name))
+                self._add_entry(actor, stage_name, actor_id, stage_name_id)
+
+    def _add_entry(self, actor, text, actor_id, stage_name_id):
+        name = normalize(text)
+        if not name:
+            return
+        entry_id = len(self.names)
+        self.names.append((name, actor_id, stage_name_id))
+        if self._bulk:
+            self.sorted.append((name, entry_id))
+        else:
+            bisect.insort(self.sorted, (name, entry_id))
+        grams = trigrams(name)
+        self.gram_counts.append(len(grams))
+        self.popularity.append(actor['production_count'])
+        for gram in grams:
+            self.grams.setdefault(gram, set()).add(entry_id)
+        for ch in set(name):
+            self.chars.setdefault(ch, set()).add(entry_id)
+        actor['entries'].append(entry_id)
+
+    def remove_actor(self, actor_id):
+        actor = self.actors.pop(actor_id, None)
+        if actor is None:
+            return
+        self.cache.clear()
+        for entry_id in actor['entries']:
+            name = self.names[entry_id][0]
+            i = bisect.bisect_left(self.sorted, (name, entry_id))
+            del self.sorted[i]
+            for gram in trigrams(name):
+                self.grams[gram].discard(entry_id)
+            for ch in set(name):
+                self.chars[ch].discard(entry_id)
+            self.names[entry_id] = None
+
+    def match(self, query, limit):
+        """回傳 {entry_id: (等級, 相似度)}，各類最多取 limit * 4 筆（供呼叫端依演員合併後截斷）"""
+        key = (query, limit)
+        matches = self.cache.get(key)
+        if matches is None:
+            matches = self.cache[key] = self._match(query, limit)
+            if len(self.cache) > MATCH_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return matches
+
+    def _match(self, query, limit):
+        matches = {}
+        want = limit * 4
+        popularity = self.popularity
+
+        # 前綴（包含完全相符）：名稱清單中連續的一段，取作品數最多的
+        lo = bisect.bisect_left(self.sorted, (query,))
+        hi = bisect.bisect_left(self.sorted, (query + '\U0010ffff',))
+        prefixed = [entry_id for _, entry_id in self.sorted[lo:hi]]
+        for entry_id in heapq.nlargest(want, prefixed, key=popularity.__getitem__):
+            matches[entry_id] = (EXACT if self.names[entry_id][0] == query else PREFIX, 1.0)
+
+        # 一、兩個字的查詢只找包含查詢字串的名稱（不做模糊比對）
+        if len(query) <= 2:
+            postings = [self.chars.get(ch, set()) for ch in query]
+            contains = set.intersection(*postings) if len(postings) > 1 else postings[0]
+            if len(query) > 1:
+                contains = [entry_id for entry_id in contains if query in self.names[entry_id][0]]
+            for entry_id in heapq.nlargest(want, contains, key=popularity.__getitem__):
+                matches.setdefault(entry_id, (CONTAINS, 1.0))
+            return matches
+
+        # trigram 候選：相似的名稱至少共用一半的 trigram，因此只需掃描最少見的
+        # (n - needed + 1) 個 trigram 的倒排清單，其餘 trigram 只檢查候選是否包含
+        query_grams = sorted(trigrams(query), key=lambda gram: len(self.grams.get(gram, ())))
+        needed = max(1, len(query_grams) // 2)
+        scanned = len(query_grams) - needed + 1
+        shared = Counter(chain.from_iterable(self.grams.get(gram, ()) for gram in query_grams[:scanned]))
+        for gram in query_grams[scanned:]:
+            posting = self.grams.get(gram)
+            if posting:
+                shared.update(shared.keys() & posting)
+
+        candidates = [entry_id for entry_id, count in shared.items() if count >= needed and entry_id not in matches]
+        if len(candidates) > MAX_FUZZY_CANDIDATES:
+            candidates = heapq.nlargest(MAX_FUZZY_CANDIDATES, candidates,
+                                        key=lambda entry_id: (shared[entry_id], popularity[entry_id]))
+        for entry_id in candidates:
+            name = self.names[entry_id][0]
+            if query in name:
+                matches[entry_id] = (CONTAINS, 1.0)
+                continue
+            score = _similarity(query, len(query_grams), name, self.gram_counts[entry_id], shared[entry_id])
+            if score >= MIN_SIMILARITY:
+                matches[entry_id] = (FUZZY, score)
+        return matches
+
+
+class ActorMatcher:
+    def __init__(self, connect, reload_interval=ACTOR_MATCHER_RELOAD_INTERVAL):
+        self._connect = connect
+        self.reload_interval = reload_interval
+        self._index = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = threading.Lock()
+
+    # ==================== 載入與更新 ====================
+
+    def load(self, conn):
+        """全量載入（在新的索引上建立，完成後再替換）"""
+        cur = conn.cursor()
+        cur.execute(MATCHER_SQL)
+        rows = cur.fetchall()
+        cur.close()
+        index = _Index()
+        index.build(rows)
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+        logger.info('演員名稱索引已載入：%d 位演員、%d 個名稱', len(index.actors), len(index.sorted))
+
+    def refresh(self, conn, actor_ids):
+        """寫入後重新載入指定演員（conn 需看得到剛提交的資料）；失敗時下次查詢改為全量重新載入"""
+        if self._index is None:
+            return
+        cur = conn.cursor()
+        try:
+            cur.execute(MATCHER_ACTORS_SQL, {'ids': list(actor_ids)})
+            rows = cur.fetchall()
+        except Exception:
+            logger.exception('演員名稱索引更新失敗：%s', actor_ids)
+            conn.rollback()
+            self._loaded_at = 0.0
+            return
+        finally:
+            cur.close()
+        with self._lock:
+            for actor_id in actor_ids:
+                self._index.remove_actor(actor_id)
+            self._index.add_rows(rows)
+
+    def _maybe_reload(self):
+        """超過重新載入間隔（或尚未載入）時在背景執行緒全量載入"""
+        if self._index is not None and time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        if not self._reloading.acquire(blocking=False):
+            return
+        threading.Thread(target=self._reload, name='actor-matcher-reload', daemon=True).start()
+
+    def _reload(self):
+        conn = None
+        try:
+            conn = self._connect()
+            self.load(conn)
+        except Exception:
+            logger.exception('演員名稱索引載入失敗')
+        finally:
+            if conn is not None:
+                conn.close()
+            self._reloading.release()
+
+    # ==================== 查詢 ====================
+
+    def _ranked(self, query, limit):
+        """回傳依排名排序的 [(actor, stage_name_id 或 None)]；索引尚未載入時回傳 None"""
+        self._maybe_reload()
+        query = normalize(query)
+        with self._lock:
+            index = self._index
+            if index is None:
+                return None
+            if not query:
+                return []
+            matches = index.match(query, limit)
+            ranked = []
+            for entry_id, (level, score) in matches.items():
+                _, actor_id, stage_name_id = index.names[entry_id]
+                actor = index.actors[actor_id]
+                ranked.append(((-level, -round(score, 1), -actor['production_count'], actor['actor_tag']),
+                               actor, stage_name_id))
+        ranked.sort(key=lambda item: item[0])
+        return [(actor, stage_name_id) for _, actor, stage_name_id in ranked]
+
+    def suggestions(self, query, limit=10):
+        """
+        演員建議（格式同 ACTOR_SUGGESTIONS_SQL）：每位演員一筆，排除 STUDIO_ 自動生成的演員
+        索引尚未載入時回傳 None
+        """
+        ranked = self._ranked(query, limit)
+        if ranked is None:
+            return None
+        results = []
+        seen = set()
+        for actor, _ in ranked:
+            if actor['actor_id'] in seen or actor['actor_tag'].startswith('STUDIO_'):
+                continue
+            seen.add(actor['actor_id'])
+            results.append({
+                'actor_id': actor['actor_id'],
+                'actor_tag': actor['actor_tag'],
+                'stage_names': sorted({name for _, name, _ in actor['stage_names']}),
+                'studios': sorted({studio for _, _, studio in actor['stage_names'] if studio}),
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+    def search(self, query, limit=20):
+        """
+        藝名搜尋（格式同 ACTOR_SEARCH_SQL）：每個藝名一筆，actor_tag 相符時列出該演員所有藝名
+        索引尚未載入時回傳 None
+        """
+        ranked = self._ranked(query, limit)
+        if ranked is None:
+            return None
+        results = []
+        seen = set()
+        for actor, stage_name_id in ranked:
+            for sn_id, stage_name, studio_name in actor['stage_names']:
+                if sn_id in seen or (stage_name_id is not None and sn_id != stage_name_id):
+                    continue
+                seen.add(sn_id)
+                results.append({
+                    'actor_id': actor['actor_id'],
+                    'stage_name_id': sn_id,
+                    'stage_name': stage_name,
+                    'actor_name': actor['actor_tag'],
+                    'studio_name': studio_name,
+                })
+            if len(results) >= limit:
+                break
+        return results[:limit]
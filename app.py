@@ -2,40 +2,351 @@
 GVDB 資料庫管理系統 - Flask 應用程式
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+import io
+import logging
+import re
+import threading
+import time
+from functools import wraps
+from urllib.parse import unquote_to_bytes
+
+from flask import (
+    Flask, render_template, request, jsonify, redirect, url_for, flash, make_response, g, has_request_context,
+)
+from werkzeug.exceptions import HTTPException
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG, SECRET_KEY, DEBUG
+from config import (
+    SECRET_KEY, DEBUG, REFERENCE_CACHE_TTL, SERVER_TIMING, QUERY_BUDGET,
+    READ_YOUR_WRITES_SECONDS, RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_VERSION_INTERVAL, SIMILAR_TOP_K,
+    SSE_MAX_CLIENTS, SSE_HEARTBEAT_INTERVAL,
+)
+import db
+import metrics
+import similarity
+import slow_query_log
+from actor_matcher import ActorMatcher
+from live_updates import ChangeFeed, notify_change
+import jobs
+from duplicates import (
+    DUPLICATE_COUNTS_SQL, DUPLICATE_PRODUCTIONS_SQL, DUPLICATE_ACTORS_SQL, REVIEW_DUPLICATE_SQL,
+    KINDS as DUPLICATE_KINDS, STATUSES as DUPLICATE_STATUSES,
+)
+from result_cache import ResultCache
+from responses import FastJSONProvider, compress_response
+from queries import (
+    STUDIO_LIST_SQL, ALL_TAGS_SQL, WARMUP_SQL, DATA_VERSION_SQL, BUMP_DATA_VERSION_SQL,
+    ALBUM_ACTORS_SQL, PRODUCTION_ACTORS_SQL, SEGMENTS_SQL, SEGMENTS_JSON_SQL, PAGE_SEGMENTS_SQL,
+    ALBUM_HIDDEN_NAMES, PRODUCTION_HIDDEN_NAMES,
+    ACTOR_SEARCH_SQL, ACTOR_SUGGESTIONS_SQL, ACTOR_SORT_OPTIONS,
+    ACTOR_BASIC_SQL, ACTOR_GLOBAL_STATS_SQL, ACTOR_LATEST_PRODUCTION_SQL, ACTOR_STUDIO_DETAILS_SQL,
+    PRODUCTION_SQL, PARENT_ALBUM_SQL, PRODUCTION_PERFORMERS_SQL, PRODUCTION_TAGS_SQL,
+    COSTARS_SQL, COSTAR_NEIGHBORS_SQL, COSTAR_LINKS_SQL, ACTOR_BRIEF_SQL, find_costar_path,
+    TIMELINE_DIMENSIONS, TIMELINE_GRANULARITIES, build_timeline_query, build_timeline,
+    build_filter_options, build_search_query, build_search_json_query, segments_json_params, db_json_requested,
+    count_query, facet_query, build_facets, group_segments, normalize_array_fields,
+    join_actor_names, build_actor_query, build_actor_result, build_production_result,
+    group_tags_by_category, paginate, make_etag, is_not_modified, search_cache_key, actor_cache_key,
+    RELEASE_DATE_PATTERN,
+)
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
 app.config['DEBUG'] = DEBUG
+app.json = FastJSONProvider(app)
 
-# ==================== 全域配置：標籤圖示和排序 ====================
-STYLE_ICONS = {
-    'BDSM': '🔒',
-    '工作/西裝': '🤵',
-    '按摩': '💆',
-    '軍警': '🪖',
-    '校園': '🎓',
-    '純愛': '❤️',
-    '迷藥': '💊',
-    '運動': '⚽'
-}
+# ==================== 資料庫連接 ====================
 
-STYLE_ORDER = ['BDSM', '工作/西裝', '按摩', '軍警', '校園', '純愛', '迷藥', '運動']
-BODY_TYPE_ORDER = ['大叔', '年輕', '熊', '壯碩', '肌肉', '精瘦', '纖瘦']
-SOURCE_ORDER = ['4horlover', 'igay69', 'javboys', 'poapan', 'notebook', 'ssd', 'pending', 'removed', 'unseen']
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
+# 最近寫入時間的 cookie：設定期間此客戶端的讀取走主庫，避免讀到 replica 尚未重播的舊資料
+WROTE_AT_COOKIE = 'gvdb_wrote_at'
+
+
+def recently_wrote():
+    """此客戶端是否在 READ_YOUR_WRITES_SECONDS 內寫入過"""
+    try:
+        wrote_at = float(request.cookies.get(WROTE_AT_COOKIE, 0))
+    except ValueError:
+        return False
+    return time.time() - wrote_at < READ_YOUR_WRITES_SECONDS
 
-# ==================== 資料庫連接 ====================
 
 def get_db_connection():
-    """建立資料庫連接"""
-    conn = psycopg2.connect(**DB_CONFIG)
+    """
+    從連線池取得資料庫連接（conn.close() 會歸還連線池）
+    唯讀請求（GET/HEAD）使用 replica；寫入請求與剛寫入過的客戶端使用主庫
+    /api/batch 的子請求共用批次請求的連線
+    """
+    if not has_request_context():
+        return db.get_connection()
+    shared = g.get('batch_connection')
+    if shared is not None:
+        return shared
+    if request.method in SAFE_METHODS and not recently_wrote():
+        conn = db.get_read_connection()
+    else:
+        conn = db.get_connection()
+    # 處理函式提早返回或拋出例外時，由 release_db_connections 歸還
+    g.setdefault('db_connections', []).append((conn, conn.lease))
     return conn
 
 
+@app.teardown_request
+def release_db_connections(exc):
+    """請求結束時歸還處理函式沒有 close() 的連線（未完成的交易由連線池回復）"""
+    for conn, lease in g.pop('db_connections', ()):
+        # 已歸還的連線可能被其他請求借走，只處理仍是這次借出的連線
+        if not conn.idle and conn.lease == lease:
+            conn.close()
+
+
+@app.after_request
+def remember_write(response):
+    """寫入成功後設定 cookie，讓此客戶端接下來的讀取走主庫"""
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        response.set_cookie(WROTE_AT_COOKIE, f'{time.time():.3f}',
+                            max_age=int(READ_YOUR_WRITES_SECONDS) + 1, httponly=True, samesite='Lax')
+    return response
+
+
+# ==================== 參考資料快取 ====================
+
+_reference_cache = {'data': None, 'loaded_at': 0.0}
+_reference_lock = threading.Lock()
+
+
+def get_reference_data():
+    """
+    取得公司清單與所有標籤（程序內快取）
+    回傳 {'studios': [{id, name}], 'tags': [{id, category, name}]}，依名稱/類別排序
+    """
+    data = _reference_cache['data']
+    if data is not None and time.monotonic() - _reference_cache['loaded_at'] < REFERENCE_CACHE_TTL:
+        return data
+
+    with _reference_lock:
+        data = _reference_cache['data']
+        if data is not None and time.monotonic() - _reference_cache['loaded_at'] < REFERENCE_CACHE_TTL:
+            return data
+
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(STUDIO_LIST_SQL)
+        studios = [dict(row) for row in cur.fetchall()]
+        cur.execute(ALL_TAGS_SQL)
+        tags = [dict(row) for row in cur.fetchall()]
+        cur.close()
+        conn.close()
+
+        data = {'studios': studios, 'tags': tags}
+        _reference_cache['data'] = data
+        _reference_cache['loaded_at'] = time.monotonic()
+        return data
+
+
+def invalidate_reference_data():
+    """新增公司後清除本程序的參考資料快取（其他 worker 於 REFERENCE_CACHE_TTL 內更新）"""
+    _reference_cache['data'] = None
+
+
+# ==================== 資料版本與條件式請求 ====================
+
+def get_data_version():
+    """取得目前的全域資料版本 (version, updated_at)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(DATA_VERSION_SQL)
+    version, updated_at = cur.fetchone()
+    cur.close()
+    conn.close()
+    return version, updated_at
+
+
+def bump_data_version(cur):
+    """寫入端點在 commit 前呼叫，使所有讀取 API 的 ETag 失效"""
+    cur.execute(BUMP_DATA_VERSION_SQL)
+
+
+def conditional_response(view):
+    """
+    讀取 API 裝飾器：回應附上 ETag / Last-Modified（取自全域資料版本），
+    客戶端帶 If-None-Match / If-Modified-Since 且資料未變時直接回傳 304，不執行查詢
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, last_modified = get_data_version()
+        etag = make_etag(version)
+
+        if is_not_modified(request, etag, last_modified):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        # 每次都要向伺服器驗證（304 幾乎沒有成本）
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+# ==================== 查詢結果快取 ====================
+
+# 只有本 Flask app 有結果快取；async_app.py 每次都查詢資料庫（仍有 ETag 條件式回應）
+result_cache = ResultCache(
+    RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_VERSION_INTERVAL,
+    lambda: get_data_version()[0],
+) if RESULT_CACHE_SIZE > 0 else None
+
+# 演員名稱模糊比對索引（自動補齊）；預熱時載入，之後每 ACTOR_MATCHER_RELOAD_INTERVAL 秒於背景重新載入
+actor_matcher = ActorMatcher(db.get_connection)
+
+
+def cached_result(cache_key):
+    """
+    讀取 API 裝飾器：以 cache_key(request.args) 快取序列化後的回應，命中時不使用資料庫連線
+    剛寫入過的客戶端（讀取走主庫）不使用快取
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if result_cache is None or recently_wrote():
+                return view(*args, **kwargs)
+
+            route = request.url_rule.rule
+            key = cache_key(request.args)
+            cached = result_cache.get(route, key)
+            if cached is not None:
+                body, mimetype = cached
+                return app.response_class(body, mimetype=mimetype)
+
+            generation = result_cache.generation
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                result_cache.put(route, key, response.get_data(), response.mimetype, generation)
+            return response
+        return wrapper
+    return decorator
+
+
+@app.after_request
+def invalidate_result_cache(response):
+    """寫入成功後立即清除本程序的結果快取（其他 worker 於 RESULT_CACHE_VERSION_INTERVAL 內失效）"""
+    if result_cache is not None and request.method not in SAFE_METHODS and response.status_code < 400:
+        result_cache.invalidate()
+    return response
+
+
+# ==================== 查詢統計（Server-Timing）與 Prometheus 指標 ====================
+
+@app.before_request
+def start_query_stats():
+    """開始統計本次請求的 SQL 語句數、資料庫時間與取回列數"""
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.query_stats_token = db.start_query_stats(route)
+
+
+@app.after_request
+def report_query_stats(response):
+    """
+    將查詢統計寫入 Server-Timing 標頭與 debug 日誌，超過 QUERY_BUDGET 時記錄警告，
+    並記錄路由的 Prometheus 指標（最後執行，回應大小為壓縮後的大小）
+    """
+    stats = db.current_query_stats()
+    if stats is None:
+        return response
+
+    # 串流回應（/api/events）沒有固定長度，計算長度會把整個串流讀進記憶體
+    size = None if response.is_streamed else response.calculate_content_length()
+    metrics.observe_request(stats.route, request.method, response.status_code, stats.elapsed, size, stats)
+
+    elapsed_ms = stats.elapsed * 1000
+    db_ms = stats.db_time * 1000
+    if SERVER_TIMING:
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{stats.queries} queries, {stats.rows} rows", app;dur={elapsed_ms:.1f}'
+        )
+
+    app.logger.debug('%s %s: %d queries, %.1f ms db, %d rows, %.1f ms total',
+                     request.method, request.full_path, stats.queries, db_ms, stats.rows, elapsed_ms)
+    if QUERY_BUDGET and stats.queries > QUERY_BUDGET:
+        app.logger.warning('%s %s 執行了 %d 個 SQL 語句，超過預算 %d（可能有 N+1 查詢）',
+                           request.method, request.path, stats.queries, QUERY_BUDGET)
+    return response
+
+
+@app.teardown_request
+def stop_query_stats(exc):
+    token = g.pop('query_stats_token', None)
+    if token is not None:
+        db.stop_query_stats(token)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus 指標（文字格式）"""
+    body, content_type = metrics.render()
+    return app.response_class(body, content_type=content_type)
+
+
+# ==================== 回應壓縮 ====================
+
+@app.after_request
+def compress(response):
+    """依 Accept-Encoding 以 brotli / gzip 壓縮較大的回應"""
+    return compress_response(request, response)
+
+
+# ==================== 啟動預熱與健康檢查 ====================
+
+_ready = threading.Event()
+
+
+def warmup():
+    """
+    接收流量前預熱：開啟連線池、在每條連線上執行熱門查詢的規劃
+    （載入 Postgres 後端的 catalog 快取），並載入參考資料快取與演員名稱索引
+    """
+    db.get_pool().warm(WARMUP_SQL)
+    db.get_replicas().warm(WARMUP_SQL)
+    invalidate_reference_data()
+    get_reference_data()
+    conn = db.get_connection()
+    try:
+        actor_matcher.load(conn)
+    finally:
+        conn.close()
+    _ready.set()
+
+
+@app.route('/healthz')
+def healthz():
+    """存活檢查：程序可回應即可"""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readyz():
+    """就緒檢查：預熱完成且資料庫可連線才回傳 200（啟動時預熱失敗會在此重試）"""
+    try:
+        if not _ready.is_set():
+            warmup()
+        conn = db.get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        conn.close()
+    except psycopg2.Error as e:
+        return jsonify({'status': 'database unavailable', 'error': str(e)}), 503
+    return jsonify({'status': 'ready', 'replicas': db.get_replicas().status()})
+
+
 # ==================== 首頁 ====================
 
 @app.route('/')
@@ -51,16 +362,8 @@ def add_actor():
     """新增演員頁面"""
     
     if request.method == 'GET':
-        # 顯示表單：載入所有公司
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # 取得所有公司（按字母排序）
-        cur.execute("SELECT id, name FROM studios ORDER BY name")
-        studios = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        # 顯示表單：載入所有公司（按字母排序）
+        studios = get_reference_data()['studios']
         
         return render_template('add_actor.html', studios=studios)
     
@@ -100,12 +403,7 @@ def add_actor():
             
             # 如果有錯誤，返回錯誤訊息
             if errors:
-                conn = get_db_connection()
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-                cur.execute("SELECT id, name FROM studios ORDER BY name")
-                studios = cur.fetchall()
-                cur.close()
-                conn.close()
+                studios = get_reference_data()['studios']
                 
                 for error in errors:
                     flash(error, 'error')
@@ -127,12 +425,12 @@ def add_actor():
                     flash(f'演員標記「{actor_tag}」已存在，請使用不同的標記', 'error')
                     conn.rollback()
                     
-                    # 重新載入公司清單
-                    cur.execute("SELECT id, name FROM studios ORDER BY name")
-                    studios = cur.fetchall()
                     cur.close()
                     conn.close()
                     
+                    # 重新載入公司清單
+                    studios = get_reference_data()['studios']
+                    
                     return render_template('add_actor.html', 
                                          studios=studios,
                                          gvdb_id=gvdb_id,
@@ -153,7 +451,10 @@ def add_actor():
                     )
                 
                 # 提交交易
+                notify_change(cur, 'actor', actor_id, ['actor_tag', 'gvdb_id', 'notes', 'stage_names'])
+                bump_data_version(cur)
                 conn.commit()
+                actor_matcher.refresh(conn, [actor_id])
                 
                 # 取得新增的藝名清單（用於顯示）
                 cur.execute("""
@@ -183,12 +484,7 @@ def add_actor():
                 flash(f'資料庫錯誤: {str(e)}', 'error')
                 
                 # 重新載入表單
-                conn = get_db_connection()
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-                cur.execute("SELECT id, name FROM studios ORDER BY name")
-                studios = cur.fetchall()
-                cur.close()
-                conn.close()
+                studios = get_reference_data()['studios']
                 
                 return render_template('add_actor.html', 
                                      studios=studios,
@@ -276,11 +572,15 @@ def add_studio():
                             (actor_id, studio_id, pool['stage_name'])
                         )
                         flash_messages.append(f'  • 已自動建立：{pool["stage_name"]}')
+                        notify_change(cur, 'actor', actor_id, ['stage_names'])
 
                 # 提交交易
+                notify_change(cur, 'studio', studio_id, ['name'])
+                bump_data_version(cur)
                 conn.commit()
                 cur.close()
                 conn.close()
+                invalidate_reference_data()
 
                 # 顯示成功訊息
                 for msg in flash_messages:
@@ -310,32 +610,10 @@ def add_production():
     """新增作品頁面"""
     
     if request.method == 'GET':
-        # 顯示表單：載入所有必要資料
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # 取得所有公司（按字母排序）
-        cur.execute("SELECT id, name FROM studios ORDER BY name")
-        studios = cur.fetchall()
-        
-        # 取得所有標籤（按類別分組）
-        cur.execute("SELECT id, category, name FROM tags ORDER BY category, name")
-        all_tags = cur.fetchall()
-        
-        # 組織標籤
-        tags = {
-            'sex_act': [],
-            'style': [],
-            'scenario': [],
-            'body_type': [],
-            'source': []
-        }
-        for tag in all_tags:
-            if tag['category'] in tags:
-                tags[tag['category']].append(tag)
-        
-        cur.close()
-        conn.close()
+        # 顯示表單：載入所有公司（按字母排序）和標籤（按類別分組）
+        reference = get_reference_data()
+        studios = reference['studios']
+        tags = group_tags_by_category(reference['tags'])
         
         return render_template('add_production.html', studios=studios, tags=tags)
     
@@ -377,6 +655,8 @@ def add_production():
                     errors.append('請選擇公司')
                 if not release_date:
                     errors.append('發行日期不可為空')
+                elif not RELEASE_DATE_PATTERN.match(release_date):
+                    errors.append('發行日期格式應為 YYYY.MM')
             
             if production_type == 'segment':
                 if not parent_code:
@@ -450,9 +730,16 @@ def add_production():
                             """, (production_id, int(tag_id)))
                 
                 # 提交交易
+                notify_change(cur, 'production', production_id,
+                              ['code', 'studio_id', 'title', 'release_date', 'type', 'parent_id', 'comment',
+                               'performers', 'tags'])
+                if parent_id:
+                    notify_change(cur, 'production', parent_id, ['segments'])
+                bump_data_version(cur)
                 conn.commit()
                 cur.close()
                 conn.close()
+                schedule_similarity_refresh(production_id, parent_id)
                 
                 # 顯示成功訊息
                 flash(f'✓ 作品「{code}」新增成功！', 'success')
@@ -473,15 +760,10 @@ def add_production():
 # ==================== API：取得公司清單 ====================
 
 @app.route('/api/studios')
+@conditional_response
 def api_studios():
     """API：取得所有公司清單（供 JavaScript 使用）"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id, name FROM studios ORDER BY name")
-    studios = cur.fetchall()
-    cur.close()
-    conn.close()
-    return jsonify(studios)
+    return jsonify(get_reference_data()['studios'])
 
 
 # ==================== API：搜尋專輯 ====================
@@ -502,7 +784,7 @@ def api_search_albums():
             LEFT JOIN studios s ON p.studio_id = s.id
             WHERE p.type = 'album' 
               AND (p.code LIKE %s OR p.title LIKE %s)
-            ORDER BY p.release_date DESC
+            ORDER BY p.release_month DESC
             LIMIT 10
         """, (f'%{query}%', f'%{query}%'))
     else:
@@ -512,7 +794,7 @@ def api_search_albums():
             FROM productions p
             LEFT JOIN studios s ON p.studio_id = s.id
             WHERE p.type = 'album'
-            ORDER BY p.release_date DESC
+            ORDER BY p.release_month DESC
             LIMIT 10
         """)
     
@@ -553,6 +835,18 @@ def api_studio_actors(studio_id):
 
 # ==================== 查詢作品功能 (新增) ====================
 
+def use_db_json():
+    """是否由 Postgres 直接產生 JSON 回應（設定 DB_JSON_RESPONSES，可用 ?db_json=0/1 覆寫）"""
+    return db_json_requested(request.args)
+
+
+def db_json_response(cur, sql, params):
+    """執行回傳單一 JSON 文字的語句，原樣送出不在 Python 端解析"""
+    cur.execute(sql, params)
+    body = cur.fetchone()[0]
+    return app.response_class(body, mimetype='application/json')
+
+
 @app.route('/search')
 def search_page():
     """查詢作品頁面"""
@@ -560,85 +854,19 @@ def search_page():
 
 
 @app.route('/api/filter-options', methods=['GET'])
+@conditional_response
 def get_filter_options():
     """取得所有篩選選項 (公司列表、所有 tags，包含圖示和排序)"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    reference = get_reference_data()
     
     # 公司列表
-    cur.execute("SELECT DISTINCT name FROM studios ORDER BY name")
-    studios = [row['name'] for row in cur.fetchall()]
-    
-    # Tags (不排序，後面會自訂排序)
-    cur.execute("""
-        SELECT category, name
-        FROM tags
-    """)
-    tags_result = cur.fetchall()
-    
-    # 組織標籤並加上圖示和排序
-    tags = {
-        'sex_acts': [],
-        'styles': [],
-        'body_types': [],
-        'sources': []
-    }
-    
-    # 類別映射
-    category_map = {
-        'sex_act': 'sex_acts',
-        'style': 'styles',
-        'body_type': 'body_types',
-        'source': 'sources'
-    }
-    
-    # 先收集所有標籤
-    for row in tags_result:
-        category = category_map.get(row['category'])
-        if category:
-            tags[category].append(row['name'])
-    
-    # 處理 styles：加上圖示並按照 STYLE_ORDER 排序
-    styles_with_icons = []
-    for style_name in STYLE_ORDER:
-        if style_name in tags['styles']:
-            icon = STYLE_ICONS.get(style_name, '')
-            styles_with_icons.append({
-                'name': style_name,
-                'display_name': f"{icon} {style_name}" if icon else style_name
-            })
-    # 加上不在 STYLE_ORDER 中的其他 style（如果有）
-    for style_name in tags['styles']:
-        if style_name not in STYLE_ORDER:
-            styles_with_icons.append({
-                'name': style_name,
-                'display_name': style_name
-            })
-    tags['styles'] = styles_with_icons
-    
-    # 處理 body_types：按照 BODY_TYPE_ORDER 排序
-    tags['body_types'] = sorted(tags['body_types'], 
-                                 key=lambda x: BODY_TYPE_ORDER.index(x) 
-                                 if x in BODY_TYPE_ORDER else 999)
-    
-    # 處理 sources：按照 SOURCE_ORDER 排序
-    tags['sources'] = sorted(tags['sources'],
-                             key=lambda x: SOURCE_ORDER.index(x)
-                             if x in SOURCE_ORDER else 999)
-    
-    # sex_acts 保持字母排序
-    tags['sex_acts'] = sorted(tags['sex_acts'])
+    studios = list(dict.fromkeys(studio['name'] for studio in reference['studios']))
     
-    cur.close()
-    conn.close()
-    
-    return jsonify({
-        'studios': studios,
-        'tags': tags
-    })
+    return jsonify(build_filter_options(studios, reference['tags']))
 
 
 @app.route('/api/search', methods=['GET'])
+@cached_result(search_cache_key)
 def search_productions():
     """
     查詢作品 API
@@ -647,220 +875,113 @@ def search_productions():
     - actors: stage_name_id (逗號分隔)
     - sex_acts, styles, body_types, sources: tag 名稱 (逗號分隔)
     - keyword: 關鍵字
-    - date_from, date_to: 日期範圍
+    - date_from, date_to: 日期範圍（YYYY.MM 或 YYYY，含片段沿用的專輯日期）
     - page: 頁碼
     - per_page: 每頁筆數
+    - facets: 1 時另外回傳目前條件下各公司、類型與標籤的作品數
+    - include_segments: 1 時本頁每個專輯附上 segments（片段列表，格式同 /api/segments）
+    - ids: 只回傳指定的作品 ID（逗號分隔，含片段；供即時更新後重新取得單列）
     """
     
-    studios = request.args.get('studios', '')
-    actors = request.args.get('actors', '')
-    types = request.args.get('types', '')      # 新增這行
-    sex_acts = request.args.get('sex_acts', '')
-    styles = request.args.get('styles', '')
-    body_types = request.args.get('body_types', '')
-    sources = request.args.get('sources', '')
-    keyword = request.args.get('keyword', '')
-    date_from = request.args.get('date_from', '')
-    date_to = request.args.get('date_to', '')
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 30))
+    query, params, page, per_page = build_search_query(request.args)
+    with_facets = request.args.get('facets') == '1'
+    include_segments = request.args.get('include_segments') == '1'
     
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    # 建立基礎查詢
-    query = "SELECT * FROM production_search_view WHERE 1=1"
-    params = []
-
-    # 作品類型篩選
-    if types:
-        type_list = types.split(',')
-        expanded_types = []
-        for t in type_list:
-            if t == 'album':
-                expanded_types.extend(['album', 'segment'])
-            elif t == 'single':
-                expanded_types.append('single')
-        
-        if expanded_types:
-            placeholders = ','.join(['%s'] * len(expanded_types))
-            query += f" AND type IN ({placeholders})"
-            params.extend(expanded_types)
-    else:
-        # 預設: 只顯示 album 和 single
-        query += " AND type IN ('album', 'single')"
-    
-    # 動態加入條件
-    if studios:
-        studio_list = studios.split(',')
-        placeholders = ','.join(['%s'] * len(studio_list))
-        query += f" AND studio IN ({placeholders})"
-        params.extend(studio_list)
-    
-    if actors:
-        actor_ids = [int(x) for x in actors.split(',')]
-        query += " AND performer_ids && %s"
-        params.append(actor_ids)
-    
-    if sex_acts:
-        tags = sex_acts.split(',')
-        query += " AND sex_acts && %s::varchar[]"
-        params.append(tags)
-    
-    if styles:
-        tags = styles.split(',')
-        query += " AND styles && %s::varchar[]"
-        params.append(tags)
-    
-    if body_types:
-        tags = body_types.split(',')
-        query += " AND body_types && %s::varchar[]"
-        params.append(tags)
-    
-    if sources:
-        tags = sources.split(',')
-        query += " AND sources && %s::varchar[]"
-        params.append(tags)
-    
-    if keyword:
-        query += " AND (code ILIKE %s OR title ILIKE %s OR comment ILIKE %s)"
-        keyword_pattern = f'%{keyword}%'
-        params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
-    
-    if date_from:
-        query += " AND release_date >= %s"
-        params.append(date_from)
-    
-    if date_to:
-        query += " AND release_date <= %s"
-        params.append(date_to)
+    cur = conn.cursor()
     
-    # 動態排序
-    sort_param = request.args.get('sort', 'studio_asc,code_asc,title_asc,date_asc')
-    order_by_parts = []
-    
-    for sort_item in sort_param.split(','):
-        if '_' in sort_item:
-            field, order = sort_item.rsplit('_', 1)
-            # 安全檢查
-            allowed_fields = {'studio': 'studio', 'code': 'code', 'title': 'title', 'date': 'release_date', 'updated': 'updated_at'}
-            if field in allowed_fields and order in ['asc', 'desc']:
-                order_by_parts.append(f"{allowed_fields[field]} {order.upper()}")
-    
-    if order_by_parts:
-        query += " ORDER BY " + ", ".join(order_by_parts)
-    else:
-        query += " ORDER BY studio, code, title, release_date"
+    # 由資料庫組出整頁 JSON（facets 與 include_segments 需要額外查詢，走下方的一般路徑）
+    if use_db_json() and not with_facets and not include_segments:
+        response = db_json_response(cur, *build_search_json_query(query, params, page, per_page))
+        cur.close()
+        conn.close()
+        return response
     
     # 計算總數
-    count_query = f"SELECT COUNT(*) as total FROM ({query}) as subquery"
-    cur.execute(count_query, params)
-    total = cur.fetchone()['total']
+    cur.execute(count_query(query), params)
+    total = cur.fetchone()[0]
+    
+    # 各篩選值的作品數（單一彙總查詢）
+    facets = None
+    if with_facets:
+        cur.execute(facet_query(query), params)
+        facets = build_facets(cur.fetchall())
     
     # 分頁
     offset = (page - 1) * per_page
     query += " LIMIT %s OFFSET %s"
     params.extend([per_page, offset])
     
-    # 執行查詢
+    # 執行查詢（tuple 列轉 dict，不使用 RealDictCursor）
     cur.execute(query, params)
-    results = cur.fetchall()
+    results = db.fetch_dicts(cur)
     
     # 處理 NULL 陣列並轉換演員 ID 為名稱
     for row in results:
-        for key in ['sex_acts', 'styles', 'body_types', 'sources', 'performer_ids']:
-            if row[key] is None:
-                row[key] = []
+        normalize_array_fields(row)
 
         # 將 performer_ids 轉換為演員名稱
         if row['type'] == 'album' and row.get('performer_ids'):
             # 專輯：直接從 performer_ids 獲取演員名稱
             # 優化：不需要 JOIN performances 和 segments，直接查詢 stage_names
-            cur.execute("""
-                SELECT sn.stage_name
-                FROM stage_names sn
-                WHERE sn.id = ANY(%s)
-                ORDER BY sn.stage_name
-            """, (row['performer_ids'],))
-            actors = [r['stage_name'] for r in cur.fetchall()]
-            # 過濾掉匿名演員
-            actors = [a for a in actors if '墨鏡男' not in a and '路人甲' not in a]
-            row['actors'] = ', '.join(actors)
+            cur.execute(ALBUM_ACTORS_SQL, (row['performer_ids'],))
+            actors = [r[0] for r in cur.fetchall()]
+            row['actors'] = join_actor_names(actors, ALBUM_HIDDEN_NAMES)
         elif row.get('performer_ids'):
-            # 單片/片段：依照角色排序（保持原來的邏輯）
-            cur.execute("""
-                SELECT sn.stage_name
-                FROM stage_names sn
-                JOIN performances p ON sn.id = p.stage_name_id
-                WHERE sn.id = ANY(%s) AND p.production_id = %s
-                ORDER BY
-                    CASE p.role
-                        WHEN 'top' THEN 1
-                        WHEN 'bottom' THEN 2
-                        WHEN 'giver' THEN 3
-                        WHEN 'receiver' THEN 4
-                        ELSE 5
-                    END,
-                    sn.stage_name
-            """, (row['performer_ids'], row['id']))
-            actors = [r['stage_name'] for r in cur.fetchall()]
-            # 過濾掉匿名演員
-            actors = [a for a in actors if '墨鏡' not in a and '路人' not in a]
-            row['actors'] = ', '.join(actors)
+            # 單片/片段：依照角色排序
+            cur.execute(PRODUCTION_ACTORS_SQL, (row['performer_ids'], row['id']))
+            actors = [r[0] for r in cur.fetchall()]
+            row['actors'] = join_actor_names(actors, PRODUCTION_HIDDEN_NAMES)
         else:
             row['actors'] = ''
     
+    # 本頁所有專輯的片段：一次查詢取回，不必逐一呼叫 /api/segments
+    if include_segments:
+        album_ids = [row['id'] for row in results if row['type'] == 'album']
+        segments = {}
+        if album_ids:
+            cur.execute(PAGE_SEGMENTS_SQL, (album_ids,))
+            segments = group_segments(db.fetch_dicts(cur))
+        for row in results:
+            if row['type'] == 'album':
+                row['segments'] = segments.get(row['id'], [])
+    
     cur.close()
     conn.close()
     
-    return jsonify({
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page,
-        'results': results
-    })
+    result = paginate(total, page, per_page, results)
+    if facets is not None:
+        result['facets'] = facets
+    return jsonify(result)
 
 
 @app.route('/api/segments/<int:parent_id>', methods=['GET'])
+@conditional_response
 def get_segments(parent_id):
     """取得專輯的子片段"""
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = conn.cursor()
     
-    cur.execute("""
-        SELECT * FROM production_search_view
-        WHERE parent_id = %s
-        ORDER BY code
-    """, (parent_id,))
+    # 由資料庫組出 JSON
+    if use_db_json():
+        response = db_json_response(cur, SEGMENTS_JSON_SQL, segments_json_params(parent_id))
+        cur.close()
+        conn.close()
+        return response
     
-    results = cur.fetchall()
+    cur.execute(SEGMENTS_SQL, (parent_id,))
+    
+    results = db.fetch_dicts(cur)
     
     # 處理 NULL 陣列並轉換演員 ID 為名稱
     for row in results:
-        for key in ['sex_acts', 'styles', 'body_types', 'sources', 'performer_ids']:
-            if row[key] is None:
-                row[key] = []
+        normalize_array_fields(row)
         
         # 將 performer_ids 轉換為演員名稱（依照角色排序）
         if row.get('performer_ids'):
-            cur.execute("""
-                SELECT sn.stage_name 
-                FROM stage_names sn 
-                JOIN performances p ON sn.id = p.stage_name_id
-                WHERE sn.id = ANY(%s) AND p.production_id = %s
-                ORDER BY 
-                    CASE p.role 
-                        WHEN 'top' THEN 1 
-                        WHEN 'bottom' THEN 2 
-                        WHEN 'giver' THEN 3 
-                        WHEN 'receiver' THEN 4 
-                        ELSE 5 
-                    END,
-                    sn.stage_name
-            """, (row['performer_ids'], row['id']))
-            actors = [r['stage_name'] for r in cur.fetchall()]
-            row['actors'] = ', '.join(actors)
+            cur.execute(PRODUCTION_ACTORS_SQL, (row['performer_ids'], row['id']))
+            actors = [r[0] for r in cur.fetchall()]
+            row['actors'] = join_actor_names(actors)
         else:
             row['actors'] = ''
     
@@ -874,30 +995,20 @@ def get_segments(parent_id):
 def api_search_actors():
     """搜尋演員 (for search page autocomplete)"""
     query = request.args.get('q', '')
+
+    # 優先使用程序內的模糊比對索引（尚未載入時改用資料庫查詢）
+    if query.strip():
+        results = actor_matcher.search(query)
+        if results is not None:
+            return jsonify(results)
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    sql = """
-        SELECT DISTINCT
-            a.id as actor_id,
-            sn.id as stage_name_id,
-            sn.stage_name,
-            a.actor_tag as actor_name,
-            s.name as studio_name
-        FROM stage_names sn
-        JOIN actors a ON sn.actor_id = a.id
-        LEFT JOIN studios s ON sn.studio_id = s.id
-        WHERE (sn.stage_name ILIKE %s OR a.actor_tag ILIKE %s)
-        ORDER BY sn.stage_name
-        LIMIT 20
-    """
-    
-    cur.execute(sql, (f'%{query}%', f'%{query}%'))
+    cur.execute(ACTOR_SEARCH_SQL, (f'%{query}%', f'%{query}%'))
     results = cur.fetchall()
     cur.close()
     conn.close()
-    
     return jsonify(results)
 
 # ==================== 編輯演員功能 ====================
@@ -909,6 +1020,7 @@ def edit_actor_page():
 
 
 @app.route('/api/actor/<int:actor_id>', methods=['GET'])
+@conditional_response
 def get_actor(actor_id):
     """取得演員完整資料"""
     conn = get_db_connection()
@@ -970,6 +1082,14 @@ def update_actor(actor_id):
             conn.close()
             return jsonify({'error': f'Actor Tag「{actor_tag}」已被其他演員使用'}), 400
         
+        # 原始資料（比對變更欄位供即時更新通知）
+        cur.execute("SELECT actor_tag, gvdb_id, notes FROM actors WHERE id = %s", (actor_id,))
+        original = cur.fetchone()
+        if not original:
+            cur.close()
+            conn.close()
+            return jsonify({'error': '找不到演員'}), 404
+
         # 更新演員基本資料
         cur.execute("""
             UPDATE actors 
@@ -993,7 +1113,15 @@ def update_actor(actor_id):
                     WHERE id = %s AND actor_id = %s
                 """, (sn['stage_name'], sn['id'], actor_id))
         
+        updated = {'actor_tag': actor_tag, 'gvdb_id': gvdb_id, 'notes': notes}
+        changed = [field for field, value in updated.items() if original[field] != value]
+        if any(sn.get('is_new') or sn.get('modified') for sn in stage_names):
+            changed.append('stage_names')
+        if changed:
+            notify_change(cur, 'actor', actor_id, changed)
+        bump_data_version(cur)
         conn.commit()
+        actor_matcher.refresh(conn, [actor_id])
         cur.close()
         conn.close()
         
@@ -1017,24 +1145,9 @@ def actor_search_page():
 @app.route('/api/actors/filters', methods=['GET'])
 def get_actor_filters():
     """取得演員查詢篩選選項（公司列表、排序選項）"""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    # 取得所有公司
-    cur.execute("SELECT id, name FROM studios ORDER BY name")
-    studios = cur.fetchall()
-
-    cur.close()
-    conn.close()
-
     return jsonify({
-        'studios': studios,
-        'sort_options': [
-            {'value': 'name', 'label': '按名字 (A-Z)'},
-            {'value': 'latest', 'label': '按最新作品'},
-            {'value': 'count', 'label': '按作品數量'},
-            {'value': 'newest_edit', 'label': '按最新編輯'}
-        ]
+        'studios': get_reference_data()['studios'],
+        'sort_options': ACTOR_SORT_OPTIONS
     })
 
 
@@ -1046,31 +1159,16 @@ def get_actor_suggestions():
     if not query:
         return jsonify([])
 
+    results = actor_matcher.suggestions(query)
+    if results is not None:
+        return jsonify(results)
+
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    # 搜尋 actor_tag 和 stage_name（排除自動生成的演員）
-    sql = """
-        SELECT DISTINCT
-            a.id as actor_id,
-            a.actor_tag,
-            array_agg(DISTINCT sn.stage_name) as stage_names,
-            array_agg(DISTINCT s.name) as studios
-        FROM actors a
-        LEFT JOIN stage_names sn ON a.id = sn.actor_id
-        LEFT JOIN studios s ON sn.studio_id = s.id
-        WHERE (a.actor_tag ILIKE %s OR sn.stage_name ILIKE %s)
-            AND a.actor_tag NOT LIKE 'STUDIO_%%'
-        GROUP BY a.id, a.actor_tag
-        ORDER BY
-            CASE WHEN a.actor_tag ILIKE %s THEN 0 ELSE 1 END,
-            a.actor_tag
-        LIMIT 10
-    """
-
     search_pattern = f'%{query}%'
     exact_pattern = f'{query}%'
-    cur.execute(sql, (search_pattern, search_pattern, exact_pattern))
+    cur.execute(ACTOR_SUGGESTIONS_SQL, (search_pattern, search_pattern, exact_pattern))
     results = cur.fetchall()
     cur.close()
     conn.close()
@@ -1079,6 +1177,7 @@ def get_actor_suggestions():
 
 
 @app.route('/api/actors/query', methods=['GET'])
+@cached_result(actor_cache_key)
 def query_actors():
     """
     演員查詢 API
@@ -1092,302 +1191,164 @@ def query_actors():
     """
 
     try:
-        search = request.args.get('search', '').strip()
-        studios = request.args.get('studios', '')
-        sort = request.args.get('sort', 'name')
-        sort_order = request.args.get('sort_order', 'asc').lower()
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        show_anonymous = request.args.get('show_anonymous', '0') == '1'
-
-        # 驗證參數
-        if sort not in ['name', 'latest', 'count', 'newest_edit']:
-            sort = 'name'
-        if sort_order not in ['asc', 'desc']:
-            sort_order = 'asc'
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 20
+        count_sql, page_sql, params, page, per_page = build_actor_query(request.args)
 
         conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur = conn.cursor()
 
-        # 建立基礎查詢 - 查詢符合條件的演員（去重）
-        # 排除 STUDIO_ 開頭的自動生成演員
-        query_where = "a.actor_tag NOT LIKE 'STUDIO_%%'"
+        # 計算總數
+        cur.execute(count_sql, params)
+        total = cur.fetchone()[0]
 
-        # 排除或包含匿名/特殊演員池
-        if not show_anonymous:
-            query_where += " AND a.actor_tag NOT IN ('ANONYMOUS_POOL', 'UNKNOWN_POOL', 'GIRL_POOL')"
+        cur.execute(page_sql, params)
+        actor_ids = [row[0] for row in cur.fetchall()]
 
-        params = []
+        # 為每個演員取得詳細統計信息（tuple 列轉 dict，不使用 RealDictCursor）
+        results = []
+        for actor_id in actor_ids:
+            cur.execute(ACTOR_BASIC_SQL, (actor_id,))
+            actor = db.fetch_dict(cur)
 
-        # 搜尋條件
-        if search:
-            query_where += " AND (a.actor_tag ILIKE %s OR sn.stage_name ILIKE %s)"
-            search_pattern = f'%{search}%'
-            params.extend([search_pattern, search_pattern])
+            cur.execute(ACTOR_GLOBAL_STATS_SQL, (actor_id,))
+            global_stats = db.fetch_dict(cur)
 
-        # 公司篩選
-        if studios:
-            try:
-                studio_ids = [int(x) for x in studios.split(',')]
-                placeholders = ','.join(['%s'] * len(studio_ids))
-                query_where += f" AND sn.studio_id IN ({placeholders})"
-                params.extend(studio_ids)
-            except ValueError:
-                pass
+            cur.execute(ACTOR_LATEST_PRODUCTION_SQL, (actor_id,))
+            latest_prod = db.fetch_dict(cur)
 
-        # 計算總數
-        count_query = f"""
-            SELECT COUNT(DISTINCT a.id) as total
-            FROM actors a
-            LEFT JOIN stage_names sn ON a.id = sn.actor_id
-            WHERE {query_where}
-        """
-        cur.execute(count_query, params)
-        total = cur.fetchone()['total']
-
-        # 排序子句
-        sort_by = "a.actor_tag"
-        if sort_order == 'desc' and sort == 'name':
-            sort_by = "a.actor_tag DESC"
-        elif sort_order == 'asc' and sort == 'name':
-            sort_by = "a.actor_tag ASC"
-        elif sort == 'latest':
-            # 按最新作品日期排序
-            sort_by = """(
-                COALESCE(
-                    (SELECT MAX(CASE
-                        WHEN p.type IN ('single', 'album') THEN p.release_date
-                        ELSE (SELECT release_date FROM productions WHERE id = p.parent_id)
-                    END)
-                    FROM performances perf
-                    JOIN productions p ON perf.production_id = p.id
-                    WHERE perf.stage_name_id IN (SELECT id FROM stage_names WHERE actor_id = a.id)
-                    AND p.type IN ('single', 'segment')), '0000-01-01')
-                ) DESC"""
-        elif sort == 'count':
-            # 按作品數量排序
-            sort_by = """(
-                COALESCE(
-                    (SELECT COUNT(DISTINCT CASE
-                        WHEN p.type IN ('single', 'album') THEN p.id
-                        WHEN p.type = 'segment' THEN p.parent_id
-                    END)
-                    FROM performances perf
-                    JOIN productions p ON perf.production_id = p.id
-                    WHERE perf.stage_name_id IN (SELECT id FROM stage_names WHERE actor_id = a.id)
-                    AND p.type IN ('single', 'segment')), 0)
-                ) DESC"""
-        elif sort == 'newest_edit':
-            # 按最新編輯時間排序
-            sort_by = """(
-                COALESCE(
-                    (SELECT MAX(p.updated_at)
-                    FROM performances perf
-                    JOIN productions p ON perf.production_id = p.id
-                    WHERE perf.stage_name_id IN (SELECT id FROM stage_names WHERE actor_id = a.id)
-                    AND p.type IN ('single', 'segment')), '1900-01-01')
-                ) DESC"""
-
-        # 分頁
-        offset = (page - 1) * per_page
-        # 使用 GROUP BY 避免 DISTINCT 與複雜 ORDER BY 的衝突
-        full_query = f"""
-            SELECT a.id as actor_id
-            FROM actors a
-            LEFT JOIN stage_names sn ON a.id = sn.actor_id
-            WHERE {query_where}
-            GROUP BY a.id
-            ORDER BY {sort_by}
-            LIMIT {per_page} OFFSET {offset}
-        """
-
-        cur.execute(full_query, params)
-        actor_ids = [row['actor_id'] for row in cur.fetchall()]
-
-        # 為每個演員取得詳細統計信息
-        results = []
-        for actor_id in actor_ids:
-            # 取得演員基本信息
-            cur.execute("SELECT id, actor_tag, gvdb_id, notes FROM actors WHERE id = %s", (actor_id,))
-            actor = cur.fetchone()
+            cur.execute(ACTOR_STUDIO_DETAILS_SQL, (actor_id,))
+            studio_details = db.fetch_dicts(cur)
 
-            # 計算全局統計
-            # 演員的作品數 = 單片數 + 專輯數（通過片段統計）
-            # 角色統計 = 單片的角色 + 片段的角色（不包括專輯自身）
-            cur.execute("""
-                SELECT
-                    COUNT(DISTINCT CASE
-                        WHEN p.type = 'single' THEN p.id
-                        WHEN p.type = 'segment' THEN p.parent_id
-                    END) as total_productions,
-                    COALESCE(SUM(CASE WHEN perf.role = 'top' THEN 1 ELSE 0 END), 0) as role_top,
-                    COALESCE(SUM(CASE WHEN perf.role = 'bottom' THEN 1 ELSE 0 END), 0) as role_bottom,
-                    COALESCE(SUM(CASE WHEN perf.role = 'giver' THEN 1 ELSE 0 END), 0) as role_giver,
-                    COALESCE(SUM(CASE WHEN perf.role = 'receiver' THEN 1 ELSE 0 END), 0) as role_receiver,
-                    COALESCE(SUM(CASE WHEN perf.role NOT IN ('top', 'bottom', 'giver', 'receiver') OR perf.role IS NULL THEN 1 ELSE 0 END), 0) as role_other
-                FROM performances perf
-                JOIN stage_names sn ON perf.stage_name_id = sn.id
-                JOIN productions p ON perf.production_id = p.id
-                WHERE sn.actor_id = %s AND p.type IN ('single', 'segment')
-            """, (actor_id,))
-            global_stats = cur.fetchone()
-
-            # 取得最新作品信息（只考慮專輯或單片，不包括片段）
-            # 通過 UNION 將單片和專輯片段的父專輯合併
-            cur.execute("""
-                SELECT p.code, p.release_date
-                FROM performances perf
-                JOIN stage_names sn ON perf.stage_name_id = sn.id
-                JOIN productions p ON perf.production_id = p.id
-                WHERE sn.actor_id = %s AND p.type = 'single'
-
-                UNION
-
-                SELECT p.code, p.release_date
-                FROM performances perf
-                JOIN stage_names sn ON perf.stage_name_id = sn.id
-                JOIN productions seg ON perf.production_id = seg.id
-                JOIN productions p ON seg.parent_id = p.id
-                WHERE sn.actor_id = %s AND seg.type = 'segment' AND p.type = 'album'
-
-                ORDER BY release_date DESC
-                LIMIT 1
-            """, (actor_id, actor_id))
-            latest_prod = cur.fetchone()
-
-            # 計算各公司的詳細統計
-            # 顯示演員在所有公司的信息（即使沒有出演過）
-            # 演員的作品數 = 單片數 + 專輯數（通過片段統計）
-            # 角色統計 = 單片的角色 + 片段的角色（不包括專輯自身）
-            cur.execute("""
-                SELECT
-                    s.id as studio_id,
-                    s.name as studio_name,
-                    sn.id as stage_name_id,
-                    sn.stage_name,
-                    COUNT(DISTINCT CASE
-                        WHEN p.type = 'single' THEN p.id
-                        WHEN p.type = 'segment' THEN p.parent_id
-                    END) as productions,
-                    COALESCE(SUM(CASE WHEN perf.role = 'top' THEN 1 ELSE 0 END), 0) as role_top,
-                    COALESCE(SUM(CASE WHEN perf.role = 'bottom' THEN 1 ELSE 0 END), 0) as role_bottom,
-                    COALESCE(SUM(CASE WHEN perf.role = 'giver' THEN 1 ELSE 0 END), 0) as role_giver,
-                    COALESCE(SUM(CASE WHEN perf.role = 'receiver' THEN 1 ELSE 0 END), 0) as role_receiver,
-                    COALESCE(SUM(CASE WHEN perf.role NOT IN ('top', 'bottom', 'giver', 'receiver') OR perf.role IS NULL THEN 1 ELSE 0 END), 0) as role_other,
-                    (SELECT release_date FROM (
-                        SELECT p2.release_date, p2.code FROM performances perf2
-                        JOIN productions p2 ON perf2.production_id = p2.id
-                        WHERE perf2.stage_name_id = sn.id AND p2.type = 'single'
-
-                        UNION
-
-                        SELECT p2.release_date, p2.code FROM performances perf2
-                        JOIN productions seg ON perf2.production_id = seg.id
-                        JOIN productions p2 ON seg.parent_id = p2.id
-                        WHERE perf2.stage_name_id = sn.id AND seg.type = 'segment' AND p2.type = 'album'
-                     ) AS latest_prod
-                     ORDER BY release_date DESC
-                     LIMIT 1) as latest_date,
-                    (SELECT code FROM (
-                        SELECT p2.release_date, p2.code FROM performances perf2
-                        JOIN productions p2 ON perf2.production_id = p2.id
-                        WHERE perf2.stage_name_id = sn.id AND p2.type = 'single'
-
-                        UNION
-
-                        SELECT p2.release_date, p2.code FROM performances perf2
-                        JOIN productions seg ON perf2.production_id = seg.id
-                        JOIN productions p2 ON seg.parent_id = p2.id
-                        WHERE perf2.stage_name_id = sn.id AND seg.type = 'segment' AND p2.type = 'album'
-                     ) AS latest_prod
-                     ORDER BY release_date DESC
-                     LIMIT 1) as latest_production_code
-                FROM stage_names sn
-                LEFT JOIN studios s ON sn.studio_id = s.id
-                LEFT JOIN performances perf ON sn.id = perf.stage_name_id
-                LEFT JOIN productions p ON perf.production_id = p.id AND p.type IN ('single', 'segment')
-                WHERE sn.actor_id = %s
-                GROUP BY s.id, s.name, sn.id, sn.stage_name
-                ORDER BY s.name
-            """, (actor_id,))
-            studio_details = cur.fetchall()
-
-            # 計算角色百分比
-            total_roles = (global_stats['role_top'] + global_stats['role_bottom'] +
-                          global_stats['role_giver'] + global_stats['role_receiver'] +
-                          global_stats['role_other']) or 1
-
-            studio_details_list = []
-            for studio in studio_details:
-                studio_total_roles = (studio['role_top'] + studio['role_bottom'] +
-                                     studio['role_giver'] + studio['role_receiver'] +
-                                     studio['role_other']) or 1
-
-                studio_details_list.append({
-                    'studio_id': studio['studio_id'],
-                    'studio_name': studio['studio_name'],
-                    'stage_name_id': studio['stage_name_id'],
-                    'stage_name': studio['stage_name'],
-                    'productions': studio['productions'],
-                    'latest_date': studio['latest_date'],
-                    'latest_production_code': studio['latest_production_code'],
-                    'role_breakdown': {
-                        'top': studio['role_top'],
-                        'bottom': studio['role_bottom'],
-                        'giver': studio['role_giver'],
-                        'receiver': studio['role_receiver'],
-                        'other': studio['role_other']
-                    },
-                    'role_percentage': {
-                        'top': round((studio['role_top'] / studio_total_roles) * 100) if studio['role_top'] > 0 else 0,
-                        'bottom': round((studio['role_bottom'] / studio_total_roles) * 100) if studio['role_bottom'] > 0 else 0,
-                        'giver': round((studio['role_giver'] / studio_total_roles) * 100) if studio['role_giver'] > 0 else 0,
-                        'receiver': round((studio['role_receiver'] / studio_total_roles) * 100) if studio['role_receiver'] > 0 else 0,
-                        'other': round((studio['role_other'] / studio_total_roles) * 100) if studio['role_other'] > 0 else 0
-                    }
-                })
-
-            results.append({
-                'actor_id': actor['id'],
-                'actor_tag': actor['actor_tag'],
-                'gvdb_id': actor['gvdb_id'],
-                'notes': actor['notes'],
-                'global_stats': {
-                    'total_productions': global_stats['total_productions'],
-                    'latest_production_code': latest_prod['code'] if latest_prod else None,
-                    'latest_release_date': latest_prod['release_date'] if latest_prod else None,
-                    'role_breakdown': {
-                        'top': global_stats['role_top'],
-                        'bottom': global_stats['role_bottom'],
-                        'giver': global_stats['role_giver'],
-                        'receiver': global_stats['role_receiver'],
-                        'other': global_stats['role_other']
-                    }
-                },
-                'studio_details': studio_details_list
-            })
+            results.append(build_actor_result(actor, global_stats, latest_prod, studio_details))
 
         cur.close()
         conn.close()
 
-        return jsonify({
-            'total': total,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': (total + per_page - 1) // per_page,
-            'results': results
-        })
+        return jsonify(paginate(total, page, per_page, results))
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception('演員查詢失敗')
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== 演員合作關係 ====================
+
+COSTAR_MAX_DEPTH = 8
+
+
+@app.route('/api/actor/<int:actor_id>/costars', methods=['GET'])
+@conditional_response
+def get_actor_costars(actor_id):
+    """
+    最常合作的演員（讀取 actor_costars 鄰接表）
+    參數:
+    - limit: 筆數（默認 20，最多 100）
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(COSTARS_SQL, (actor_id, limit))
+    results = db.fetch_dicts(cur)
+    cur.close()
+    conn.close()
+
+    return jsonify(results)
+
+
+@app.route('/api/actors/path', methods=['GET'])
+@conditional_response
+def get_costar_path():
+    """
+    兩位演員之間最短的合作路徑
+    參數:
+    - from, to: actor_id
+    - max_depth: 最多經過幾次合作（默認 6，最多 COSTAR_MAX_DEPTH）
+    回傳 {'path': [演員], 'links': [相鄰兩人的合作次數與共同作品]}，找不到時 path 為 null
+    """
+    source = request.args.get('from', type=int)
+    target = request.args.get('to', type=int)
+    if source is None or target is None:
+        return jsonify({'error': '缺少 from 或 to 參數'}), 400
+    max_depth = min(max(request.args.get('max_depth', 6, type=int), 1), COSTAR_MAX_DEPTH)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    def neighbors(ids):
+        cur.execute(COSTAR_NEIGHBORS_SQL, (ids,))
+        return cur.fetchall()
+
+    path = find_costar_path(neighbors, source, target, max_depth)
+    if path is None:
+        cur.close()
+        conn.close()
+        return jsonify({'path': None, 'links': []})
+
+    cur.execute(ACTOR_BRIEF_SQL, (path,))
+    actors = {row['actor_id']: row for row in db.fetch_dicts(cur)}
+    cur.execute(COSTAR_LINKS_SQL, (path[:-1], path[1:]))
+    links = {(row['actor_id'], row['costar_id']): row for row in db.fetch_dicts(cur)}
+    cur.close()
+    conn.close()
+
+    return jsonify({
+        'path': [actors.get(actor_id, {'actor_id': actor_id}) for actor_id in path],
+        'links': [links.get(pair) for pair in zip(path, path[1:])],
+    })
+
+
+# ==================== 發行時間軸 ====================
+
+TIMELINE_MAX_SERIES = 50
+TIMELINE_PERIOD_PATTERN = re.compile(r'^\d{4}(\.\d{2})?$')
+
+
+@app.route('/api/stats/timeline', methods=['GET'])
+@conditional_response
+def get_release_timeline():
+    """
+    每月 / 每年的作品數（讀取 timeline_* 彙總表，片段計入所屬專輯）
+    參數:
+    - by: studio / tag / actor（默認 studio）
+    - granularity: month / year（默認 month）
+    - ids: 逗號分隔的 ID，未指定時取期間內作品數最多的 limit 個
+    - from, to: 'YYYY' 或 'YYYY.MM'（含）
+    - limit: 未指定 ids 時的數量（默認 10，最多 TIMELINE_MAX_SERIES）
+    """
+    by = request.args.get('by', 'studio')
+    granularity = request.args.get('granularity', 'month')
+    if by not in TIMELINE_DIMENSIONS:
+        return jsonify({'error': f'by 必須是 {", ".join(TIMELINE_DIMENSIONS)}'}), 400
+    if granularity not in TIMELINE_GRANULARITIES:
+        return jsonify({'error': f'granularity 必須是 {", ".join(TIMELINE_GRANULARITIES)}'}), 400
+
+    period_from = request.args.get('from') or None
+    period_to = request.args.get('to') or None
+    for value in (period_from, period_to):
+        if value and not TIMELINE_PERIOD_PATTERN.match(value):
+            return jsonify({'error': f'無效的期間：{value}'}), 400
+
+    try:
+        ids = [int(x) for x in request.args.get('ids', '').split(',') if x.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids 必須是逗號分隔的整數'}), 400
+    ids = ids[:TIMELINE_MAX_SERIES]
+    limit = len(ids) if ids else min(max(request.args.get('limit', 10, type=int), 1), TIMELINE_MAX_SERIES)
+
+    query, params = build_timeline_query(by, granularity, ids, period_from, period_to, limit)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(query, params)
+    rows = db.fetch_dicts(cur)
+    cur.close()
+    conn.close()
+
+    result = build_timeline(rows)
+    result['by'] = by
+    result['granularity'] = granularity
+    return jsonify(result)
+
+
 # ==================== 編輯作品功能 ====================
 
 @app.route('/edit_production')
@@ -1433,8 +1394,8 @@ def api_search_productions():
         try:
             studio_ids = [int(x) for x in studios.split(',')]
             placeholders = ','.join(['%s'] * len(studio_ids))
-            sql += f" AND (p.studio_id IN ({placeholders}) OR p.parent_id IN (SELECT id FROM productions WHERE studio_id IN ({placeholders})))"
-            params.extend(studio_ids)
+            # 片段的 effective_studio_id 沿用所屬專輯
+            sql += f" AND p.effective_studio_id IN ({placeholders})"
             params.extend(studio_ids)
         except ValueError:
             pass
@@ -1444,7 +1405,7 @@ def api_search_productions():
         sql += " AND (p.code ILIKE %s OR p.title ILIKE %s OR s.name ILIKE %s)"
         params.extend([f'%{query}%', f'%{query}%', f'%{query}%'])
 
-    sql += " ORDER BY p.release_date DESC LIMIT %s"
+    sql += " ORDER BY p.release_month DESC LIMIT %s"
     params.append(limit)
 
     cur.execute(sql, params)
@@ -1456,6 +1417,7 @@ def api_search_productions():
 
 
 @app.route('/api/production/<int:production_id>', methods=['GET'])
+@conditional_response
 def get_production(production_id):
     """取得作品完整資料（用於編輯）"""
     conn = get_db_connection()
@@ -1463,13 +1425,7 @@ def get_production(production_id):
 
     try:
         # 取得作品基本資料
-        cur.execute("""
-            SELECT p.id, p.code, p.type, p.title, p.release_date, p.comment,
-                   p.studio_id, s.name AS studio_name, p.parent_id
-            FROM productions p
-            LEFT JOIN studios s ON p.studio_id = s.id
-            WHERE p.id = %s
-        """, (production_id,))
+        cur.execute(PRODUCTION_SQL, (production_id,))
         production = cur.fetchone()
 
         if not production:
@@ -1480,76 +1436,26 @@ def get_production(production_id):
         # 如果是片段，取得父專輯資料
         parent_album = None
         if production['parent_id']:
-            cur.execute("""
-                SELECT id, code, studio_id
-                FROM productions
-                WHERE id = %s
-            """, (production['parent_id'],))
+            cur.execute(PARENT_ALBUM_SQL, (production['parent_id'],))
             parent_album = cur.fetchone()
 
-        # 取得所有演員（只針對 single 和 segment）
+        # 取得所有演員和標籤（只針對 single 和 segment）
         performers = []
+        tags = []
         if production['type'] in ['single', 'segment']:
-            cur.execute("""
-                SELECT perf.id, perf.stage_name_id, perf.role, perf.performer_type,
-                       sn.stage_name, sn.studio_id, s.name AS studio_name
-                FROM performances perf
-                JOIN stage_names sn ON perf.stage_name_id = sn.id
-                LEFT JOIN studios s ON sn.studio_id = s.id
-                WHERE perf.production_id = %s
-                ORDER BY sn.stage_name
-            """, (production_id,))
+            cur.execute(PRODUCTION_PERFORMERS_SQL, (production_id,))
             performers = cur.fetchall()
 
-        # 取得所有標籤（只針對 single 和 segment）
-        tags = []
-        if production['type'] in ['single', 'segment']:
-            cur.execute("""
-                SELECT pt.tag_id, t.category, t.name
-                FROM production_tags pt
-                JOIN tags t ON pt.tag_id = t.id
-                WHERE pt.production_id = %s
-                ORDER BY t.category, t.name
-            """, (production_id,))
+            cur.execute(PRODUCTION_TAGS_SQL, (production_id,))
             tags = cur.fetchall()
 
-        # 取得所有可用的標籤（用於前端表單）
-        cur.execute("""
-            SELECT id, category, name FROM tags
-            ORDER BY category, name
-        """)
-        all_tags = cur.fetchall()
-
         cur.close()
         conn.close()
 
-        # 組織標籤
-        available_tags = {
-            'sex_act': [],
-            'style': [],
-            'scenario': [],
-            'body_type': [],
-            'source': []
-        }
-        for tag in all_tags:
-            if tag['category'] in available_tags:
-                available_tags[tag['category']].append(tag)
-
-        return jsonify({
-            'id': production['id'],
-            'code': production['code'],
-            'type': production['type'],
-            'title': production['title'],
-            'release_date': production['release_date'],
-            'comment': production['comment'],
-            'studio_id': production['studio_id'],
-            'studio_name': production['studio_name'],
-            'parent_id': production['parent_id'],
-            'parent_album': parent_album,
-            'performers': performers,
-            'tags': tags,
-            'available_tags': available_tags
-        })
+        # 所有可用的標籤（用於前端表單）
+        all_tags = get_reference_data()['tags']
+
+        return jsonify(build_production_result(production, parent_album, performers, tags, all_tags))
 
     except Exception as e:
         cur.close()
@@ -1580,7 +1486,10 @@ def update_production(production_id):
 
     try:
         # 取得原始作品資料
-        cur.execute("SELECT type, studio_id, parent_id FROM productions WHERE id = %s", (production_id,))
+        cur.execute("""
+            SELECT type, studio_id, parent_id, code, title, release_date, comment
+            FROM productions WHERE id = %s
+        """, (production_id,))
         original = cur.fetchone()
         if not original:
             conn.close()
@@ -1597,7 +1506,7 @@ def update_production(production_id):
             return jsonify({'error': f'作品編號「{code}」已存在'}), 400
 
         # 驗證 release_date 格式（如果有提供）
-        if release_date and not (len(release_date) == 7 and release_date.count('.') == 1):
+        if release_date and not RELEASE_DATE_PATTERN.match(release_date):
             return jsonify({'error': '發行日期格式應為 YYYY.MM'}), 400
 
         # 驗證非片段作品必須有 studio_id 和 release_date
@@ -1658,7 +1567,8 @@ def update_production(production_id):
         # 3. 處理標籤（只針對 single 和 segment）
         if production_type in ['single', 'segment']:
             # 刪除舊標籤
-            cur.execute("DELETE FROM production_tags WHERE production_id = %s", (production_id,))
+            cur.execute("DELETE FROM production_tags WHERE production_id = %s RETURNING tag_id", (production_id,))
+            old_tag_ids = {row['tag_id'] for row in cur.fetchall()}
 
             # 插入新標籤
             for tag_id in tag_ids:
@@ -1667,10 +1577,29 @@ def update_production(production_id):
                     VALUES (%s, %s)
                 """, (production_id, tag_id))
 
+        # 即時更新通知：只列出實際變更的欄位
+        updated = {'code': code, 'title': title, 'comment': comment}
+        if production_type != 'segment':
+            updated.update(release_date=release_date, studio_id=int(studio_id))
+        changed = [field for field, value in updated.items() if original[field] != value]
+        if production_type in ['single', 'segment']:
+            if delete_performer_ids or any(perf.get('is_new') or perf.get('modified') for perf in performers):
+                changed.append('performers')
+            if old_tag_ids != {int(tag_id) for tag_id in tag_ids}:
+                changed.append('tags')
+        if changed:
+            notify_change(cur, 'production', production_id, changed)
+        # 片段的演員與標籤也彙總顯示在所屬專輯
+        rolled_up = [field for field in changed if field in ('performers', 'tags')]
+        if original['parent_id'] and rolled_up:
+            notify_change(cur, 'production', original['parent_id'], rolled_up)
+
         # 提交交易
+        bump_data_version(cur)
         conn.commit()
         cur.close()
         conn.close()
+        schedule_similarity_refresh(production_id, original['parent_id'])
 
         return jsonify({'success': True, 'message': '作品資料已更新'})
 
@@ -1683,6 +1612,375 @@ def update_production(production_id):
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== 相似作品 ====================
+
+similarity_refresher = similarity.SimilarityRefresher(db.get_connection)
+
+
+def schedule_similarity_refresh(production_id, parent_id=None):
+    """作品寫入後在背景更新相似作品（片段的演員與標籤也會改變所屬專輯的向量）"""
+    similarity_refresher.schedule(production_id)
+    if parent_id is not None:
+        similarity_refresher.schedule(parent_id)
+
+
+@app.route('/api/production/<int:production_id>/similar', methods=['GET'])
+def get_similar_productions(production_id):
+    """
+    相似作品（讀取 similar_productions，由 scripts/build_similar_productions.py 建立）
+    不使用 ETag：similar_productions 由背景更新與全量重建寫入，不遞增資料版本
+    參數:
+    - limit: 筆數（默認與最多皆為 SIMILAR_TOP_K）
+    """
+    limit = min(max(request.args.get('limit', SIMILAR_TOP_K, type=int), 1), SIMILAR_TOP_K)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(similarity.SIMILAR_SQL, (production_id, limit))
+    results = db.fetch_dicts(cur)
+    cur.close()
+    conn.close()
+
+    return jsonify(results)
+
+
+# ==================== 批次 API ====================
+
+BATCH_MAX_REQUESTS = 20
+
+# 可批次執行的路由：只回傳 JSON 的 GET 讀取端點
+# （不含 /api/events 串流、/api/batch 本身與管理用的 /api/jobs）
+BATCH_ENDPOINTS = frozenset({
+    'api_studios', 'api_studio_actors', 'get_filter_options',
+    'search_productions', 'get_segments', 'api_search_albums', 'api_search_productions',
+    'get_production', 'get_similar_productions', 'get_release_timeline',
+    'query_actors', 'api_search_actors', 'get_actor_suggestions', 'get_actor_filters',
+    'get_actor', 'get_actor_costars', 'get_costar_path',
+})
+
+# 子請求不沿用的標頭：本文、壓縮與條件請求都只屬於批次請求本身
+BATCH_DROPPED_ENVIRON = ('CONTENT_TYPE', 'HTTP_ACCEPT_ENCODING', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+def batch_environ(path):
+    """由目前請求的 WSGI environ 建立 GET 子請求的 environ（保留 cookie 等標頭）"""
+    path, _, query = path.partition('?')
+    environ = {key: value for key, value in request.environ.items() if key not in BATCH_DROPPED_ENVIRON}
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': io.BytesIO(),
+    })
+    return environ
+
+
+def batch_error(path, status, message):
+    return {'path': path, 'status': status, 'body': {'error': message}}
+
+
+def run_batch_request(path):
+    """
+    在目前請求內執行一個 GET 子請求，回傳 {'path', 'status', 'body'}
+    只執行路由對應的處理函式，不經過 before/after_request（壓縮、指標等由批次請求本身處理）
+    """
+    if not path.startswith('/api/'):
+        return batch_error(path, 400, '只能批次查詢 /api/ 下的 GET 路由')
+
+    environ = batch_environ(path)
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match(method='GET')
+    except HTTPException as e:
+        return batch_error(path, e.code, e.description)
+    if endpoint not in BATCH_ENDPOINTS:
+        return batch_error(path, 400, f'{endpoint} 不支援批次查詢')
+
+    # 子請求與批次請求共用 g：暫時取下查詢統計，子請求結束時的 teardown 才不會停止批次請求的統計
+    stats_token = g.pop('query_stats_token', None)
+    try:
+        with app.request_context(environ):
+            try:
+                response = make_response(app.dispatch_request())
+            except HTTPException as e:
+                return batch_error(path, e.code, e.description)
+            except Exception as e:
+                app.logger.exception('批次子請求失敗：%s', path)
+                return batch_error(path, 500, str(e))
+    finally:
+        if stats_token is not None:
+            g.query_stats_token = stats_token
+
+    if response.is_streamed:
+        # 串流回應不會結束，不能等待其內容
+        response.close()
+        return batch_error(path, 400, '串流回應不支援批次查詢')
+    return {'path': path, 'status': response.status_code, 'body': response.get_json(silent=True)}
+
+
+@app.route('/api/batch', methods=['GET'])
+def api_batch():
+    """
+    批次讀取 API：一次 HTTP 請求執行多個 GET 路由
+    參數:
+    - path: 子請求路徑（含查詢字串，可重複，最多 BATCH_MAX_REQUESTS 個），例如
+      /api/batch?path=/api/studios&path=/api/production/12
+      只接受 BATCH_ENDPOINTS 中的路由，其他路由的結果為 status 400
+    回傳 {'results': [{'path', 'status', 'body'}, ...]}，順序與 path 相同
+
+    子請求依序在同一條資料庫連線上執行；psycopg2 連線不能同時執行多個語句，
+    因此沒有實作「可安全並行時平行執行」，省下的是每個請求各自的 HTTP 往返與連線取用
+    """
+    paths = request.args.getlist('path')
+    if not paths:
+        return jsonify({'error': '缺少 path 參數'}), 400
+    if len(paths) > BATCH_MAX_REQUESTS:
+        return jsonify({'error': f'一次最多 {BATCH_MAX_REQUESTS} 個子請求'}), 400
+
+    # 子請求共用一條直接向連線池取得的連線（依讀寫分離規則選擇 replica 或主庫），
+    # 不可經由 get_db_connection()，否則會取回共用連線本身；第一個需要資料庫的子請求才取用連線
+    shared = db.SharedConnection(db.get_connection if recently_wrote() else db.get_read_connection)
+    g.batch_connection = shared
+    try:
+        results = [run_batch_request(path) for path in paths]
+    finally:
+        g.pop('batch_connection', None)
+        shared.release()
+    return jsonify({'results': results})
+
+
+# ==================== 即時更新（Server-Sent Events） ====================
+
+change_feed = ChangeFeed(SSE_MAX_CLIENTS, SSE_HEARTBEAT_INTERVAL)
+
+
+@app.route('/api/events')
+def change_events():
+    """
+    即時更新串流（text/event-stream）：寫入端點提交後推送
+    event: production / actor / studio，data: {"kind", "id", "fields"}（變更的欄位）；
+    event: reset 表示可能遺漏了通知，頁面應重新查詢
+    """
+    subscription = change_feed.subscribe()
+    if subscription is None:
+        return jsonify({'error': '即時更新連線數已達上限'}), 503
+    response = app.response_class(change_feed.stream(subscription), mimetype='text/event-stream')
+    # 串流尚未開始就中斷時 stream() 的 finally 不會執行
+    response.call_on_close(lambda: change_feed.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    # 反向代理（nginx）不要緩衝，通知才會立即送達
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ==================== 管理：慢查詢 ====================
+
+@app.route('/admin/slow_queries')
+def slow_queries_page():
+    """依總耗時列出最慢的查詢形狀（需設定 SLOW_QUERY_MS）"""
+    recorder = slow_query_log.recorder
+    shapes = recorder.worst_shapes() if recorder is not None else []
+    return render_template('slow_queries.html', enabled=recorder is not None, shapes=shapes)
+
+
+@app.route('/admin/slow_queries/<fingerprint>')
+def slow_query_detail_page(fingerprint):
+    """單一查詢形狀的最近記錄與 EXPLAIN (ANALYZE, BUFFERS) 執行計畫"""
+    recorder = slow_query_log.recorder
+    if recorder is None:
+        return redirect(url_for('slow_queries_page'))
+    samples, plan = recorder.shape_detail(fingerprint)
+    if not samples:
+        flash('找不到此查詢形狀的記錄', 'error')
+        return redirect(url_for('slow_queries_page'))
+    return render_template('slow_query_detail.html', samples=samples, plan=plan)
+
+
+# ==================== 管理：重複資料審核 ====================
+
+DUPLICATES_PAGE_SIZE = 50
+
+
+@app.route('/admin/duplicates')
+def duplicates_page():
+    """
+    列出 scripts/find_duplicates.py 找到的疑似重複組合
+    參數: kind（production / actor）、status（pending / duplicate / distinct）、page
+    """
+    kind = request.args.get('kind', 'production')
+    status = request.args.get('status', 'pending')
+    if kind not in DUPLICATE_KINDS:
+        kind = 'production'
+    if status not in DUPLICATE_STATUSES:
+        status = 'pending'
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(DUPLICATE_COUNTS_SQL)
+        counts = {(row['kind'], row['status']): row['count'] for row in cur.fetchall()}
+        sql = DUPLICATE_PRODUCTIONS_SQL if kind == 'production' else DUPLICATE_ACTORS_SQL
+        cur.execute(sql, (status, DUPLICATES_PAGE_SIZE, (page - 1) * DUPLICATES_PAGE_SIZE))
+        candidates = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    total = counts.get((kind, status), 0)
+    return render_template('duplicates.html', kind=kind, status=status, counts=counts,
+                           candidates=candidates, page=page,
+                           total_pages=max((total + DUPLICATES_PAGE_SIZE - 1) // DUPLICATES_PAGE_SIZE, 1),
+                           kinds=DUPLICATE_KINDS, statuses=DUPLICATE_STATUSES)
+
+
+@app.route('/admin/duplicates/<int:candidate_id>', methods=['POST'])
+def review_duplicate(candidate_id):
+    """標記疑似重複組合：duplicate（確認重複，需另行合併）、distinct（不同）或 pending（退回待審）"""
+    status = request.form.get('status', '')
+    back = url_for('duplicates_page', kind=request.form.get('kind'), status=request.form.get('current_status'),
+                   page=request.form.get('page'))
+    if status not in DUPLICATE_STATUSES:
+        flash('無效的審核狀態', 'error')
+        return redirect(back)
+
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(REVIEW_DUPLICATE_SQL, (status, status, candidate_id))
+        conn.commit()
+        if cur.rowcount:
+            flash(f'已將 #{candidate_id} 標記為 {status}', 'success')
+        else:
+            flash('找不到此組合', 'error')
+    except psycopg2.Error as e:
+        conn.rollback()
+        flash(f'資料庫錯誤: {str(e)}', 'error')
+    finally:
+        cur.close()
+        conn.close()
+    return redirect(back)
+
+
+# ==================== 背景工作 ====================
+
+JOB_LIST_LIMIT = 100
+JOB_LOG_LIMIT = 1000
+
+
+def enqueue_job(kind, params):
+    """驗證並排入工作，回傳 (工作 ID, 錯誤訊息)"""
+    params, error = jobs.validate_params(kind, params)
+    if error:
+        return None, error
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        job_id = jobs.enqueue(cur, kind, params)
+        conn.commit()
+        return job_id, None
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def load_job(job_id, after_log_id=0):
+    """工作資料與 after_log_id 之後的輸出；找不到時回傳 (None, [])"""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(jobs.JOB_SQL, (job_id,))
+        job = cur.fetchone()
+        if job is None:
+            return None, []
+        cur.execute(jobs.JOB_LOGS_SQL, (job_id, after_log_id, JOB_LOG_LIMIT))
+        return job, cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    排入背景工作（由 scripts/job_worker.py 執行）
+    JSON: {"kind": 工作類型, "params": {...}}，回傳 202 與工作 ID
+    """
+    data = request.get_json(silent=True) or {}
+    job_id, error = enqueue_job(data.get('kind'), data.get('params'))
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify({'id': job_id, 'status': 'queued', 'url': url_for('get_job', job_id=job_id)}), 202
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    工作狀態、進度與輸出
+    參數:
+    - after: 只回傳此 ID 之後的輸出（輪詢時帶上次最後一筆的 id）
+    """
+    job, logs = load_job(job_id, request.args.get('after', 0, type=int))
+    if job is None:
+        return jsonify({'error': '找不到工作'}), 404
+    job['logs'] = logs
+    return jsonify(job)
+
+
+@app.route('/admin/jobs', methods=['GET', 'POST'])
+def jobs_page():
+    """最近的背景工作；POST 排入新工作"""
+    if request.method == 'POST':
+        kind = request.form.get('kind', '')
+        job_id, error = enqueue_job(kind, request.form.get('params', ''))
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('jobs_page'))
+        flash(f'已排入工作 #{job_id}（{jobs.JOB_KINDS[kind][0]}）', 'success')
+        return redirect(url_for('job_detail_page', job_id=job_id))
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(jobs.JOB_LIST_SQL, (JOB_LIST_LIMIT,))
+        recent = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    return render_template('jobs.html', jobs=recent, kinds=jobs.JOB_KINDS)
+
+
+@app.route('/admin/jobs/<int:job_id>')
+def job_detail_page(job_id):
+    """單一工作的進度與輸出（執行中時頁面輪詢 /api/jobs/<id>）"""
+    job, logs = load_job(job_id)
+    if job is None:
+        flash('找不到此工作', 'error')
+        return redirect(url_for('jobs_page'))
+    return render_template('job_detail.html', job=job, logs=logs, label=jobs.JOB_KINDS.get(job['kind'], ('',))[0])
+
+
+@app.route('/admin/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消尚未開始的工作"""
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(jobs.CANCEL_JOB_SQL, (job_id,))
+        conn.commit()
+        if cur.rowcount:
+            flash(f'已取消工作 #{job_id}', 'success')
+        else:
+            flash('只能取消排隊中的工作', 'error')
+    finally:
+        cur.close()
+        conn.close()
+    return redirect(url_for('job_detail_page', job_id=job_id))
+
+
 # ==================== 啟動應用程式 ====================
 
 if __name__ == '__main__':
@@ -0,0 +1,392 @@
+"""
+GVDB 非同步讀取 API - Quart + asyncpg
+
+只提供唯讀端點，SQL 與 JSON 結構與 app.py 共用 (queries.py)。
+等待資料庫時不佔用執行緒，單一程序可同時處理數百個進行中的查詢；
+實際同時執行的查詢數由 ASYNC_POOL_MAX_SIZE 限制，其餘請求在連線池中排隊。
+
+啟動方式：
+    hypercorn async_app:app --bind 0.0.0.0:5001
+寫入端點與頁面仍由 app.py 提供，可由反向代理將上述 GET 路徑導向本服務。
+"""
+
+import asyncio
+import re
+from functools import wraps
+
+import asyncpg
+import psycopg2
+from quart import Quart, request, jsonify, make_response
+from quart.wrappers.response import DataBody
+
+from actor_matcher import ActorMatcher
+from config import DB_CONFIG, ASYNC_POOL_MIN_SIZE, ASYNC_POOL_MAX_SIZE
+from queries import (
+    STUDIO_LIST_SQL, STUDIO_NAMES_SQL, FILTER_TAGS_SQL, ALL_TAGS_SQL,
+    ALBUM_ACTORS_SQL, PRODUCTION_ACTORS_SQL, SEGMENTS_SQL, SEGMENTS_JSON_SQL, PAGE_SEGMENTS_SQL, group_segments,
+    ALBUM_HIDDEN_NAMES, PRODUCTION_HIDDEN_NAMES,
+    ACTOR_SEARCH_SQL, ACTOR_SUGGESTIONS_SQL, ACTOR_SORT_OPTIONS,
+    ACTOR_BASIC_SQL, ACTOR_GLOBAL_STATS_SQL, ACTOR_LATEST_PRODUCTION_SQL, ACTOR_STUDIO_DETAILS_SQL,
+    PRODUCTION_SQL, PARENT_ALBUM_SQL, PRODUCTION_PERFORMERS_SQL, PRODUCTION_TAGS_SQL,
+    WARMUP_SQL, DATA_VERSION_SQL, make_etag, is_not_modified, build_filter_options, build_search_query, count_query, normalize_array_fields,
+    facet_query, build_facets,
+    build_search_json_query, segments_json_params, db_json_requested,
+    join_actor_names, build_actor_query, build_actor_result, build_production_result,
+    paginate,
+)
+from responses import FastJSONProvider, should_compress, compress_data
+
+app = Quart(__name__)
+app.json = FastJSONProvider(app)
+
+pool = None
+
+
+# ==================== 資料庫連接 ====================
+
+_PLACEHOLDER_RE = re.compile(r'%%|%s')
+
+
+def to_asyncpg(sql):
+    """將 psycopg2 的 %s 佔位符轉換為 asyncpg 的 $1, $2 ..."""
+    counter = 0
+
+    def replace(match):
+        nonlocal counter
+        if match.group(0) == '%%':
+            return '%'
+        counter += 1
+        return f'${counter}'
+
+    return _PLACEHOLDER_RE.sub(replace, sql)
+
+
+async def fetch_all(conn, sql, *params):
+    rows = await conn.fetch(to_asyncpg(sql), *params)
+    return [dict(row) for row in rows]
+
+
+async def fetch_one(conn, sql, *params):
+    row = await conn.fetchrow(to_asyncpg(sql), *params)
+    return dict(row) if row is not None else None
+
+
+# 每條新連線預先準備的參數化語句（以不存在的 id 執行一次，asyncpg 會快取 prepared statement）
+PREPARED_ON_CONNECT = [
+    (SEGMENTS_SQL, (0,)),
+    (ALBUM_ACTORS_SQL, ([],)),
+    (PRODUCTION_ACTORS_SQL, ([], 0)),
+    (ACTOR_BASIC_SQL, (0,)),
+    (ACTOR_GLOBAL_STATS_SQL, (0,)),
+    (ACTOR_LATEST_PRODUCTION_SQL, (0,)),
+    (ACTOR_STUDIO_DETAILS_SQL, (0,)),
+    (PRODUCTION_SQL, (0,)),
+    (PARENT_ALBUM_SQL, (0,)),
+    (PRODUCTION_PERFORMERS_SQL, (0,)),
+    (PRODUCTION_TAGS_SQL, (0,)),
+]
+
+ready = False
+
+
+def connect_matcher():
+    """演員名稱索引的載入連線（ActorMatcher 以 psycopg2 讀取，不佔用 asyncpg 連線池）"""
+    return psycopg2.connect(**DB_CONFIG)
+
+
+# 與 app.py 共用模糊比對；寫入由 app.py 處理，本服務依 GVDB_ACTOR_MATCHER_RELOAD_INTERVAL 定期重新載入
+actor_matcher = ActorMatcher(connect_matcher)
+
+
+def load_actor_matcher():
+    conn = connect_matcher()
+    try:
+        actor_matcher.load(conn)
+    finally:
+        conn.close()
+
+
+async def warm_connection(conn):
+    """新連線建立時預熱 catalog 快取與 prepared statements"""
+    for sql in WARMUP_SQL:
+        await conn.execute(sql)
+    for sql, params in PREPARED_ON_CONNECT:
+        await conn.fetch(to_asyncpg(sql), *params)
+
+
+@app.before_serving
+async def create_pool():
+    """
+    啟動時建立 asyncpg 連線池（與 app.py 的連線各自獨立），min_size 條連線在此預熱完成，
+    並載入演員名稱索引
+    """
+    global pool, ready
+    pool = await asyncpg.create_pool(
+        min_size=ASYNC_POOL_MIN_SIZE,
+        max_size=ASYNC_POOL_MAX_SIZE,
+        init=warm_connection,
+        **DB_CONFIG
+    )
+    await asyncio.to_thread(load_actor_matcher)
+    ready = True
+
+
+@app.after_serving
+async def close_pool():
+    await pool.close()
+
+
+def conditional_response(view):
+    """ETag / Last-Modified 條件式回應（與 app.py 相同的全域資料版本）"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        async with pool.acquire() as conn:
+            version, last_modified = await conn.fetchrow(DATA_VERSION_SQL)
+        etag = make_etag(version)
+
+        if is_not_modified(request, etag, last_modified):
+            response = app.response_class('', status=304)
+        else:
+            response = await make_response(await view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+# ==================== 回應壓縮 ====================
+
+@app.after_request
+async def compress(response):
+    """依 Accept-Encoding 以 brotli / gzip 壓縮較大的回應（同 app.py）"""
+    # 只處理記憶體中的內容，串流與檔案回應原樣送出
+    if not isinstance(response.response, DataBody) or not should_compress(response):
+        return response
+
+    data = compress_data(request, response, await response.get_data())
+    if data is not None:
+        response.set_data(data)
+    return response
+
+
+@app.route('/readyz')
+async def readyz():
+    """就緒檢查：連線池預熱完成且資料庫可連線才回傳 200"""
+    if not ready:
+        return jsonify({'status': 'warming up'}), 503
+    try:
+        async with pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
+    except (OSError, asyncpg.PostgresError) as e:
+        return jsonify({'status': 'database unavailable', 'error': str(e)}), 503
+    return jsonify({'status': 'ready'})
+
+
+# ==================== 查詢作品 ====================
+
+@app.route('/api/filter-options', methods=['GET'])
+@conditional_response
+async def get_filter_options():
+    """取得所有篩選選項 (公司列表、所有 tags，包含圖示和排序)"""
+    async with pool.acquire() as conn:
+        studios = [row['name'] for row in await fetch_all(conn, STUDIO_NAMES_SQL)]
+        tags_result = await fetch_all(conn, FILTER_TAGS_SQL)
+
+    return jsonify(build_filter_options(studios, tags_result))
+
+
+def use_db_json():
+    """是否由 Postgres 直接產生 JSON 回應（同 app.py）"""
+    return db_json_requested(request.args)
+
+
+async def db_json_response(sql, params):
+    """執行回傳單一 JSON 文字的語句，原樣送出不解析"""
+    async with pool.acquire() as conn:
+        body = await conn.fetchval(to_asyncpg(sql), *params)
+    return app.response_class(body, mimetype='application/json')
+
+
+async def resolve_actor_names(conn, row, album_hidden, production_hidden):
+    """將 performer_ids 轉換為演員名稱（與 app.py 相同規則）"""
+    if row['type'] == 'album' and row.get('performer_ids'):
+        names = await conn.fetch(to_asyncpg(ALBUM_ACTORS_SQL), row['performer_ids'])
+        return join_actor_names([r['stage_name'] for r in names], album_hidden)
+    if row.get('performer_ids'):
+        names = await conn.fetch(to_asyncpg(PRODUCTION_ACTORS_SQL), row['performer_ids'], row['id'])
+        return join_actor_names([r['stage_name'] for r in names], production_hidden)
+    return ''
+
+
+@app.route('/api/search', methods=['GET'])
+async def search_productions():
+    """
+    查詢作品 API（參數同 app.py 的 /api/search）
+    本服務沒有 app.py 的結果快取（result_cache.py），每次請求都查詢資料庫
+    """
+    query, params, page, per_page = build_search_query(request.args)
+    with_facets = request.args.get('facets') == '1'
+    include_segments = request.args.get('include_segments') == '1'
+
+    if use_db_json() and not with_facets and not include_segments:
+        return await db_json_response(*build_search_json_query(query, params, page, per_page))
+
+    async with pool.acquire() as conn:
+        total = (await fetch_one(conn, count_query(query), *params))['total']
+
+        facets = None
+        if with_facets:
+            rows = await conn.fetch(to_asyncpg(facet_query(query)), *params)
+            facets = build_facets([tuple(row) for row in rows])
+
+        offset = (page - 1) * per_page
+        query += " LIMIT %s OFFSET %s"
+        results = await fetch_all(conn, query, *params, per_page, offset)
+
+        for row in results:
+            normalize_array_fields(row)
+            row['actors'] = await resolve_actor_names(
+                conn, row, ALBUM_HIDDEN_NAMES, PRODUCTION_HIDDEN_NAMES)
+
+        if include_segments:
+            album_ids = [row['id'] for row in results if row['type'] == 'album']
+            segments = {}
+            if album_ids:
+                segments = group_segments(await fetch_all(conn, PAGE_SEGMENTS_SQL, album_ids))
+            for row in results:
+                if row['type'] == 'album':
+                    row['segments'] = segments.get(row['id'], [])
+
+    result = paginate(total, page, per_page, results)
+    if facets is not None:
+        result['facets'] = facets
+    return jsonify(result)
+
+
+@app.route('/api/segments/<int:parent_id>', methods=['GET'])
+@conditional_response
+async def get_segments(parent_id):
+    """取得專輯的子片段"""
+    if use_db_json():
+        return await db_json_response(SEGMENTS_JSON_SQL, segments_json_params(parent_id))
+
+    async with pool.acquire() as conn:
+        results = await fetch_all(conn, SEGMENTS_SQL, parent_id)
+
+        for row in results:
+            normalize_array_fields(row)
+            row['actors'] = await resolve_actor_names(conn, row, (), ())
+
+    return jsonify(results)
+
+
+# ==================== 演員查詢 ====================
+
+@app.route('/api/actors/search', methods=['GET'])
+async def api_search_actors():
+    """搜尋演員 (for search page autocomplete)"""
+    query = request.args.get('q', '')
+
+    # 優先使用程序內的模糊比對索引（尚未載入時改用資料庫查詢）
+    if query.strip():
+        results = actor_matcher.search(query)
+        if results is not None:
+            return jsonify(results)
+
+    async with pool.acquire() as conn:
+        results = await fetch_all(conn, ACTOR_SEARCH_SQL, f'%{query}%', f'%{query}%')
+
+    return jsonify(results)
+
+
+@app.route('/api/actors/filters', methods=['GET'])
+async def get_actor_filters():
+    """取得演員查詢篩選選項（公司列表、排序選項）"""
+    async with pool.acquire() as conn:
+        studios = await fetch_all(conn, STUDIO_LIST_SQL)
+
+    return jsonify({
+        'studios': studios,
+        'sort_options': ACTOR_SORT_OPTIONS
+    })
+
+
+@app.route('/api/actors/suggestions', methods=['GET'])
+async def get_actor_suggestions():
+    """取得演員建議（自動補齊）"""
+    query = request.args.get('q', '').strip()
+
+    if not query:
+        return jsonify([])
+
+    results = actor_matcher.suggestions(query)
+    if results is not None:
+        return jsonify(results)
+
+    search_pattern = f'%{query}%'
+    exact_pattern = f'{query}%'
+    async with pool.acquire() as conn:
+        results = await fetch_all(conn, ACTOR_SUGGESTIONS_SQL,
+                                  search_pattern, search_pattern, exact_pattern)
+
+    return jsonify(results)
+
+
+@app.route('/api/actors/query', methods=['GET'])
+async def query_actors():
+    """演員查詢 API（參數同 app.py 的 /api/actors/query；同樣沒有結果快取）"""
+    try:
+        count_sql, page_sql, params, page, per_page = build_actor_query(request.args)
+
+        async with pool.acquire() as conn:
+            total = (await fetch_one(conn, count_sql, *params))['total']
+            actor_ids = [row['actor_id'] for row in await fetch_all(conn, page_sql, *params)]
+
+            results = []
+            for actor_id in actor_ids:
+                actor = await fetch_one(conn, ACTOR_BASIC_SQL, actor_id)
+                global_stats = await fetch_one(conn, ACTOR_GLOBAL_STATS_SQL, actor_id)
+                latest_prod = await fetch_one(conn, ACTOR_LATEST_PRODUCTION_SQL, actor_id)
+                studio_details = await fetch_all(conn, ACTOR_STUDIO_DETAILS_SQL, actor_id)
+                results.append(build_actor_result(actor, global_stats, latest_prod, studio_details))
+
+        return jsonify(paginate(total, page, per_page, results))
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== 取得作品 ====================
+
+@app.route('/api/production/<int:production_id>', methods=['GET'])
+@conditional_response
+async def get_production(production_id):
+    """取得作品完整資料（用於編輯）"""
+    try:
+        async with pool.acquire() as conn:
+            production = await fetch_one(conn, PRODUCTION_SQL, production_id)
+            if not production:
+                return jsonify({'error': '找不到作品'}), 404
+
+            parent_album = None
+            if production['parent_id']:
+                parent_album = await fetch_one(conn, PARENT_ALBUM_SQL, production['parent_id'])
+
+            performers = []
+            tags = []
+            if production['type'] in ['single', 'segment']:
+                performers = await fetch_all(conn, PRODUCTION_PERFORMERS_SQL, production_id)
+                tags = await fetch_all(conn, PRODUCTION_TAGS_SQL, production_id)
+
+            all_tags = await fetch_all(conn, ALL_TAGS_SQL)
+
+        return jsonify(build_production_result(production, parent_album, performers, tags, all_tags))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
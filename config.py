@@ -1,12 +1,85 @@
+"""
+GVDB 設定 - 由環境變數（或專案根目錄的 .env）讀取，未設定時使用預設值
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
 # PostgreSQL 連接設定
 DB_CONFIG = {
-    'host': 'localhost',        # 資料庫主機（通常是 localhost）
-    'port': 5432,               # PostgreSQL 預設埠號
-    'database': 'gvdb_red',         # 你的資料庫名稱（請修改成實際名稱）
-    'user': 'postgres',         # 使用者名稱
-    'password': 'c04xup6red' # 密碼（請修改成實際密碼）
+    'host': os.environ.get('GVDB_DB_HOST', 'localhost'),        # 資料庫主機（通常是 localhost）
+    'port': int(os.environ.get('GVDB_DB_PORT', 5432)),          # PostgreSQL 預設埠號
+    'database': os.environ.get('GVDB_DB_NAME', 'gvdb_red'),     # 你的資料庫名稱
+    'user': os.environ.get('GVDB_DB_USER', 'postgres'),         # 使用者名稱
+    'password': os.environ.get('GVDB_DB_PASSWORD', 'c04xup6red')  # 密碼
 }
 
 # Flask 設定
-SECRET_KEY = 'your-secret-key-here'  # 用於 session 加密
-DEBUG = True  # 開發模式
\ No newline at end of file
+SECRET_KEY = os.environ.get('GVDB_SECRET_KEY', 'your-secret-key-here')  # 用於 session 加密
+DEBUG = _env_bool('GVDB_DEBUG', True)  # 開發模式（正式環境請設 GVDB_DEBUG=0）
+
+# 同步 API（app.py）連線池設定
+DB_POOL_MIN_SIZE = int(os.environ.get('GVDB_DB_POOL_MIN_SIZE', 2))    # 啟動時預先開啟的連線數
+DB_POOL_MAX_SIZE = int(os.environ.get('GVDB_DB_POOL_MAX_SIZE', 10))   # 每個 worker 的連線上限
+DB_POOL_TIMEOUT = float(os.environ.get('GVDB_DB_POOL_TIMEOUT', 10))   # 等待可用連線的秒數
+
+# 唯讀 replica：以逗號分隔的連線字串（例如 'host=replica1,host=localhost port=5433'），未指定的欄位沿用 DB_CONFIG
+DB_REPLICAS = [dsn.strip() for dsn in os.environ.get('GVDB_DB_REPLICAS', '').split(',') if dsn.strip()]
+REPLICA_MAX_LAG = float(os.environ.get('GVDB_REPLICA_MAX_LAG', 5))                # 延遲超過此秒數的 replica 暫停使用
+REPLICA_CHECK_INTERVAL = float(os.environ.get('GVDB_REPLICA_CHECK_INTERVAL', 5))  # 健康檢查間隔秒數
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('GVDB_READ_YOUR_WRITES_SECONDS', 10))  # 寫入後此客戶端的讀取改走主庫的秒數
+
+# 參考資料（公司、標籤）程序內快取秒數
+REFERENCE_CACHE_TTL = float(os.environ.get('GVDB_REFERENCE_CACHE_TTL', 30))
+
+# /api/search 與 /api/actors/query 的結果快取：每個 worker 最多 RESULT_CACHE_SIZE 筆（0 表示停用）
+RESULT_CACHE_SIZE = int(os.environ.get('GVDB_RESULT_CACHE_SIZE', 500))
+RESULT_CACHE_TTL = float(os.environ.get('GVDB_RESULT_CACHE_TTL', 60))                            # 單筆結果的最長保存秒數
+RESULT_CACHE_VERSION_INTERVAL = float(os.environ.get('GVDB_RESULT_CACHE_VERSION_INTERVAL', 1))  # 重新讀取資料版本的間隔秒數
+
+# 演員名稱模糊比對索引（actor_matcher.py）：全量重新載入的間隔秒數（其他 worker 的新增 / 修改於此時生效）
+ACTOR_MATCHER_RELOAD_INTERVAL = float(os.environ.get('GVDB_ACTOR_MATCHER_RELOAD_INTERVAL', 600))
+
+# 即時更新（/api/events，Server-Sent Events）：每條串流在整個連線期間佔用一個 worker 執行緒，
+# gunicorn.conf.py 為串流另外保留同數量的執行緒（不佔用 GVDB_THREADS）；每個 worker 超過此數時回傳 503
+SSE_MAX_CLIENTS = int(os.environ.get('GVDB_SSE_MAX_CLIENTS', 8))
+SSE_HEARTBEAT_INTERVAL = float(os.environ.get('GVDB_SSE_HEARTBEAT_INTERVAL', 15))   # 閒置時送出 keepalive 的間隔秒數
+
+# 背景工作（scripts/job_worker.py）
+JOB_WORKERS = int(os.environ.get('GVDB_JOB_WORKERS', 2))                          # 同時執行的工作數（worker 程序數）
+JOB_POLL_INTERVAL = float(os.environ.get('GVDB_JOB_POLL_INTERVAL', 30))           # 沒有收到通知時重新檢查佇列的秒數
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('GVDB_JOB_HEARTBEAT_INTERVAL', 10))
+JOB_STALE_SECONDS = float(os.environ.get('GVDB_JOB_STALE_SECONDS', 120))          # 心跳逾時多久視為 worker 已異常結束
+JOB_MAX_ATTEMPTS = int(os.environ.get('GVDB_JOB_MAX_ATTEMPTS', 3))
+
+# 相似作品：每部作品保存的相似作品數（scripts/build_similar_productions.py 與增量更新共用）
+SIMILAR_TOP_K = int(os.environ.get('GVDB_SIMILAR_TOP_K', 10))
+
+# 回應壓縮設定
+COMPRESS_MIN_SIZE = int(os.environ.get('GVDB_COMPRESS_MIN_SIZE', 1024))   # 小於此位元組數的回應不壓縮
+GZIP_LEVEL = int(os.environ.get('GVDB_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('GVDB_BROTLI_QUALITY', 4))             # 動態回應用較低品質換取速度
+
+# /api/search 與 /api/segments 由 Postgres 直接產生 JSON（請求可用 ?db_json=0/1 覆寫）
+DB_JSON_RESPONSES = _env_bool('GVDB_DB_JSON_RESPONSES', False)
+
+# 查詢統計：回應附上 Server-Timing 標頭；單一請求超過 QUERY_BUDGET 個 SQL 語句時記錄警告（0 表示不檢查）
+SERVER_TIMING = _env_bool('GVDB_SERVER_TIMING', True)
+QUERY_BUDGET = int(os.environ.get('GVDB_QUERY_BUDGET', 25))
+
+# 慢查詢記錄：超過 SLOW_QUERY_MS 毫秒的語句連同執行計畫寫入本機 SQLite（0 表示停用）
+SLOW_QUERY_MS = float(os.environ.get('GVDB_SLOW_QUERY_MS', 0))
+SLOW_QUERY_DB = os.environ.get('GVDB_SLOW_QUERY_DB', 'slow_queries.sqlite3')
+SLOW_QUERY_PLAN_INTERVAL = float(os.environ.get('GVDB_SLOW_QUERY_PLAN_INTERVAL', 600))   # 同一查詢形狀重新擷取計畫的最短秒數
+
+# 非同步讀取 API（async_app.py）連線池設定
+ASYNC_POOL_MIN_SIZE = int(os.environ.get('GVDB_ASYNC_POOL_MIN_SIZE', 2))    # 最少保持的連線數
+ASYNC_POOL_MAX_SIZE = int(os.environ.get('GVDB_ASYNC_POOL_MAX_SIZE', 20))   # 同時執行查詢的最大連線數（其餘請求在池中等待，不佔用執行緒）
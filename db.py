@@ -0,0 +1,461 @@
+"""
+GVDB 資料庫連線池
+
+get_connection() 取得的連線呼叫 close() 時會歸還連線池而非真正斷線，
+因此 app.py 既有的 conn.close() 寫法不需修改。
+連線池在每個程序（gunicorn worker）第一次使用時才建立，fork 之後不共用連線。
+設定 DB_REPLICAS 時，get_read_connection() 由健康且延遲在 REPLICA_MAX_LAG 內的 replica 提供連線，
+沒有可用的 replica 時退回主庫（見 ReplicaSet）。
+連線建立的所有 cursor 都會統計語句數、資料庫時間與取回列數（見 QueryStats），
+超過 SLOW_QUERY_MS 的語句交給 slow_query_log 記錄。
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+import psycopg2
+import psycopg2.extensions
+
+import metrics
+import slow_query_log
+from config import (
+    DB_CONFIG, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, SLOW_QUERY_MS,
+    DB_REPLICAS, REPLICA_MAX_LAG, REPLICA_CHECK_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """等待可用連線逾時"""
+
+
+# ==================== 查詢統計 ====================
+
+class QueryStats:
+    """單一請求的 SQL 統計"""
+
+    def __init__(self, route=None):
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current_stats = ContextVar('gvdb_query_stats', default=None)
+
+
+def start_query_stats(route=None):
+    """開始統計目前請求（回傳 token 供 stop_query_stats 使用）"""
+    return _current_stats.set(QueryStats(route))
+
+
+def current_query_stats():
+    """目前請求的 QueryStats；不在請求中時為 None"""
+    return _current_stats.get()
+
+
+def stop_query_stats(token):
+    _current_stats.reset(token)
+
+
+_slow_threshold = SLOW_QUERY_MS / 1000
+
+
+class InstrumentedCursorMixin:
+    """記錄每個語句的執行時間與取回列數到目前請求的 QueryStats"""
+
+    def execute(self, query, vars=None):
+        stats = _current_stats.get()
+        if stats is None and slow_query_log.recorder is None:
+            return super().execute(query, vars)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.queries += 1
+                stats.db_time += elapsed
+            if slow_query_log.recorder is not None and elapsed >= _slow_threshold:
+                slow_query_log.recorder.record(self, query, vars, elapsed,
+                                               stats.route if stats is not None else None)
+
+    def executemany(self, query, vars_list):
+        stats = _current_stats.get()
+        if stats is None:
+            return super().executemany(query, vars_list)
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - start
+
+    def fetchone(self):
+        row = super().fetchone()
+        stats = _current_stats.get()
+        if stats is not None and row is not None:
+            stats.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.rows += len(rows)
+        return rows
+
+
+_instrumented_classes = {}
+
+
+def instrumented_cursor_class(base):
+    """為 cursor 類別（cursor、RealDictCursor ...）產生對應的統計版本"""
+    cls = _instrumented_classes.get(base)
+    if cls is None:
+        cls = type(f'Instrumented{base.__name__}', (InstrumentedCursorMixin, base), {})
+        _instrumented_classes[base] = cls
+    return cls
+
+
+# ==================== 連線池 ====================
+
+class PooledConnection(psycopg2.extensions.connection):
+    """close() 時歸還連線池的連線；建立的 cursor 皆會記錄查詢統計"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.idle = False
+        # 每次借出時遞增，用來判斷連線是否仍是同一次借出（見 app.release_db_connections）
+        self.lease = 0
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = instrumented_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+    def close(self):
+        if self.pool is not None and not self.closed:
+            # 重複 close() 不會重複歸還
+            if not self.idle:
+                self.pool.release(self)
+        else:
+            super().close()
+
+
+class SharedConnection:
+    """
+    多個處理函式共用的連線（/api/batch 的子請求）：第一次使用時才向 connect() 取得連線，
+    close() 不歸還連線池，由建立者在全部完成後呼叫 release()
+    connect 必須直接向連線池取得連線（get_read_connection / get_connection），
+    不可經由會回傳共用連線本身的函式（如 app.get_db_connection），否則會無限遞迴
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._conn = None
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            self._conn = self._connect()
+        return getattr(self._conn, name)
+
+    def close(self):
+        # 子請求可能留下失敗的交易，結束時回復以免影響下一個子請求
+        if self._conn is not None and \
+                self._conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            self._conn.rollback()
+
+    def release(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ConnectionPool:
+    """執行緒安全的 LIFO 連線池（最近歸還的連線優先使用，讓閒置連線自然老化）"""
+
+    def __init__(self, min_size, max_size, timeout, name='primary', **dsn):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.dsn = dsn
+        self.size = 0
+        self.checkouts = 0
+        self._idle = deque()
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self.dsn)
+        conn.pool = self
+        metrics.DB_CONNECTIONS_OPENED.inc()
+        return conn
+
+    def _resize(self, delta):
+        """調整連線數（需持有 self._cond）"""
+        self.size += delta
+        metrics.DB_POOL_SIZE.labels(self.name).set(self.size)
+
+    def get(self):
+        """取得連線；池已滿時最多等待 timeout 秒"""
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if conn.closed:
+                        self._resize(-1)
+                        continue
+                    conn.idle = False
+                    conn.lease += 1
+                    self.checkouts += 1
+                    metrics.DB_CONNECTION_CHECKOUTS.inc()
+                    return conn
+                if self.size < self.max_size:
+                    self._resize(1)
+                    break
+                if not self._cond.wait(self.timeout):
+                    raise PoolTimeout(f'等待資料庫連線逾時（{self.timeout} 秒）')
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._resize(-1)
+                self._cond.notify()
+            raise
+        conn.lease += 1
+        with self._cond:
+            self.checkouts += 1
+        metrics.DB_CONNECTION_CHECKOUTS.inc()
+        return conn
+
+    def release(self, conn):
+        """歸還連線：結束未完成的交易，壞掉的連線直接丟棄"""
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            conn.idle = True
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        conn.pool = None
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._resize(-1)
+            self._cond.notify()
+
+    def warm(self, statements=()):
+        """預先開啟 min_size 條連線，並在每條連線上執行 statements 以載入後端的 catalog 快取"""
+        conns = [self.get() for _ in range(self.min_size)]
+        try:
+            for conn in conns:
+                cur = conn.cursor()
+                for sql in statements:
+                    cur.execute(sql)
+                cur.close()
+        finally:
+            for conn in conns:
+                conn.close()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._discard(conn)
+
+
+# ==================== Replica ====================
+
+# 複寫延遲（秒）：已重播到最新收到的 WAL 時為 0；不是 standby（例如測試用的獨立實例）時為 NULL，視為 0
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def replica_dsn(conninfo):
+    """將 replica 的連線字串（'host=... port=...' 或 URI）覆蓋在 DB_CONFIG 上，未指定的欄位沿用主庫設定"""
+    parsed = psycopg2.extensions.parse_dsn(conninfo)
+    if 'dbname' in parsed:
+        parsed['database'] = parsed.pop('dbname')
+    return {**DB_CONFIG, **parsed}
+
+
+class Replica:
+    def __init__(self, index, conninfo):
+        dsn = replica_dsn(conninfo)
+        self.label = f"{dsn.get('host')}:{dsn.get('port')}"
+        self.pool = ConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT,
+                                   name=f'replica{index}', **dsn)
+        # 第一次健康檢查完成前不使用
+        self.healthy = False
+        self.lag = None
+        self.error = None
+
+
+class ReplicaSet:
+    """
+    唯讀連線的路由：輪流使用健康的 replica，全部不可用時退回主庫。
+    背景執行緒每 REPLICA_CHECK_INTERVAL 秒檢查各 replica 的連線與延遲；
+    取得連線失敗的 replica 立即標記為不健康，直到下一次檢查成功。
+    """
+
+    def __init__(self, conninfos, primary):
+        self.primary = primary
+        self.replicas = [Replica(i, conninfo) for i, conninfo in enumerate(conninfos, 1)]
+        self._cycle = itertools.cycle(self.replicas)
+        self._stop = threading.Event()
+        self._thread = None
+        if self.replicas:
+            self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            if self._stop.wait(REPLICA_CHECK_INTERVAL):
+                return
+
+    def check(self):
+        for replica in self.replicas:
+            try:
+                conn = replica.pool.get()
+                try:
+                    cur = conn.cursor()
+                    cur.execute(REPLICA_LAG_SQL)
+                    lag = cur.fetchone()[0]
+                    cur.close()
+                finally:
+                    conn.close()
+            except psycopg2.Error as e:
+                if replica.healthy:
+                    logger.warning('replica %s 無法連線，改用其他連線：%s', replica.label, e)
+                replica.healthy, replica.lag, replica.error = False, None, str(e)
+                continue
+
+            replica.lag = float(lag) if lag is not None else 0.0
+            replica.error = None
+            healthy = replica.lag <= REPLICA_MAX_LAG
+            if replica.healthy and not healthy:
+                logger.warning('replica %s 延遲 %.1f 秒，超過 %s 秒，暫停使用', replica.label, replica.lag, REPLICA_MAX_LAG)
+            replica.healthy = healthy
+
+    def get(self):
+        """取得唯讀連線"""
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if not replica.healthy:
+                continue
+            try:
+                return replica.pool.get()
+            except psycopg2.OperationalError as e:
+                logger.warning('replica %s 取得連線失敗，改用其他連線：%s', replica.label, e)
+                replica.healthy, replica.error = False, str(e)
+        return self.primary.get()
+
+    def warm(self, statements=()):
+        """檢查 replica 狀態並預熱健康的 replica 連線池（失敗只記錄，不影響主庫）"""
+        self.check()
+        for replica in self.replicas:
+            if replica.healthy:
+                try:
+                    replica.pool.warm(statements)
+                except psycopg2.Error as e:
+                    logger.warning('replica %s 預熱失敗：%s', replica.label, e)
+
+    def status(self):
+        return [{'replica': r.label, 'healthy': r.healthy, 'lag': r.lag, 'error': r.error}
+                for r in self.replicas]
+
+    def close(self):
+        self._stop.set()
+        for replica in self.replicas:
+            replica.pool.close_all()
+
+
+_pool = None
+_replicas = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _ensure_pools():
+    """建立目前程序的主庫連線池與 replica 路由（fork 後自動重新建立）"""
+    global _pool, _replicas, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, **DB_CONFIG)
+                _replicas = ReplicaSet(DB_REPLICAS, _pool)
+                _pool_pid = os.getpid()
+
+
+def get_pool():
+    """取得目前程序的主庫連線池"""
+    _ensure_pools()
+    return _pool
+
+
+def get_replicas():
+    """取得目前程序的 replica 路由"""
+    _ensure_pools()
+    return _replicas
+
+
+def get_connection():
+    """從主庫連線池取得連線（寫入與需要讀到最新資料的請求）"""
+    return get_pool().get()
+
+
+def get_read_connection():
+    """取得唯讀連線：健康的 replica，沒有時為主庫"""
+    return get_replicas().get()
+
+
+def fetch_dicts(cur):
+    """
+    以一般 cursor 取回 tuple 列再組成 dict
+    （比 RealDictCursor 在 Python 端逐欄建構 RealDictRow 省 CPU）
+    """
+    columns = [col.name for col in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def fetch_dict(cur):
+    """fetch_dicts 的單列版本，沒有資料時回傳 None"""
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([col.name for col in cur.description], row))
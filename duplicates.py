@@ -0,0 +1,244 @@
+"""
+GVDB 重複資料偵測
+
+scripts/find_duplicates.py 以分組鍵（blocking）把可能重複的作品 / 演員放進同一組，
+只在組內逐對評分，分數達門檻的組合寫入 duplicate_candidates，由 /admin/duplicates 審核。
+
+- 作品分組鍵：正規化代碼（'[COCODV488][COAT1804]' 的每個片段各一個鍵）、公司 + 發行月份、
+  標題中最少見的兩個 bigram
+- 演員分組鍵：正規化名稱（actor_tag 與各藝名）、名稱中最少見的兩個 trigram
+- 超過 MAX_BLOCK_SIZE 的分組太常見、沒有區辨力，略過
+- 評分在多個行程中平行計算，每個 worker 持有一份記錄，任務只傳送分組的 ID 清單
+
+同一專輯的片段、專輯與自己的片段不視為重複；已審核（duplicate / distinct）的組合重新執行時保留。
+"""
+
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+
+from actor_matcher import normalize, trigrams
+
+# ==================== 讀取資料 ====================
+
+# 片段沿用所屬專輯的公司與發行日期（effective_*，見 migrations/0012）
+PRODUCTIONS_SQL = """
+    SELECT id, code, title, parent_id,
+           effective_studio_id AS studio_id,
+           effective_release_date AS release_date
+    FROM productions
+"""
+
+# 匿名 / 特殊演員池與 STUDIO_ 自動生成的演員不列入
+ACTORS_SQL = """
+    SELECT a.id, a.actor_tag,
+           COALESCE(array_agg(sn.stage_name) FILTER (WHERE sn.id IS NOT NULL), '{}') AS stage_names,
+           COALESCE(array_agg(DISTINCT sn.studio_id) FILTER (WHERE sn.id IS NOT NULL), '{}') AS studio_ids
+    FROM actors a
+    LEFT JOIN stage_names sn ON sn.actor_id = a.id
+    WHERE a.actor_tag NOT LIKE 'STUDIO\\_%'
+      AND a.actor_tag NOT IN ('ANONYMOUS_POOL', 'UNKNOWN_POOL', 'GIRL_POOL')
+    GROUP BY a.id
+"""
+
+# ==================== 審核頁面 ====================
+
+DUPLICATE_COUNTS_SQL = """
+    SELECT kind, status, COUNT(*) AS count
+    FROM duplicate_candidates
+    GROUP BY kind, status
+"""
+
+DUPLICATE_PRODUCTIONS_SQL = """
+    SELECT d.id, d.score, d.details, d.status, d.detected_at,
+           a.id AS left_id, a.code AS left_code, a.title AS left_title, a.type AS left_type,
+           a.effective_release_date AS left_release_date, sa.name AS left_studio,
+           b.id AS right_id, b.code AS right_code, b.title AS right_title, b.type AS right_type,
+           b.effective_release_date AS right_release_date, sb.name AS right_studio
+    FROM duplicate_candidates d
+    JOIN productions a ON a.id = d.left_id
+    JOIN productions b ON b.id = d.right_id
+    LEFT JOIN studios sa ON sa.id = a.effective_studio_id
+    LEFT JOIN studios sb ON sb.id = b.effective_studio_id
+    WHERE d.kind = 'production' AND d.status = %s
+    ORDER BY d.score DESC, d.id
+    LIMIT %s OFFSET %s
+"""
+
+_ACTOR_NAMES = """(
+        SELECT string_agg(sn.stage_name || '（' || COALESCE(s.name, '?') || '）', ', ' ORDER BY sn.stage_name)
+        FROM stage_names sn
+        LEFT JOIN studios s ON s.id = sn.studio_id
+        WHERE sn.actor_id = {alias}.id
+    )"""
+
+DUPLICATE_ACTORS_SQL = f"""
+    SELECT d.id, d.score, d.details, d.status, d.detected_at,
+           a.id AS left_id, a.actor_tag AS left_actor_tag, {_ACTOR_NAMES.format(alias='a')} AS left_stage_names,
+           b.id AS right_id, b.actor_tag AS right_actor_tag, {_ACTOR_NAMES.format(alias='b')} AS right_stage_names
+    FROM duplicate_candidates d
+    JOIN actors a ON a.id = d.left_id
+    JOIN actors b ON b.id = d.right_id
+    WHERE d.kind = 'actor' AND d.status = %s
+    ORDER BY d.score DESC, d.id
+    LIMIT %s OFFSET %s
+"""
+
+REVIEW_DUPLICATE_SQL = """
+    UPDATE duplicate_candidates
+    SET status = %s, reviewed_at = CASE WHEN %s = 'pending' THEN NULL ELSE CURRENT_TIMESTAMP END
+    WHERE id = %s
+"""
+
+KINDS = ['production', 'actor']
+STATUSES = ['pending', 'duplicate', 'distinct']
+
+# ==================== 分組與評分 ====================
+
+# 超過此大小的分組略過（例如大公司某個月的所有作品、很常見的藝名）
+MAX_BLOCK_SIZE = 200
+
+CODE_PART_PATTERN = re.compile(r'([A-Za-z]+)[-_ ]*0*(\d+)')
+
+
+def code_parts(code):
+    """代碼中的每個「字母 + 數字」片段，去掉分隔符號與數字前導 0：'[COAT-01804]' → {'COAT1804'}"""
+    parts = {letters.upper() + digits for letters, digits in CODE_PART_PATTERN.findall(code or '')}
+    if not parts:
+        whole = normalize(code).upper()
+        if whole:
+            parts.add(whole)
+    return frozenset(parts)
+
+
+def bigrams(text):
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1)) if len(text) > 1 else frozenset([text]) - {''}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def prepare_productions(rows):
+    """(id, code, title, parent_id, studio_id, release_date) → {id: 評分用的記錄}"""
+    records = {}
+    for production_id, code, title, parent_id, studio_id, release_date in rows:
+        records[production_id] = (
+            code_parts(code),
+            normalize(code).upper(),
+            bigrams(normalize(title)),
+            parent_id,
+            studio_id,
+            (release_date or '')[:7] or None,
+        )
+    return records
+
+
+def prepare_actors(rows):
+    """(id, actor_tag, stage_names, studio_ids) → {id: ([(正規化名稱, trigram)], 公司集合)}"""
+    records = {}
+    for actor_id, actor_tag, stage_names, studio_ids in rows:
+        names = {normalize(name) for name in [actor_tag] + list(stage_names)} - {''}
+        records[actor_id] = ([(name, frozenset(trigrams(name))) for name in sorted(names)], frozenset(studio_ids))
+    return records
+
+
+def _rarest(grams, frequency, count=2):
+    return sorted(grams, key=lambda gram: (frequency[gram], gram))[:count]
+
+
+def production_blocks(records, max_block=MAX_BLOCK_SIZE):
+    """產生各分組的作品 ID 清單"""
+    blocks = {}
+    title_frequency = Counter(gram for record in records.values() for gram in record[2])
+    for production_id, (parts, _, title_grams, _, studio_id, month) in records.items():
+        keys = [('c', part) for part in parts]
+        if studio_id is not None and month:
+            keys.append(('s', studio_id, month))
+        keys.extend(('t', gram) for gram in _rarest(title_grams, title_frequency))
+        for key in keys:
+            blocks.setdefault(key, []).append(production_id)
+    return [ids for ids in blocks.values() if 1 < len(ids) <= max_block]
+
+
+def actor_blocks(records, max_block=MAX_BLOCK_SIZE):
+    blocks = {}
+    gram_frequency = Counter(gram for names, _ in records.values() for _, grams in names for gram in grams)
+    for actor_id, (names, _) in records.items():
+        keys = set()
+        for name, grams in names:
+            keys.add(('n', name))
+            keys.update(('g', gram) for gram in _rarest(grams, gram_frequency))
+        for key in keys:
+            blocks.setdefault(key, []).append(actor_id)
+    return [ids for ids in blocks.values() if 1 < len(ids) <= max_block]
+
+
+def score_productions(a, b):
+    """回傳 (分數, 明細)；同一專輯的片段或專輯與自己的片段回傳 None"""
+    parts_a, code_a, title_a, parent_a, studio_a, month_a = a[1]
+    parts_b, code_b, title_b, parent_b, studio_b, month_b = b[1]
+    if parent_a == b[0] or parent_b == a[0] or (parent_a is not None and parent_a == parent_b):
+        return None
+
+    if parts_a & parts_b:
+        code = 1.0
+    else:
+        code = SequenceMatcher(None, code_a, code_b).ratio() if code_a and code_b else 0.0
+    title = jaccard(title_a, title_b)
+    same_studio = studio_a is not None and studio_a == studio_b
+    same_month = month_a is not None and month_a == month_b
+    score = 0.55 * code + 0.3 * title + 0.1 * same_studio + 0.05 * same_month
+    return score, {'code': round(code, 3), 'title': round(title, 3),
+                   'same_studio': same_studio, 'same_month': same_month}
+
+
+def score_actors(a, b):
+    """名稱兩兩比對取最相似的一組（正規化後相同為 1.0，否則取 trigram 相似度）"""
+    names_a, studios_a = a[1]
+    names_b, studios_b = b[1]
+    best, pair = 0.0, None
+    for name_a, grams_a in names_a:
+        for name_b, grams_b in names_b:
+            similarity = 1.0 if name_a == name_b else jaccard(grams_a, grams_b)
+            if similarity > best:
+                best, pair = similarity, [name_a, name_b]
+    if pair is None:
+        return None
+    return best, {'names': pair, 'shared_studios': len(studios_a & studios_b)}
+
+
+SCORERS = {'production': score_productions, 'actor': score_actors}
+
+# ==================== 平行評分（worker 行程） ====================
+
+_worker = {}
+
+
+def init_worker(kind, records, threshold):
+    """ProcessPoolExecutor 的 initializer：記錄在 worker 啟動時傳入一次（fork 時不需序列化）"""
+    _worker['score'] = SCORERS[kind]
+    _worker['records'] = records
+    _worker['threshold'] = threshold
+
+
+def score_blocks(blocks):
+    """對一批分組內的所有組合評分，回傳 [(left_id, right_id, score, details)]（left_id < right_id）"""
+    score, records, threshold = _worker['score'], _worker['records'], _worker['threshold']
+    results = []
+    seen = set()
+    for ids in blocks:
+        ids = sorted(ids)
+        for i, left in enumerate(ids):
+            a = (left, records[left])
+            for right in ids[i + 1:]:
+                if (left, right) in seen:
+                    continue
+                seen.add((left, right))
+                scored = score(a, (right, records[right]))
+                if scored is not None and scored[0] >= threshold:
+                    results.append((left, right, scored[0], scored[1]))
+    return results
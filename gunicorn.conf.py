@@ -0,0 +1,47 @@
+"""
+GVDB gunicorn 設定 - 所有值皆可由環境變數覆寫
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+preload_app 讓 master 先載入程式碼再 fork（worker 共用記憶體頁、啟動更快）；
+資料庫連線池在每個 worker 內建立，並於 worker 開始接收流量前完成預熱。
+"""
+
+import multiprocessing
+import os
+import sys
+
+# 讀取 config（同時載入 .env）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import SSE_MAX_CLIENTS  # noqa: E402
+
+bind = os.environ.get('GVDB_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GVDB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# /api/events 的串流在整個連線期間佔用一個執行緒：另外保留 SSE_MAX_CLIENTS 條，GVDB_THREADS 條都留給一般請求
+threads = int(os.environ.get('GVDB_THREADS', 4)) + SSE_MAX_CLIENTS
+timeout = int(os.environ.get('GVDB_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GVDB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GVDB_KEEPALIVE', 5))
+preload_app = True
+
+accesslog = os.environ.get('GVDB_ACCESS_LOG', '-')
+errorlog = os.environ.get('GVDB_ERROR_LOG', '-')
+loglevel = os.environ.get('GVDB_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """worker 初始化完成、開始接收請求之前：預熱連線池、查詢規劃與參考資料快取"""
+    from app import warmup
+    try:
+        warmup()
+        worker.log.info('worker %s warmed up', worker.pid)
+    except Exception:
+        # 資料庫暫時無法連線時仍啟動 worker，/readyz 會回報 503 直到預熱成功
+        worker.log.exception('worker %s warmup failed', worker.pid)
+
+
+def child_exit(server, worker):
+    """worker 結束時清除其 Prometheus 多程序指標檔（PROMETHEUS_MULTIPROC_DIR）"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
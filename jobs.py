@@ -0,0 +1,151 @@
+"""
+GVDB 背景工作佇列
+
+web 端（app.py）只呼叫 enqueue() 寫入 jobs 並通知 worker；
+實際執行在 scripts/job_worker.py 的 worker 程序（以 FOR UPDATE SKIP LOCKED 領取），
+進度與輸出寫回 jobs / job_logs，由 /admin/jobs 與 /api/jobs/<id> 查看。
+"""
+
+import json
+
+from config import SIMILAR_TOP_K
+
+CHANNEL = 'gvdb_jobs'
+
+# 工作類型：名稱 → (說明, 可用參數與預設值)
+JOB_KINDS = {
+    'export_json': ('匯出 JSON（view_only/data）', {}),
+    'rebuild_timeline': ('重建發行時間軸統計', {}),
+    'rebuild_search_terms': ('重建關鍵字倒排索引', {}),
+    'compact_search_stats': ('合併關鍵字索引的 BM25 統計差額', {}),
+    'build_similar_productions': ('全量計算相似作品', {'k': SIMILAR_TOP_K, 'max_df': 0.1, 'chunk_size': 500}),
+    'find_duplicates': ('偵測重複資料', {'kind': 'all', 'threshold': None, 'max_block': 200, 'workers': 2}),
+}
+
+STATUSES = ['queued', 'running', 'succeeded', 'failed', 'cancelled']
+
+# ==================== web 端 ====================
+
+ENQUEUE_JOB_SQL = """
+    INSERT INTO jobs (kind, params) VALUES (%s, %s) RETURNING id
+"""
+
+NOTIFY_JOB_SQL = f"SELECT pg_notify('{CHANNEL}', %s)"
+
+JOB_LIST_SQL = """
+    SELECT id, kind, status, progress, message, attempts, worker,
+           created_at, started_at, finished_at
+    FROM jobs
+    ORDER BY id DESC
+    LIMIT %s
+"""
+
+JOB_SQL = """
+    SELECT id, kind, params, status, progress, message, attempts, worker,
+           created_at, started_at, heartbeat_at, finished_at
+    FROM jobs
+    WHERE id = %s
+"""
+
+JOB_LOGS_SQL = """
+    SELECT id, logged_at, message
+    FROM job_logs
+    WHERE job_id = %s AND id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+CANCEL_JOB_SQL = """
+    UPDATE jobs
+    SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+    WHERE id = %s AND status = 'queued'
+"""
+
+
+def validate_params(kind, params):
+    """
+    檢查工作類型與參數，回傳 (合併預設值後的參數, 錯誤訊息)
+    params 可為 dict 或 JSON 字串
+    """
+    if kind not in JOB_KINDS:
+        return None, f'未知的工作類型：{kind}'
+    if isinstance(params, str):
+        try:
+            params = json.loads(params) if params.strip() else {}
+        except ValueError:
+            return None, '參數必須是 JSON 物件'
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        return None, '參數必須是 JSON 物件'
+
+    defaults = JOB_KINDS[kind][1]
+    unknown = sorted(set(params) - set(defaults))
+    if unknown:
+        return None, f'{kind} 不接受參數：{", ".join(unknown)}'
+    return {**defaults, **params}, None
+
+
+def enqueue(cur, kind, params):
+    """在目前交易中排入工作（commit 後 worker 才會看到並被喚醒），回傳工作 ID；cur 為一般（tuple）cursor"""
+    cur.execute(ENQUEUE_JOB_SQL, (kind, json.dumps(params)))
+    job_id = cur.fetchone()[0]
+    cur.execute(NOTIFY_JOB_SQL, (str(job_id),))
+    return job_id
+
+
+# ==================== worker 端 ====================
+
+# 領取最早排隊的工作；SKIP LOCKED 讓多個 worker 同時領取時互不等待
+CLAIM_JOB_SQL = """
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1, worker = %s, message = NULL,
+        started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'queued'
+        ORDER BY id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, kind, params, attempts
+"""
+
+HEARTBEAT_SQL = """
+    UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = %s AND status = 'running'
+"""
+
+PROGRESS_SQL = """
+    UPDATE jobs
+    SET progress = %s, message = COALESCE(%s, message), heartbeat_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+LOG_SQL = """
+    INSERT INTO job_logs (job_id, message) VALUES (%s, %s)
+"""
+
+FINISH_JOB_SQL = """
+    UPDATE jobs
+    SET status = %s, message = %s, finished_at = CURRENT_TIMESTAMP,
+        progress = CASE WHEN %s = 'succeeded' THEN 1 ELSE progress END
+    WHERE id = %s
+"""
+
+# worker 被中斷（Ctrl+C / 重新啟動）時立即放回佇列，不計入重試次數
+RELEASE_JOB_SQL = """
+    UPDATE jobs
+    SET status = 'queued', worker = NULL, attempts = attempts - 1, heartbeat_at = NULL
+    WHERE id = %s AND status = 'running'
+"""
+
+# worker 程序異常結束：心跳逾時的工作重新排隊，已達重試上限者標記失敗
+REQUEUE_STALE_SQL = """
+    UPDATE jobs
+    SET status = CASE WHEN attempts < %s THEN 'queued' ELSE 'failed' END,
+        message = CASE WHEN attempts < %s THEN message ELSE 'worker 心跳逾時，已達重試上限' END,
+        finished_at = CASE WHEN attempts < %s THEN NULL ELSE CURRENT_TIMESTAMP END,
+        worker = NULL
+    WHERE status = 'running' AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+    RETURNING id, status
+"""
@@ -0,0 +1,149 @@
+"""
+GVDB 即時更新通知
+
+寫入端點在交易中呼叫 notify_change()，以 pg_notify 送出精簡的變更通知
+{'kind': 'production' | 'actor' | 'studio', 'id': ..., 'fields': [...]}；
+通知在交易提交時才送出，回滾則不會送出。
+
+每個 worker 以一條專用連線 LISTEN（連線池的連線會被其他請求借用，不能用來等待通知），
+收到的通知分送給本程序所有 /api/events（Server-Sent Events）連線。
+客戶端處理不及（佇列已滿）或監聽連線中斷重連時送出 reset 事件，頁面應重新查詢目前顯示的資料。
+"""
+
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+
+from config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'gvdb_changes'
+NOTIFY_SQL = f"SELECT pg_notify('{CHANNEL}', %s)"
+
+RESET = 'reset'
+
+
+def notify_change(cur, kind, entity_id, fields):
+    """在目前交易中登記一則變更通知（commit 後送出）"""
+    payload = json.dumps({'kind': kind, 'id': entity_id, 'fields': sorted(fields)},
+                         ensure_ascii=False, separators=(',', ':'))
+    cur.execute(NOTIFY_SQL, (payload,))
+
+
+def format_event(kind, data):
+    """Server-Sent Events 格式：event 為通知類型，data 為原始 JSON"""
+    return f'event: {kind}\ndata: {data}\n\n'
+
+
+class ChangeFeed:
+    """LISTEN 背景執行緒與本程序的 SSE 訂閱者"""
+
+    def __init__(self, max_clients, heartbeat_interval, queue_size=200, connect=None):
+        self.max_clients = max_clients
+        self.heartbeat_interval = heartbeat_interval
+        self.queue_size = queue_size
+        self._connect = connect or (lambda: psycopg2.connect(**DB_CONFIG))
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def clients(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """回傳新的訂閱佇列；已達 max_clients 時回傳 None"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscription = queue.Queue(self.queue_size)
+            self._subscribers.add(subscription)
+        self._ensure_thread()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription):
+        """SSE 回應本體：轉送通知，閒置時送出註解行維持連線（也用來偵測客戶端已離線）"""
+        try:
+            # 瀏覽器斷線後自動重連的等待毫秒數
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    kind, data = subscription.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(kind, data)
+        finally:
+            self.unsubscribe(subscription)
+
+    def publish(self, kind, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait((kind, data))
+            except queue.Full:
+                # 客戶端跟不上：丟棄積壓的通知，改送 reset 讓頁面重新查詢
+                with subscription.mutex:
+                    subscription.queue.clear()
+                subscription.put_nowait((RESET, '{}'))
+
+    def _ensure_thread(self):
+        # gunicorn fork 之後執行緒不會被複製，因此在第一次訂閱時才啟動
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        delay = 1
+        reconnecting = False
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f'LISTEN {CHANNEL}')
+                cur.close()
+                if reconnecting:
+                    # 中斷期間的通知已遺失
+                    self.publish(RESET, '{}')
+                delay = 1
+                self._listen(conn)
+            except Exception:
+                logger.exception('變更通知監聽中斷，%d 秒後重新連線', delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            reconnecting = True
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def _listen(self, conn):
+        while True:
+            if select.select([conn], [], [], 60) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    kind = json.loads(notify.payload)['kind']
+                except (ValueError, KeyError, TypeError):
+                    logger.warning('略過無法解析的變更通知：%s', notify.payload)
+                    continue
+                self.publish(kind, notify.payload)
@@ -0,0 +1,78 @@
+"""
+GVDB Prometheus 指標
+
+/metrics（app.py）以 Prometheus 文字格式輸出以下指標：
+- 每個路由的請求數、延遲、回應大小、資料庫時間與錯誤數
+- 連線池的新建連線數、取用次數與目前連線數
+- 查詢結果快取的命中 / 未命中次數
+
+gunicorn 多 worker 時請設定 PROMETHEUS_MULTIPROC_DIR（空目錄），
+各 worker 的數值會寫入該目錄並於 /metrics 彙總。
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUESTS = Counter(
+    'gvdb_http_requests_total', '處理的 HTTP 請求數',
+    ['route', 'method', 'status'])
+REQUEST_LATENCY = Histogram(
+    'gvdb_http_request_duration_seconds', 'HTTP 請求處理時間',
+    ['route', 'method'], buckets=LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'gvdb_http_response_size_bytes', '回應大小（壓縮後）',
+    ['route'], buckets=SIZE_BUCKETS)
+REQUEST_ERRORS = Counter(
+    'gvdb_http_errors_total', '回應 5xx 或拋出例外的請求數',
+    ['route'])
+
+DB_TIME = Histogram(
+    'gvdb_db_time_seconds', '每個請求花在 SQL 語句的時間',
+    ['route'], buckets=LATENCY_BUCKETS)
+DB_QUERIES = Histogram(
+    'gvdb_db_queries_per_request', '每個請求執行的 SQL 語句數',
+    ['route'], buckets=(1, 2, 5, 10, 25, 50, 100, 250))
+
+DB_CONNECTIONS_OPENED = Counter(
+    'gvdb_db_connections_opened_total', '連線池新建立的資料庫連線數')
+DB_CONNECTION_CHECKOUTS = Counter(
+    'gvdb_db_connection_checkouts_total', '從連線池取用連線的次數')
+DB_POOL_SIZE = Gauge(
+    'gvdb_db_pool_connections', '連線池目前持有的連線數',
+    ['pool'], multiprocess_mode='livesum')
+
+RESULT_CACHE_REQUESTS = Counter(
+    'gvdb_result_cache_requests_total', '查詢結果快取的查找次數',
+    ['route', 'result'])
+RESULT_CACHE_EVICTIONS = Counter(
+    'gvdb_result_cache_evictions_total', '查詢結果快取因容量上限移除的項目數')
+
+
+def observe_request(route, method, status, duration, size, stats):
+    """記錄一次請求（stats 為 db.QueryStats，可為 None）"""
+    REQUESTS.labels(route, method, str(status)).inc()
+    REQUEST_LATENCY.labels(route, method).observe(duration)
+    if size is not None:
+        RESPONSE_SIZE.labels(route).observe(size)
+    if status >= 500:
+        REQUEST_ERRORS.labels(route).inc()
+    if stats is not None:
+        DB_TIME.labels(route).observe(stats.db_time)
+        DB_QUERIES.labels(route).observe(stats.queries)
+
+
+def render():
+    """輸出 Prometheus 文字格式 (body, content_type)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,71 @@
+-- GVDB 基礎結構
+-- 以 IF NOT EXISTS 建立，既有（手動建立）的資料庫套用時不會重建資料表；
+-- 既有資料庫也可以 `python scripts/migrate.py --baseline 1` 只標記為已套用。
+
+CREATE TABLE IF NOT EXISTS studios (
+    id          SERIAL PRIMARY KEY,
+    name        VARCHAR(100) NOT NULL UNIQUE,
+    country     VARCHAR(50),
+    website     VARCHAR(255),
+    notes       TEXT,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS actors (
+    id          SERIAL PRIMARY KEY,
+    actor_tag   VARCHAR(100) NOT NULL UNIQUE,       -- ACTOR_xxx、ANONYMOUS_POOL、STUDIO_xxx ...
+    gvdb_id     VARCHAR(50),
+    notes       TEXT,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 演員在各公司的藝名（同一演員在同一公司只有一個藝名）
+CREATE TABLE IF NOT EXISTS stage_names (
+    id          SERIAL PRIMARY KEY,
+    actor_id    INTEGER NOT NULL REFERENCES actors(id) ON DELETE CASCADE,
+    studio_id   INTEGER REFERENCES studios(id),
+    stage_name  VARCHAR(100) NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (actor_id, studio_id)
+);
+
+-- 作品：single（單片）、album（專輯）、segment（專輯片段，studio_id / release_date 為 NULL，繼承自 parent）
+CREATE TABLE IF NOT EXISTS productions (
+    id            SERIAL PRIMARY KEY,
+    code          VARCHAR(100) NOT NULL UNIQUE,
+    type          VARCHAR(20) NOT NULL CHECK (type IN ('single', 'album', 'segment')),
+    parent_id     INTEGER REFERENCES productions(id) ON DELETE CASCADE,
+    studio_id     INTEGER REFERENCES studios(id),
+    title         TEXT,
+    release_date  VARCHAR(7),                        -- 'YYYY.MM'
+    comment       TEXT,
+    created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    performer_ids INTEGER[] DEFAULT '{}'             -- stage_names.id；專輯為所有片段演員的聯集（由觸發器維護，見 0003）
+);
+
+CREATE TABLE IF NOT EXISTS performances (
+    id              SERIAL PRIMARY KEY,
+    production_id   INTEGER NOT NULL REFERENCES productions(id) ON DELETE CASCADE,
+    stage_name_id   INTEGER NOT NULL REFERENCES stage_names(id),
+    role            VARCHAR(20),                     -- top / bottom / giver / receiver
+    performer_type  VARCHAR(20) DEFAULT 'named',
+    notes           TEXT,
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (production_id, stage_name_id)
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    id          SERIAL PRIMARY KEY,
+    category    VARCHAR(20) NOT NULL,                -- sex_act / style / body_type / source
+    name        VARCHAR(50) NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (category, name)
+);
+
+CREATE TABLE IF NOT EXISTS production_tags (
+    production_id  INTEGER NOT NULL REFERENCES productions(id) ON DELETE CASCADE,
+    tag_id         INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+    created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (production_id, tag_id)
+);
@@ -0,0 +1,9 @@
+-- 全域資料版本：所有寫入端點在同一交易中遞增 version，
+-- 讀取 API 以此產生 ETag / Last-Modified（見 app.py 的 conditional_response）
+CREATE TABLE IF NOT EXISTS data_version (
+    id          INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version     BIGINT NOT NULL DEFAULT 1,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,162 @@
+-- 作品查詢用的反正規化欄位與 production_search_view
+--
+-- performer_ids 與四類標籤名稱陣列存放在 productions 上，由觸發器維護，
+-- 因此 /api/search 的 && 篩選可以使用 GIN 索引（見 0004），不必逐列彙總 production_tags。
+-- 觸發器為陳述式層級（transition table），大量 INSERT / COPY 時每個陳述式只重算一次。
+
+ALTER TABLE productions
+    ADD COLUMN IF NOT EXISTS sex_acts   VARCHAR[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS styles     VARCHAR[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS body_types VARCHAR[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS sources    VARCHAR[] NOT NULL DEFAULT '{}';
+
+
+-- ==================== performer_ids ====================
+
+-- 重算指定作品（以及片段所屬專輯）的 performer_ids：
+-- 單片/片段為自己的演出者，專輯為自己與所有片段演出者的聯集
+CREATE OR REPLACE FUNCTION refresh_performer_ids(ids INTEGER[]) RETURNS void AS $$
+    WITH targets AS (
+        SELECT id FROM productions WHERE id = ANY(ids)
+        UNION
+        SELECT parent_id FROM productions WHERE id = ANY(ids) AND parent_id IS NOT NULL
+    ),
+    computed AS (
+        SELECT t.id,
+               COALESCE((
+                   SELECT array_agg(DISTINCT perf.stage_name_id ORDER BY perf.stage_name_id)
+                   FROM performances perf
+                   JOIN productions p ON perf.production_id = p.id
+                   WHERE p.id = t.id OR p.parent_id = t.id
+               ), '{}') AS performer_ids
+        FROM targets t
+    )
+    UPDATE productions p
+    SET performer_ids = c.performer_ids
+    FROM computed c
+    WHERE p.id = c.id AND p.performer_ids IS DISTINCT FROM c.performer_ids;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION performances_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_performer_ids(ARRAY(SELECT DISTINCT production_id FROM new_rows));
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM refresh_performer_ids(ARRAY(SELECT DISTINCT production_id FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS performances_insert_refresh ON performances;
+DROP TRIGGER IF EXISTS performances_update_refresh ON performances;
+DROP TRIGGER IF EXISTS performances_delete_refresh ON performances;
+
+CREATE TRIGGER performances_insert_refresh
+    AFTER INSERT ON performances REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION performances_changed();
+CREATE TRIGGER performances_update_refresh
+    AFTER UPDATE ON performances REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION performances_changed();
+CREATE TRIGGER performances_delete_refresh
+    AFTER DELETE ON performances REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION performances_changed();
+
+
+-- ==================== 標籤陣列 ====================
+
+CREATE OR REPLACE FUNCTION refresh_tag_arrays(ids INTEGER[]) RETURNS void AS $$
+    WITH computed AS (
+        SELECT p.id,
+               COALESCE(array_agg(t.name ORDER BY t.id) FILTER (WHERE t.category = 'sex_act'), '{}') AS sex_acts,
+               COALESCE(array_agg(t.name ORDER BY t.id) FILTER (WHERE t.category = 'style'), '{}') AS styles,
+               COALESCE(array_agg(t.name ORDER BY t.id) FILTER (WHERE t.category = 'body_type'), '{}') AS body_types,
+               COALESCE(array_agg(t.name ORDER BY t.id) FILTER (WHERE t.category = 'source'), '{}') AS sources
+        FROM productions p
+        LEFT JOIN production_tags pt ON pt.production_id = p.id
+        LEFT JOIN tags t ON pt.tag_id = t.id
+        WHERE p.id = ANY(ids)
+        GROUP BY p.id
+    )
+    UPDATE productions p
+    SET sex_acts = c.sex_acts, styles = c.styles, body_types = c.body_types, sources = c.sources
+    FROM computed c
+    WHERE p.id = c.id
+      AND (p.sex_acts, p.styles, p.body_types, p.sources)
+          IS DISTINCT FROM (c.sex_acts, c.styles, c.body_types, c.sources);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION production_tags_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_tag_arrays(ARRAY(SELECT DISTINCT production_id FROM new_rows));
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM refresh_tag_arrays(ARRAY(SELECT DISTINCT production_id FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS production_tags_insert_refresh ON production_tags;
+DROP TRIGGER IF EXISTS production_tags_update_refresh ON production_tags;
+DROP TRIGGER IF EXISTS production_tags_delete_refresh ON production_tags;
+
+CREATE TRIGGER production_tags_insert_refresh
+    AFTER INSERT ON production_tags REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_tags_changed();
+CREATE TRIGGER production_tags_update_refresh
+    AFTER UPDATE ON production_tags REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_tags_changed();
+CREATE TRIGGER production_tags_delete_refresh
+    AFTER DELETE ON production_tags REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_tags_changed();
+
+-- 標籤改名或換分類時，重算使用該標籤的作品
+CREATE OR REPLACE FUNCTION tags_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_tag_arrays(ARRAY(
+        SELECT DISTINCT pt.production_id
+        FROM production_tags pt
+        WHERE pt.tag_id IN (SELECT id FROM new_rows)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tags_update_refresh ON tags;
+CREATE TRIGGER tags_update_refresh
+    AFTER UPDATE ON tags REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tags_changed();
+
+
+-- ==================== 回填既有資料 ====================
+
+SELECT refresh_tag_arrays(ARRAY(SELECT id FROM productions));
+SELECT refresh_performer_ids(ARRAY(SELECT id FROM productions));
+
+
+-- ==================== production_search_view ====================
+
+DROP VIEW IF EXISTS production_search_view;
+
+-- 篩選條件都落在 productions 的欄位上，查詢時可直接下推到 productions 的索引
+CREATE VIEW production_search_view AS
+SELECT
+    p.id,
+    p.code,
+    p.type,
+    p.parent_id,
+    s.name AS studio,
+    p.title,
+    p.release_date,
+    p.comment,
+    p.updated_at,
+    p.performer_ids,
+    p.sex_acts,
+    p.styles,
+    p.body_types,
+    p.sources
+FROM productions p
+LEFT JOIN studios s ON p.studio_id = s.id;
@@ -0,0 +1,54 @@
+-- 熱門查詢路徑使用的索引（scripts/check_indexes.py 以 EXPLAIN 驗證實際被使用）
+--
+-- 主鍵與 UNIQUE 條件已提供的索引不重複建立：
+--   productions(code)、actors(actor_tag)、stage_names(actor_id, studio_id)、
+--   performances(production_id, stage_name_id)、production_tags(production_id, tag_id)、tags(category, name)
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+
+-- ==================== productions ====================
+
+-- /api/search 的陣列篩選：performer_ids && ...、sex_acts && ... 等
+CREATE INDEX IF NOT EXISTS productions_performer_ids_gin ON productions USING gin (performer_ids);
+CREATE INDEX IF NOT EXISTS productions_sex_acts_gin ON productions USING gin (sex_acts);
+CREATE INDEX IF NOT EXISTS productions_styles_gin ON productions USING gin (styles);
+CREATE INDEX IF NOT EXISTS productions_body_types_gin ON productions USING gin (body_types);
+CREATE INDEX IF NOT EXISTS productions_sources_gin ON productions USING gin (sources);
+
+-- 專輯片段（/api/segments：WHERE parent_id = ? ORDER BY code），也用於 segment → album 的查找
+CREATE INDEX IF NOT EXISTS productions_parent_id_code_idx ON productions (parent_id, code);
+
+-- 公司篩選與「公司、編號」排序
+CREATE INDEX IF NOT EXISTS productions_studio_id_code_idx ON productions (studio_id, code);
+
+-- 排序鍵：sort=date_* / updated_*（含日期區間篩選）
+CREATE INDEX IF NOT EXISTS productions_release_date_code_idx ON productions (release_date, code);
+CREATE INDEX IF NOT EXISTS productions_updated_at_idx ON productions (updated_at);
+
+-- keyword 篩選：code / title / comment ILIKE '%...%'
+CREATE INDEX IF NOT EXISTS productions_code_trgm ON productions USING gin (code gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS productions_title_trgm ON productions USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS productions_comment_trgm ON productions USING gin (comment gin_trgm_ops);
+
+
+-- ==================== performances / stage_names / tags ====================
+
+-- 演員統計與排序：WHERE perf.stage_name_id IN (...) JOIN productions
+CREATE INDEX IF NOT EXISTS performances_stage_name_id_idx ON performances (stage_name_id, production_id);
+
+-- 公司篩選演員：sn.studio_id IN (...)
+CREATE INDEX IF NOT EXISTS stage_names_studio_id_idx ON stage_names (studio_id, actor_id);
+
+-- 演員自動補齊：stage_name / actor_tag ILIKE '%...%'
+CREATE INDEX IF NOT EXISTS stage_names_stage_name_trgm ON stage_names USING gin (stage_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS actors_actor_tag_trgm ON actors USING gin (actor_tag gin_trgm_ops);
+
+-- 依標籤找作品
+CREATE INDEX IF NOT EXISTS production_tags_tag_id_idx ON production_tags (tag_id, production_id);
+
+ANALYZE productions;
+ANALYZE performances;
+ANALYZE stage_names;
+ANALYZE actors;
+ANALYZE production_tags;
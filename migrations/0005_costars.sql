@@ -0,0 +1,142 @@
+-- 演員合作關係（co-star）鄰接表
+--
+-- 每對曾在同一作品（單片或片段）演出的演員存兩列（A→B 與 B→A），
+-- 記錄合作次數、共同作品 ID 與角色組合（例如 {"top/bottom": 3}，前者為 actor_id 的角色）。
+-- /api/actor/<id>/costars 與 /api/actors/path 直接讀取此表，不必在請求中自我 JOIN performances。
+-- 匿名 / 特殊演員池與 STUDIO_ 自動生成的演員不列入（與演員查詢相同）。
+
+CREATE TABLE IF NOT EXISTS actor_costars (
+    actor_id          INTEGER NOT NULL REFERENCES actors(id) ON DELETE CASCADE,
+    costar_id         INTEGER NOT NULL REFERENCES actors(id) ON DELETE CASCADE,
+    production_count  INTEGER NOT NULL,
+    production_ids    INTEGER[] NOT NULL,
+    role_pairs        JSONB NOT NULL DEFAULT '{}',
+    PRIMARY KEY (actor_id, costar_id)
+);
+
+-- 最常合作的演員
+CREATE INDEX IF NOT EXISTS actor_costars_count_idx ON actor_costars (actor_id, production_count DESC);
+
+
+-- ==================== 重算 ====================
+
+-- 重算指定演員參與的所有合作關係（兩個方向）
+CREATE OR REPLACE FUNCTION refresh_costars(ids INTEGER[]) RETURNS void AS $$
+    DELETE FROM actor_costars WHERE actor_id = ANY(ids) OR costar_id = ANY(ids);
+
+    WITH targets AS (
+        SELECT DISTINCT unnest(ids) AS actor_id
+    ),
+    eligible AS (
+        SELECT sn.id AS stage_name_id, sn.actor_id
+        FROM stage_names sn
+        JOIN actors a ON a.id = sn.actor_id
+        WHERE a.actor_tag NOT LIKE 'STUDIO_%'
+          AND a.actor_tag NOT IN ('ANONYMOUS_POOL', 'UNKNOWN_POOL', 'GIRL_POOL')
+    ),
+    forward AS (
+        SELECT ea.actor_id, eb.actor_id AS costar_id, pa.production_id,
+               COALESCE(pa.role, 'other') || '/' || COALESCE(pb.role, 'other') AS pairing
+        FROM targets t
+        JOIN eligible ea ON ea.actor_id = t.actor_id
+        JOIN performances pa ON pa.stage_name_id = ea.stage_name_id
+        JOIN performances pb ON pb.production_id = pa.production_id AND pb.stage_name_id <> pa.stage_name_id
+        JOIN eligible eb ON eb.stage_name_id = pb.stage_name_id
+        WHERE eb.actor_id <> ea.actor_id
+    ),
+    -- 反方向：兩人都在 ids 中時 forward 已包含
+    pairs AS (
+        SELECT actor_id, costar_id, production_id, pairing FROM forward
+        UNION ALL
+        SELECT f.costar_id, f.actor_id, f.production_id,
+               split_part(f.pairing, '/', 2) || '/' || split_part(f.pairing, '/', 1)
+        FROM forward f
+        WHERE NOT EXISTS (SELECT 1 FROM targets t WHERE t.actor_id = f.costar_id)
+    ),
+    roles AS (
+        SELECT actor_id, costar_id, jsonb_object_agg(pairing, n) AS role_pairs
+        FROM (
+            SELECT actor_id, costar_id, pairing, COUNT(DISTINCT production_id) AS n
+            FROM pairs
+            GROUP BY actor_id, costar_id, pairing
+        ) counted
+        GROUP BY actor_id, costar_id
+    )
+    INSERT INTO actor_costars (actor_id, costar_id, production_count, production_ids, role_pairs)
+    SELECT p.actor_id, p.costar_id,
+           COUNT(DISTINCT p.production_id),
+           array_agg(DISTINCT p.production_id ORDER BY p.production_id),
+           r.role_pairs
+    FROM pairs p
+    JOIN roles r ON r.actor_id = p.actor_id AND r.costar_id = p.costar_id
+    GROUP BY p.actor_id, p.costar_id, r.role_pairs;
+$$ LANGUAGE sql;
+
+
+-- ==================== 觸發器 ====================
+
+-- 演出資料變動時，重算相關演員（同一作品的其他演員與其關係也在兩個方向中一併更新）
+CREATE OR REPLACE FUNCTION performances_costars_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_costars(ARRAY(
+            SELECT DISTINCT sn.actor_id FROM new_rows JOIN stage_names sn ON sn.id = new_rows.stage_name_id));
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM refresh_costars(ARRAY(
+            SELECT DISTINCT sn.actor_id FROM old_rows JOIN stage_names sn ON sn.id = old_rows.stage_name_id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS performances_insert_costars ON performances;
+DROP TRIGGER IF EXISTS performances_update_costars ON performances;
+DROP TRIGGER IF EXISTS performances_delete_costars ON performances;
+
+CREATE TRIGGER performances_insert_costars
+    AFTER INSERT ON performances REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION performances_costars_changed();
+CREATE TRIGGER performances_update_costars
+    AFTER UPDATE ON performances REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION performances_costars_changed();
+CREATE TRIGGER performances_delete_costars
+    AFTER DELETE ON performances REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION performances_costars_changed();
+
+-- 藝名改歸屬其他演員（合併演員）時，重算新舊兩位演員
+CREATE OR REPLACE FUNCTION stage_names_costars_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_costars(ARRAY(
+        SELECT o.actor_id FROM old_rows o JOIN new_rows n ON n.id = o.id WHERE n.actor_id <> o.actor_id
+        UNION
+        SELECT n.actor_id FROM old_rows o JOIN new_rows n ON n.id = o.id WHERE n.actor_id <> o.actor_id));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS stage_names_update_costars ON stage_names;
+CREATE TRIGGER stage_names_update_costars
+    AFTER UPDATE ON stage_names REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stage_names_costars_changed();
+
+-- 演員標籤改為（或改離）匿名池 / STUDIO_ 時，該演員是否列入會改變
+CREATE OR REPLACE FUNCTION actors_costars_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_costars(ARRAY(
+        SELECT n.id FROM old_rows o JOIN new_rows n ON n.id = o.id WHERE n.actor_tag <> o.actor_tag));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS actors_update_costars ON actors;
+CREATE TRIGGER actors_update_costars
+    AFTER UPDATE ON actors REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION actors_costars_changed();
+
+
+-- ==================== 回填既有資料 ====================
+
+SELECT refresh_costars(ARRAY(SELECT id FROM actors));
+
+ANALYZE actor_costars;
@@ -0,0 +1,25 @@
+-- 相似作品（見 similarity.py）
+--
+-- similar_productions 由 scripts/build_similar_productions.py 全量計算，
+-- 編輯作品後由 app 的背景執行緒增量更新；similarity_idf 為全量計算時各特徵的 IDF 權重
+-- （kind：t = 標籤、a = 演員、s = 公司；權重 0 表示太常見而不列入計算）
+
+CREATE TABLE IF NOT EXISTS similar_productions (
+    production_id  INTEGER NOT NULL REFERENCES productions(id) ON DELETE CASCADE,
+    similar_id     INTEGER NOT NULL REFERENCES productions(id) ON DELETE CASCADE,
+    score          REAL NOT NULL,
+    PRIMARY KEY (production_id, similar_id)
+);
+
+-- /api/production/<id>/similar：WHERE production_id = ? ORDER BY score DESC LIMIT k
+CREATE INDEX IF NOT EXISTS similar_productions_score_idx ON similar_productions (production_id, score DESC);
+
+-- 增量更新刪除指向已變更作品的項目：WHERE similar_id = ?
+CREATE INDEX IF NOT EXISTS similar_productions_similar_id_idx ON similar_productions (similar_id);
+
+CREATE TABLE IF NOT EXISTS similarity_idf (
+    kind        CHAR(1) NOT NULL,
+    feature_id  INTEGER NOT NULL,
+    idf         REAL NOT NULL,
+    PRIMARY KEY (kind, feature_id)
+);
@@ -0,0 +1,256 @@
+-- 發行時間軸彙總：每月各公司、各標籤、各演員的作品數（/api/stats/timeline）
+--
+-- 計算單位為「作品」：單片與專輯（片段計入所屬專輯），月份為作品的 release_date（'YYYY.MM'），
+-- 與演員統計的作品數算法一致。timeline_works 記錄每部作品目前計入的公司、標籤與演員，
+-- 寫入時觸發器先扣除舊的貢獻、再加上新的貢獻（增量更新）；rebuild_timeline() 以一次集合運算重建全部。
+
+CREATE TABLE IF NOT EXISTS timeline_works (
+    work_id    INTEGER PRIMARY KEY,
+    period     VARCHAR(7) NOT NULL,
+    studio_id  INTEGER,
+    tag_ids    INTEGER[] NOT NULL DEFAULT '{}',
+    actor_ids  INTEGER[] NOT NULL DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS timeline_studio (
+    period       VARCHAR(7) NOT NULL,
+    studio_id    INTEGER NOT NULL,
+    productions  INTEGER NOT NULL,
+    PRIMARY KEY (period, studio_id)
+);
+
+CREATE TABLE IF NOT EXISTS timeline_tag (
+    period       VARCHAR(7) NOT NULL,
+    tag_id       INTEGER NOT NULL,
+    productions  INTEGER NOT NULL,
+    PRIMARY KEY (period, tag_id)
+);
+
+CREATE TABLE IF NOT EXISTS timeline_actor (
+    period       VARCHAR(7) NOT NULL,
+    actor_id     INTEGER NOT NULL,
+    productions  INTEGER NOT NULL,
+    PRIMARY KEY (period, actor_id)
+);
+
+-- 指定公司 / 標籤 / 演員的時間軸：WHERE xxx_id = ANY(...) AND period BETWEEN ...
+CREATE INDEX IF NOT EXISTS timeline_studio_studio_id_idx ON timeline_studio (studio_id, period);
+CREATE INDEX IF NOT EXISTS timeline_tag_tag_id_idx ON timeline_tag (tag_id, period);
+CREATE INDEX IF NOT EXISTS timeline_actor_actor_id_idx ON timeline_actor (actor_id, period);
+
+
+-- ==================== 增量更新 ====================
+
+-- 將作品的貢獻加入（direction = 1）或扣除（direction = -1），歸零的列刪除
+CREATE OR REPLACE FUNCTION timeline_apply(direction INTEGER, works timeline_works[]) RETURNS void AS $$
+    INSERT INTO timeline_studio (period, studio_id, productions)
+    SELECT w.period, w.studio_id, direction * COUNT(*)
+    FROM unnest(works) w
+    WHERE w.studio_id IS NOT NULL
+    GROUP BY w.period, w.studio_id
+    ON CONFLICT (period, studio_id) DO UPDATE SET productions = timeline_studio.productions + EXCLUDED.productions;
+
+    INSERT INTO timeline_tag (period, tag_id, productions)
+    SELECT w.period, t.tag_id, direction * COUNT(*)
+    FROM unnest(works) w, unnest(w.tag_ids) AS t(tag_id)
+    GROUP BY w.period, t.tag_id
+    ON CONFLICT (period, tag_id) DO UPDATE SET productions = timeline_tag.productions + EXCLUDED.productions;
+
+    INSERT INTO timeline_actor (period, actor_id, productions)
+    SELECT w.period, a.actor_id, direction * COUNT(*)
+    FROM unnest(works) w, unnest(w.actor_ids) AS a(actor_id)
+    GROUP BY w.period, a.actor_id
+    ON CONFLICT (period, actor_id) DO UPDATE SET productions = timeline_actor.productions + EXCLUDED.productions;
+
+    DELETE FROM timeline_studio ts
+    USING unnest(works) w
+    WHERE ts.period = w.period AND ts.studio_id = w.studio_id AND ts.productions <= 0;
+
+    DELETE FROM timeline_tag tt
+    USING unnest(works) w, unnest(w.tag_ids) AS t(tag_id)
+    WHERE tt.period = w.period AND tt.tag_id = t.tag_id AND tt.productions <= 0;
+
+    DELETE FROM timeline_actor ta
+    USING unnest(works) w, unnest(w.actor_ids) AS a(actor_id)
+    WHERE ta.period = w.period AND ta.actor_id = a.actor_id AND ta.productions <= 0;
+$$ LANGUAGE sql;
+
+-- 重算指定作品（單片 / 專輯的 id）的貢獻
+CREATE OR REPLACE FUNCTION refresh_timeline(ids INTEGER[]) RETURNS void AS $$
+BEGIN
+    PERFORM timeline_apply(-1, ARRAY(SELECT w FROM timeline_works w WHERE w.work_id = ANY(ids)));
+    DELETE FROM timeline_works WHERE work_id = ANY(ids);
+
+    INSERT INTO timeline_works (work_id, period, studio_id, tag_ids, actor_ids)
+    SELECT w.id, w.release_date, w.studio_id,
+           ARRAY(SELECT DISTINCT pt.tag_id
+                 FROM productions p
+                 JOIN production_tags pt ON pt.production_id = p.id
+                 WHERE p.id = w.id OR p.parent_id = w.id),
+           ARRAY(SELECT DISTINCT sn.actor_id
+                 FROM productions p
+                 JOIN performances perf ON perf.production_id = p.id
+                 JOIN stage_names sn ON sn.id = perf.stage_name_id
+                 WHERE (p.id = w.id OR p.parent_id = w.id) AND p.type IN ('single', 'segment'))
+    FROM productions w
+    WHERE w.id = ANY(ids) AND w.type IN ('single', 'album') AND w.release_date IS NOT NULL;
+
+    PERFORM timeline_apply(1, ARRAY(SELECT w FROM timeline_works w WHERE w.work_id = ANY(ids)));
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ==================== 全量重建 ====================
+
+CREATE OR REPLACE FUNCTION rebuild_timeline() RETURNS void AS $$
+    TRUNCATE timeline_works, timeline_studio, timeline_tag, timeline_actor;
+
+    INSERT INTO timeline_works (work_id, period, studio_id, tag_ids, actor_ids)
+    SELECT w.id, w.release_date, w.studio_id, COALESCE(t.tag_ids, '{}'), COALESCE(a.actor_ids, '{}')
+    FROM productions w
+    LEFT JOIN (
+        SELECT COALESCE(p.parent_id, p.id) AS work_id, array_agg(DISTINCT pt.tag_id) AS tag_ids
+        FROM production_tags pt
+        JOIN productions p ON p.id = pt.production_id
+        GROUP BY 1
+    ) t ON t.work_id = w.id
+    LEFT JOIN (
+        SELECT COALESCE(p.parent_id, p.id) AS work_id, array_agg(DISTINCT sn.actor_id) AS actor_ids
+        FROM performances perf
+        JOIN productions p ON p.id = perf.production_id
+        JOIN stage_names sn ON sn.id = perf.stage_name_id
+        WHERE p.type IN ('single', 'segment')
+        GROUP BY 1
+    ) a ON a.work_id = w.id
+    WHERE w.type IN ('single', 'album') AND w.release_date IS NOT NULL;
+
+    INSERT INTO timeline_studio (period, studio_id, productions)
+    SELECT period, studio_id, COUNT(*)
+    FROM timeline_works
+    WHERE studio_id IS NOT NULL
+    GROUP BY period, studio_id;
+
+    INSERT INTO timeline_tag (period, tag_id, productions)
+    SELECT w.period, t.tag_id, COUNT(*)
+    FROM timeline_works w, unnest(w.tag_ids) AS t(tag_id)
+    GROUP BY w.period, t.tag_id;
+
+    INSERT INTO timeline_actor (period, actor_id, productions)
+    SELECT w.period, a.actor_id, COUNT(*)
+    FROM timeline_works w, unnest(w.actor_ids) AS a(actor_id)
+    GROUP BY w.period, a.actor_id;
+$$ LANGUAGE sql;
+
+
+-- ==================== 觸發器 ====================
+
+-- 作品新增、刪除，或日期 / 公司 / 所屬專輯 / 類型改變
+CREATE OR REPLACE FUNCTION productions_timeline_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_timeline(ARRAY(SELECT DISTINCT COALESCE(parent_id, id) FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_timeline(ARRAY(SELECT DISTINCT COALESCE(parent_id, id) FROM old_rows));
+    ELSE
+        -- 觸發器也會因 performer_ids / 標籤陣列的維護而執行，只處理影響時間軸的欄位
+        PERFORM refresh_timeline(ARRAY(
+            SELECT COALESCE(o.parent_id, o.id)
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE (n.release_date, n.studio_id, n.parent_id, n.type)
+                  IS DISTINCT FROM (o.release_date, o.studio_id, o.parent_id, o.type)
+            UNION
+            SELECT COALESCE(n.parent_id, n.id)
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE (n.release_date, n.studio_id, n.parent_id, n.type)
+                  IS DISTINCT FROM (o.release_date, o.studio_id, o.parent_id, o.type)));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS productions_insert_timeline ON productions;
+DROP TRIGGER IF EXISTS productions_update_timeline ON productions;
+DROP TRIGGER IF EXISTS productions_delete_timeline ON productions;
+
+CREATE TRIGGER productions_insert_timeline
+    AFTER INSERT ON productions REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_timeline_changed();
+CREATE TRIGGER productions_update_timeline
+    AFTER UPDATE ON productions REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_timeline_changed();
+CREATE TRIGGER productions_delete_timeline
+    AFTER DELETE ON productions REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_timeline_changed();
+
+-- 演出與標籤變動：重算所屬作品（作品已被刪除時由上面的觸發器處理）
+CREATE OR REPLACE FUNCTION production_children_timeline_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_timeline(ARRAY(
+            SELECT DISTINCT COALESCE(p.parent_id, p.id)
+            FROM new_rows JOIN productions p ON p.id = new_rows.production_id));
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM refresh_timeline(ARRAY(
+            SELECT DISTINCT COALESCE(p.parent_id, p.id)
+            FROM old_rows JOIN productions p ON p.id = old_rows.production_id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS performances_insert_timeline ON performances;
+DROP TRIGGER IF EXISTS performances_update_timeline ON performances;
+DROP TRIGGER IF EXISTS performances_delete_timeline ON performances;
+
+CREATE TRIGGER performances_insert_timeline
+    AFTER INSERT ON performances REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_children_timeline_changed();
+CREATE TRIGGER performances_update_timeline
+    AFTER UPDATE ON performances REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_children_timeline_changed();
+CREATE TRIGGER performances_delete_timeline
+    AFTER DELETE ON performances REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_children_timeline_changed();
+
+DROP TRIGGER IF EXISTS production_tags_insert_timeline ON production_tags;
+DROP TRIGGER IF EXISTS production_tags_update_timeline ON production_tags;
+DROP TRIGGER IF EXISTS production_tags_delete_timeline ON production_tags;
+
+CREATE TRIGGER production_tags_insert_timeline
+    AFTER INSERT ON production_tags REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_children_timeline_changed();
+CREATE TRIGGER production_tags_update_timeline
+    AFTER UPDATE ON production_tags REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_children_timeline_changed();
+CREATE TRIGGER production_tags_delete_timeline
+    AFTER DELETE ON production_tags REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION production_children_timeline_changed();
+
+-- 藝名改歸屬其他演員：重算該藝名演出的作品
+CREATE OR REPLACE FUNCTION stage_names_timeline_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_timeline(ARRAY(
+        SELECT DISTINCT COALESCE(p.parent_id, p.id)
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id AND n.actor_id <> o.actor_id
+        JOIN performances perf ON perf.stage_name_id = n.id
+        JOIN productions p ON p.id = perf.production_id));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS stage_names_update_timeline ON stage_names;
+CREATE TRIGGER stage_names_update_timeline
+    AFTER UPDATE ON stage_names REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stage_names_timeline_changed();
+
+
+-- ==================== 回填既有資料 ====================
+
+SELECT rebuild_timeline();
+
+ANALYZE timeline_works;
+ANALYZE timeline_studio;
+ANALYZE timeline_tag;
+ANALYZE timeline_actor;
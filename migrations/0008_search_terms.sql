@@ -0,0 +1,141 @@
+-- /api/search 關鍵字的倒排索引與 BM25 排序
+--
+-- 作品的 code、title、comment 切成索引詞：中日文連續字元取相鄰兩字（bigram），
+-- 英文字母與數字各自成詞（'GD-002' → gd、002）。詞頻依欄位加權（code ×3、title ×2、comment ×1）。
+-- search_stats 保存文件數與總長度（BM25 的平均長度），與 search_terms 由觸發器一併維護。
+-- 查詢端的切詞規則在 queries.py 的 search_terms()，兩者需保持一致。
+
+CREATE TABLE IF NOT EXISTS search_terms (
+    term           TEXT NOT NULL,
+    production_id  INTEGER NOT NULL,    -- 不設外鍵：作品刪除時由觸發器刪除，才能同時扣除 search_stats
+    tf             INTEGER NOT NULL,    -- 加權詞頻
+    doc_length     INTEGER NOT NULL,    -- 該作品所有詞的加權詞頻總和
+    PRIMARY KEY (term, production_id)
+);
+
+CREATE INDEX IF NOT EXISTS search_terms_production_id_idx ON search_terms (production_id);
+
+CREATE TABLE IF NOT EXISTS search_stats (
+    id            INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    documents     BIGINT NOT NULL DEFAULT 0,
+    total_length  BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO search_stats (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+
+-- ==================== 切詞 ====================
+
+-- 平假名、片假名、CJK 統一漢字（含擴充 A 與相容字）連續的一段取 bigram，英文與數字整段為一詞
+CREATE OR REPLACE FUNCTION search_tokens(content TEXT) RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_agg(t.token), '{}')
+    FROM regexp_matches(lower(COALESCE(content, '')),
+                        '[a-z]+|[0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+', 'g') AS m(run)
+    CROSS JOIN LATERAL (
+        SELECT m.run[1] AS token
+        WHERE m.run[1] ~ '^[a-z0-9]'
+        UNION ALL
+        SELECT substr(m.run[1], i, 2)
+        FROM generate_series(1, char_length(m.run[1]) - 1) AS i
+        WHERE m.run[1] !~ '^[a-z0-9]'
+    ) t
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 每部作品的索引詞與加權詞頻（以 production_id 篩選時條件會下推到 productions）
+CREATE OR REPLACE VIEW search_term_source AS
+SELECT p.id AS production_id, t.term, SUM(t.weight)::INTEGER AS tf
+FROM productions p
+CROSS JOIN LATERAL (
+    SELECT unnest(search_tokens(p.code)) AS term, 3 AS weight
+    UNION ALL
+    SELECT unnest(search_tokens(p.title)), 2
+    UNION ALL
+    SELECT unnest(search_tokens(p.comment)), 1
+) t
+GROUP BY p.id, t.term;
+
+
+-- ==================== 增量更新與全量重建 ====================
+
+CREATE OR REPLACE FUNCTION refresh_search_terms(ids INTEGER[]) RETURNS void AS $$
+    WITH old AS (
+        DELETE FROM search_terms WHERE production_id = ANY(ids)
+        RETURNING production_id, doc_length
+    ),
+    old_docs AS (
+        SELECT DISTINCT production_id, doc_length FROM old
+    )
+    UPDATE search_stats
+    SET documents = documents - (SELECT COUNT(*) FROM old_docs),
+        total_length = total_length - (SELECT COALESCE(SUM(doc_length), 0) FROM old_docs);
+
+    WITH inserted AS (
+        INSERT INTO search_terms (term, production_id, tf, doc_length)
+        SELECT term, production_id, tf, SUM(tf) OVER (PARTITION BY production_id)
+        FROM search_term_source
+        WHERE production_id = ANY(ids)
+        RETURNING production_id, doc_length
+    ),
+    new_docs AS (
+        SELECT DISTINCT production_id, doc_length FROM inserted
+    )
+    UPDATE search_stats
+    SET documents = documents + (SELECT COUNT(*) FROM new_docs),
+        total_length = total_length + (SELECT COALESCE(SUM(doc_length), 0) FROM new_docs);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rebuild_search_terms() RETURNS void AS $$
+    TRUNCATE search_terms;
+
+    INSERT INTO search_terms (term, production_id, tf, doc_length)
+    SELECT term, production_id, tf, SUM(tf) OVER (PARTITION BY production_id)
+    FROM search_term_source;
+
+    UPDATE search_stats
+    SET documents = s.documents, total_length = s.total_length
+    FROM (
+        SELECT COUNT(*) AS documents, COALESCE(SUM(doc_length), 0) AS total_length
+        FROM (SELECT DISTINCT production_id, doc_length FROM search_terms) d
+    ) s;
+$$ LANGUAGE sql;
+
+
+-- ==================== 觸發器 ====================
+
+CREATE OR REPLACE FUNCTION productions_search_terms_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_search_terms(ARRAY(SELECT id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_search_terms(ARRAY(SELECT id FROM old_rows));
+    ELSE
+        -- performer_ids / 標籤陣列的維護也會更新 productions，只處理文字欄位有變動的作品
+        PERFORM refresh_search_terms(ARRAY(
+            SELECT n.id
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE (n.code, n.title, n.comment) IS DISTINCT FROM (o.code, o.title, o.comment)));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS productions_insert_search_terms ON productions;
+DROP TRIGGER IF EXISTS productions_update_search_terms ON productions;
+DROP TRIGGER IF EXISTS productions_delete_search_terms ON productions;
+
+CREATE TRIGGER productions_insert_search_terms
+    AFTER INSERT ON productions REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_search_terms_changed();
+CREATE TRIGGER productions_update_search_terms
+    AFTER UPDATE ON productions REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_search_terms_changed();
+CREATE TRIGGER productions_delete_search_terms
+    AFTER DELETE ON productions REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_search_terms_changed();
+
+
+-- ==================== 回填既有資料 ====================
+
+SELECT rebuild_search_terms();
+
+ANALYZE search_terms;
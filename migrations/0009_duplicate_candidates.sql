@@ -0,0 +1,24 @@
+-- 疑似重複的作品 / 演員，由 scripts/find_duplicates.py 寫入、/admin/duplicates 審核
+--
+-- 每組以 (kind, left_id, right_id) 唯一且 left_id < right_id；
+-- 重新執行偵測時只替換 pending 的組合，已標記 duplicate / distinct 的組合保留，不會再次出現。
+-- left_id / right_id 依 kind 指向 productions 或 actors，不設外鍵；審核頁面以 JOIN 略過已刪除的記錄。
+
+CREATE TABLE IF NOT EXISTS duplicate_candidates (
+    id           SERIAL PRIMARY KEY,
+    kind         VARCHAR(10) NOT NULL CHECK (kind IN ('production', 'actor')),
+    left_id      INTEGER NOT NULL,
+    right_id     INTEGER NOT NULL,
+    score        REAL NOT NULL,
+    details      JSONB NOT NULL DEFAULT '{}',      -- 各項相似度，供審核時參考
+    status       VARCHAR(10) NOT NULL DEFAULT 'pending'
+                 CHECK (status IN ('pending', 'duplicate', 'distinct')),
+    detected_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    reviewed_at  TIMESTAMP,
+    UNIQUE (kind, left_id, right_id),
+    CHECK (left_id < right_id)
+);
+
+-- 審核頁面：依類型與狀態列出，分數高的在前
+CREATE INDEX IF NOT EXISTS duplicate_candidates_review_idx
+    ON duplicate_candidates (kind, status, score DESC);
@@ -0,0 +1,35 @@
+-- 背景工作佇列：匯出、重建統計等長時間工作由 scripts/job_worker.py 執行，不佔用 web worker
+--
+-- 網頁 / API 寫入 status = 'queued' 的工作並以 NOTIFY gvdb_jobs 喚醒 worker；
+-- worker 以 FOR UPDATE SKIP LOCKED 領取，多個 worker 程序不會領到同一個工作。
+-- 執行中的工作定期更新 heartbeat_at；worker 異常結束時，心跳逾時的工作重新排入佇列（最多 JOB_MAX_ATTEMPTS 次）。
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id            SERIAL PRIMARY KEY,
+    kind          VARCHAR(50) NOT NULL,
+    params        JSONB NOT NULL DEFAULT '{}',
+    status        VARCHAR(10) NOT NULL DEFAULT 'queued'
+                  CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+    progress      REAL NOT NULL DEFAULT 0,           -- 0 ~ 1
+    message       TEXT,                              -- 最近的進度說明或失敗原因
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    worker        VARCHAR(100),                      -- 執行中的 worker（主機名稱:PID）
+    created_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at    TIMESTAMP,
+    heartbeat_at  TIMESTAMP,
+    finished_at   TIMESTAMP
+);
+
+-- worker 領取：只索引排隊中的工作
+CREATE INDEX IF NOT EXISTS jobs_queued_idx ON jobs (id) WHERE status = 'queued';
+-- 心跳逾時檢查
+CREATE INDEX IF NOT EXISTS jobs_running_idx ON jobs (heartbeat_at) WHERE status = 'running';
+
+CREATE TABLE IF NOT EXISTS job_logs (
+    id         BIGSERIAL PRIMARY KEY,
+    job_id     INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    logged_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    message    TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS job_logs_job_id_idx ON job_logs (job_id, id);
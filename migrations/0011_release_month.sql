@@ -0,0 +1,103 @@
+-- 發行月份的型別化欄位：release_month（該月 1 日的 DATE）
+--
+-- release_date 仍是 API 使用的 'YYYY.MM' 字串；release_month 由觸發器維護，不直接寫入：
+-- 單片與專輯取自己的 release_date，片段沿用所屬專輯（專輯的月份變更時一併更新其片段）。
+-- 日期範圍篩選與日期排序使用 release_month，不必再查詢片段的父專輯。
+
+ALTER TABLE productions ADD COLUMN IF NOT EXISTS release_month DATE;
+
+-- 'YYYY.MM' → 該月 1 日；月份不明的 'YYYY.00' 視為 1 月；格式不符時為 NULL
+CREATE OR REPLACE FUNCTION release_month_of(release_date TEXT) RETURNS DATE AS $$
+    SELECT CASE WHEN release_date ~ '^[1-9]\d{3}\.(0\d|1[0-2])$'
+                THEN make_date(left(release_date, 4)::int, greatest(right(release_date, 2)::int, 1), 1)
+           END
+$$ LANGUAGE sql IMMUTABLE;
+
+
+-- ==================== 回填既有資料 ====================
+
+UPDATE productions p
+SET release_month = COALESCE(
+    release_month_of(p.release_date),
+    (SELECT release_month_of(parent.release_date) FROM productions parent WHERE parent.id = p.parent_id)
+);
+
+
+-- ==================== 觸發器 ====================
+
+-- 寫入時計算（直接寫入 release_month 也會被覆寫為推導值）
+CREATE OR REPLACE FUNCTION productions_set_release_month() RETURNS trigger AS $$
+BEGIN
+    NEW.release_month := release_month_of(NEW.release_date);
+    IF NEW.release_month IS NULL AND NEW.parent_id IS NOT NULL THEN
+        NEW.release_month := (SELECT release_month FROM productions WHERE id = NEW.parent_id);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS productions_set_release_month ON productions;
+
+CREATE TRIGGER productions_set_release_month
+    BEFORE INSERT OR UPDATE OF release_date, parent_id, release_month ON productions
+    FOR EACH ROW EXECUTE FUNCTION productions_set_release_month();
+
+-- 專輯的月份變更時更新其片段
+CREATE OR REPLACE FUNCTION productions_release_month_changed() RETURNS trigger AS $$
+BEGIN
+    -- 更新片段本身也會觸發此語句層級觸發器（即使沒有任何列），只有專輯的月份有變動時才繼續
+    IF NOT EXISTS (
+        SELECT 1
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.type = 'album' AND n.release_month IS DISTINCT FROM o.release_month
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE productions seg
+    SET release_month = n.release_month
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    WHERE seg.parent_id = n.id
+      AND n.type = 'album'
+      AND n.release_month IS DISTINCT FROM o.release_month
+      AND seg.release_month IS DISTINCT FROM n.release_month;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS productions_update_release_month ON productions;
+
+CREATE TRIGGER productions_update_release_month
+    AFTER UPDATE ON productions REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_release_month_changed();
+
+
+-- ==================== 索引與檢視 ====================
+
+-- 日期範圍篩選與依日期排序（取代 release_date 字串的索引）
+CREATE INDEX IF NOT EXISTS productions_release_month_code_idx ON productions (release_month, code);
+DROP INDEX IF EXISTS productions_release_date_code_idx;
+
+-- 新欄位只能加在最後；API 回應不輸出 release_month（見 queries.py 的 INTERNAL_VIEW_COLUMNS）
+CREATE OR REPLACE VIEW production_search_view AS
+SELECT
+    p.id,
+    p.code,
+    p.type,
+    p.parent_id,
+    s.name AS studio,
+    p.title,
+    p.release_date,
+    p.comment,
+    p.updated_at,
+    p.performer_ids,
+    p.sex_acts,
+    p.styles,
+    p.body_types,
+    p.sources,
+    p.release_month
+FROM productions p
+LEFT JOIN studios s ON p.studio_id = s.id;
+
+ANALYZE productions;
@@ -0,0 +1,95 @@
+-- 每部作品實際的公司與發行日期：effective_studio_id / effective_release_date
+--
+-- 片段的 studio_id、release_date 為 NULL（沿用所屬專輯），查詢片段的公司或日期原本都要再 JOIN 父專輯。
+-- 兩個欄位與 release_month（0011）一起由觸發器維護：自己有值時取自己，否則取所屬專輯的值；
+-- 專輯的公司或日期變更時一併更新其片段。studio_id / release_date 仍是唯一的寫入來源。
+
+ALTER TABLE productions ADD COLUMN IF NOT EXISTS effective_studio_id INTEGER;
+ALTER TABLE productions ADD COLUMN IF NOT EXISTS effective_release_date VARCHAR(7);
+
+
+-- ==================== 回填既有資料 ====================
+
+UPDATE productions p
+SET effective_studio_id = COALESCE(
+        p.studio_id,
+        (SELECT parent.studio_id FROM productions parent WHERE parent.id = p.parent_id)),
+    effective_release_date = COALESCE(
+        p.release_date,
+        (SELECT parent.release_date FROM productions parent WHERE parent.id = p.parent_id));
+
+
+-- ==================== 觸發器（取代 0011 只維護 release_month 的觸發器） ====================
+
+DROP TRIGGER IF EXISTS productions_set_release_month ON productions;
+DROP TRIGGER IF EXISTS productions_update_release_month ON productions;
+DROP FUNCTION IF EXISTS productions_set_release_month();
+DROP FUNCTION IF EXISTS productions_release_month_changed();
+
+-- 寫入時計算（直接寫入這些欄位也會被覆寫為推導值）
+CREATE OR REPLACE FUNCTION productions_set_inherited() RETURNS trigger AS $$
+DECLARE
+    parent_studio_id INTEGER;
+    parent_release_date VARCHAR(7);
+BEGIN
+    IF NEW.parent_id IS NOT NULL THEN
+        SELECT effective_studio_id, effective_release_date
+        INTO parent_studio_id, parent_release_date
+        FROM productions
+        WHERE id = NEW.parent_id;
+    END IF;
+
+    NEW.effective_studio_id := COALESCE(NEW.studio_id, parent_studio_id);
+    NEW.effective_release_date := COALESCE(NEW.release_date, parent_release_date);
+    NEW.release_month := release_month_of(NEW.effective_release_date);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS productions_set_inherited ON productions;
+
+CREATE TRIGGER productions_set_inherited
+    BEFORE INSERT OR UPDATE OF studio_id, release_date, parent_id,
+                               effective_studio_id, effective_release_date, release_month ON productions
+    FOR EACH ROW EXECUTE FUNCTION productions_set_inherited();
+
+-- 專輯的公司或日期變更時更新其片段
+CREATE OR REPLACE FUNCTION productions_inherited_changed() RETURNS trigger AS $$
+BEGIN
+    -- 更新片段本身也會觸發此語句層級觸發器（即使沒有任何列），只有專輯有變動時才繼續
+    IF NOT EXISTS (
+        SELECT 1
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.type = 'album'
+          AND (n.effective_studio_id IS DISTINCT FROM o.effective_studio_id
+               OR n.effective_release_date IS DISTINCT FROM o.effective_release_date)
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE productions seg
+    SET effective_studio_id = n.effective_studio_id,
+        effective_release_date = n.effective_release_date
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    WHERE seg.parent_id = n.id
+      AND n.type = 'album'
+      AND (n.effective_studio_id IS DISTINCT FROM o.effective_studio_id
+           OR n.effective_release_date IS DISTINCT FROM o.effective_release_date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS productions_update_inherited ON productions;
+
+CREATE TRIGGER productions_update_inherited
+    AFTER UPDATE ON productions REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION productions_inherited_changed();
+
+
+-- ==================== 索引 ====================
+
+-- 依公司篩選作品（含片段），不必再以子查詢找出該公司的專輯
+CREATE INDEX IF NOT EXISTS productions_effective_studio_id_idx ON productions (effective_studio_id);
+
+ANALYZE productions;
@@ -0,0 +1,82 @@
+-- BM25 統計（search_stats）移出寫入路徑
+--
+-- 0008 的 refresh_search_terms() 在寫入作品的交易中 UPDATE 唯一一列 search_stats，
+-- 該列的鎖持有到交易提交，所有作品的寫入（含大量匯入與 rebuild_search_terms 工作）因此互相排隊。
+-- 改為每次更新只 INSERT 一列差額到 search_stats_deltas（插入之間不互相等待），
+-- 查詢時由 search_stats_current 加總基準值與差額；compact_search_stats() 將已提交的差額併入 search_stats，
+-- 由 scripts/job_worker.py 的 supervisor 定期執行（也可排入 compact_search_stats 工作）。
+
+CREATE TABLE IF NOT EXISTS search_stats_deltas (
+    id            BIGSERIAL PRIMARY KEY,
+    documents     BIGINT NOT NULL,
+    total_length  BIGINT NOT NULL
+);
+
+-- 目前的文件數與總長度（KEYWORD_RELEVANCE_SQL 讀取）
+CREATE OR REPLACE VIEW search_stats_current AS
+SELECT s.documents + COALESCE(d.documents, 0) AS documents,
+       s.total_length + COALESCE(d.total_length, 0) AS total_length
+FROM search_stats s
+CROSS JOIN (
+    SELECT SUM(documents) AS documents, SUM(total_length) AS total_length
+    FROM search_stats_deltas
+) d;
+
+
+-- ==================== 增量更新與全量重建（取代 0008） ====================
+
+CREATE OR REPLACE FUNCTION refresh_search_terms(ids INTEGER[]) RETURNS void AS $$
+    WITH old AS (
+        DELETE FROM search_terms WHERE production_id = ANY(ids)
+        RETURNING production_id, doc_length
+    ),
+    old_docs AS (
+        SELECT DISTINCT production_id, doc_length FROM old
+    )
+    INSERT INTO search_stats_deltas (documents, total_length)
+    SELECT -COUNT(*), -COALESCE(SUM(doc_length), 0)
+    FROM old_docs
+    HAVING COUNT(*) > 0;
+
+    WITH inserted AS (
+        INSERT INTO search_terms (term, production_id, tf, doc_length)
+        SELECT term, production_id, tf, SUM(tf) OVER (PARTITION BY production_id)
+        FROM search_term_source
+        WHERE production_id = ANY(ids)
+        RETURNING production_id, doc_length
+    ),
+    new_docs AS (
+        SELECT DISTINCT production_id, doc_length FROM inserted
+    )
+    INSERT INTO search_stats_deltas (documents, total_length)
+    SELECT COUNT(*), COALESCE(SUM(doc_length), 0)
+    FROM new_docs
+    HAVING COUNT(*) > 0;
+$$ LANGUAGE sql;
+
+-- 只搬移已提交的差額；同時執行時後到者等待前者提交後略過已刪除的列
+CREATE OR REPLACE FUNCTION compact_search_stats() RETURNS void AS $$
+    WITH moved AS (
+        DELETE FROM search_stats_deltas
+        RETURNING documents, total_length
+    )
+    UPDATE search_stats
+    SET documents = documents + (SELECT COALESCE(SUM(documents), 0) FROM moved),
+        total_length = total_length + (SELECT COALESCE(SUM(total_length), 0) FROM moved)
+    WHERE EXISTS (SELECT 1 FROM moved);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rebuild_search_terms() RETURNS void AS $$
+    TRUNCATE search_terms, search_stats_deltas;
+
+    INSERT INTO search_terms (term, production_id, tf, doc_length)
+    SELECT term, production_id, tf, SUM(tf) OVER (PARTITION BY production_id)
+    FROM search_term_source;
+
+    UPDATE search_stats
+    SET documents = s.documents, total_length = s.total_length
+    FROM (
+        SELECT COUNT(*) AS documents, COALESCE(SUM(doc_length), 0) AS total_length
+        FROM (SELECT DISTINCT production_id, doc_length FROM search_terms) d
+    ) s;
+$$ LANGUAGE sql;
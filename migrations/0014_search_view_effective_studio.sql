@@ -0,0 +1,25 @@
+-- production_search_view 的 studio 改取 effective_studio_id（0012）
+--
+-- 片段的 studio_id 為 NULL，原本的檢視在 /api/search 的 studio 欄位、公司 facet、依公司排序
+-- 與 studios= 篩選中都把片段當成沒有公司。改以觸發器維護的 effective_studio_id JOIN，
+-- 片段沿用所屬專輯的公司，篩選可使用 productions_effective_studio_id_idx。欄位與順序不變。
+
+CREATE OR REPLACE VIEW production_search_view AS
+SELECT
+    p.id,
+    p.code,
+    p.type,
+    p.parent_id,
+    s.name AS studio,
+    p.title,
+    p.release_date,
+    p.comment,
+    p.updated_at,
+    p.performer_ids,
+    p.sex_acts,
+    p.styles,
+    p.body_types,
+    p.sources,
+    p.release_month
+FROM productions p
+LEFT JOIN studios s ON p.effective_studio_id = s.id;
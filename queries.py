@@ -0,0 +1,1140 @@
+"""
+GVDB 共用查詢 - 同步 (app.py) 與非同步 (async_app.py) 讀取端點共用的 SQL 與 JSON 組裝
+
+SQL 一律使用 psycopg2 的 %s 佔位符，非同步端在執行前轉換為 asyncpg 的 $n。
+"""
+
+import datetime
+import re
+
+from config import DB_JSON_RESPONSES
+
+# ==================== 全域配置：標籤圖示和排序 ====================
+STYLE_ICONS = {
+    'BDSM': '🔒',
+    '工作/西裝': '🤵',
+    '按摩': '💆',
+    '軍警': '🪖',
+    '校園': '🎓',
+    '純愛': '❤️',
+    '迷藥': '💊',
+    '運動': '⚽'
+}
+
+STYLE_ORDER = ['BDSM', '工作/西裝', '按摩', '軍警', '校園', '純愛', '迷藥', '運動']
+BODY_TYPE_ORDER = ['大叔', '年輕', '熊', '壯碩', '肌肉', '精瘦', '纖瘦']
+SOURCE_ORDER = ['4horlover', 'igay69', 'javboys', 'poapan', 'notebook', 'ssd', 'pending', 'removed', 'unseen']
+
+# production_search_view 中的陣列欄位（NULL 需轉為 []）
+ARRAY_FIELDS = ['sex_acts', 'styles', 'body_types', 'sources', 'performer_ids']
+
+# production_search_view 中只供篩選與排序使用、不輸出到 API 的欄位
+INTERNAL_VIEW_COLUMNS = ('release_month',)
+
+# 發行日期格式 'YYYY.MM'（productions.release_date），月份不明時為 'YYYY.00'
+RELEASE_DATE_PATTERN = re.compile(r'^[1-9]\d{3}\.(0\d|1[0-2])$')
+
+# 顯示演員名稱時要隱藏的匿名演員
+ALBUM_HIDDEN_NAMES = ('墨鏡男', '路人甲')
+PRODUCTION_HIDDEN_NAMES = ('墨鏡', '路人')
+
+
+def paginate(total, page, per_page, results):
+    """組裝分頁回應"""
+    return {
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': (total + per_page - 1) // per_page,
+        'results': results
+    }
+
+
+# ==================== 篩選選項 ====================
+
+STUDIO_LIST_SQL = "SELECT id, name FROM studios ORDER BY name"
+STUDIO_NAMES_SQL = "SELECT DISTINCT name FROM studios ORDER BY name"
+FILTER_TAGS_SQL = """
+    SELECT category, name
+    FROM tags
+"""
+ALL_TAGS_SQL = """
+    SELECT id, category, name FROM tags
+    ORDER BY category, name
+"""
+
+
+def build_filter_options(studio_names, tag_rows):
+    """組織篩選選項（公司列表、所有 tags，包含圖示和排序）"""
+    tags = {
+        'sex_acts': [],
+        'styles': [],
+        'body_types': [],
+        'sources': []
+    }
+
+    # 類別映射
+    category_map = {
+        'sex_act': 'sex_acts',
+        'style': 'styles',
+        'body_type': 'body_types',
+        'source': 'sources'
+    }
+
+    # 先收集所有標籤
+    for row in tag_rows:
+        category = category_map.get(row['category'])
+        if category:
+            tags[category].append(row['name'])
+
+    # 處理 styles：加上圖示並按照 STYLE_ORDER 排序
+    styles_with_icons = []
+    for style_name in STYLE_ORDER:
+        if style_name in tags['styles']:
+            icon = STYLE_ICONS.get(style_name, '')
+            styles_with_icons.append({
+                'name': style_name,
+                'display_name': f"{icon} {style_name}" if icon else style_name
+            })
+    # 加上不在 STYLE_ORDER 中的其他 style（如果有）
+    for style_name in tags['styles']:
+        if style_name not in STYLE_ORDER:
+            styles_with_icons.append({
+                'name': style_name,
+                'display_name': style_name
+            })
+    tags['styles'] = styles_with_icons
+
+    # 處理 body_types：按照 BODY_TYPE_ORDER 排序
+    tags['body_types'] = sorted(tags['body_types'],
+                                key=lambda x: BODY_TYPE_ORDER.index(x)
+                                if x in BODY_TYPE_ORDER else 999)
+
+    # 處理 sources：按照 SOURCE_ORDER 排序
+    tags['sources'] = sorted(tags['sources'],
+                             key=lambda x: SOURCE_ORDER.index(x)
+                             if x in SOURCE_ORDER else 999)
+
+    # sex_acts 保持字母排序
+    tags['sex_acts'] = sorted(tags['sex_acts'])
+
+    return {
+        'studios': list(studio_names),
+        'tags': tags
+    }
+
+
+def group_tags_by_category(all_tags):
+    """將標籤依類別分組（用於新增/編輯表單）"""
+    grouped = {
+        'sex_act': [],
+        'style': [],
+        'scenario': [],
+        'body_type': [],
+        'source': []
+    }
+    for tag in all_tags:
+        if tag['category'] in grouped:
+            grouped[tag['category']].append(tag)
+    return grouped
+
+
+# ==================== 查詢作品 ====================
+
+ALBUM_ACTORS_SQL = """
+    SELECT sn.stage_name
+    FROM stage_names sn
+    WHERE sn.id = ANY(%s)
+    ORDER BY sn.stage_name
+"""
+
+PRODUCTION_ACTORS_SQL = """
+    SELECT sn.stage_name
+    FROM stage_names sn
+    JOIN performances p ON sn.id = p.stage_name_id
+    WHERE sn.id = ANY(%s) AND p.production_id = %s
+    ORDER BY
+        CASE p.role
+            WHEN 'top' THEN 1
+            WHEN 'bottom' THEN 2
+            WHEN 'giver' THEN 3
+            WHEN 'receiver' THEN 4
+            ELSE 5
+        END,
+        sn.stage_name
+"""
+
+SEGMENTS_SQL = """
+    SELECT * FROM production_search_view
+    WHERE parent_id = %s
+    ORDER BY code
+"""
+
+# 一頁內所有專輯的片段（include_segments），演員名稱依角色排序後合併，與 /api/segments 相同
+PAGE_SEGMENTS_SQL = """
+    SELECT s.*,
+           COALESCE((
+               SELECT string_agg(sn.stage_name, ', ' ORDER BY
+                   CASE perf.role
+                       WHEN 'top' THEN 1
+                       WHEN 'bottom' THEN 2
+                       WHEN 'giver' THEN 3
+                       WHEN 'receiver' THEN 4
+                       ELSE 5
+                   END,
+                   sn.stage_name)
+               FROM performances perf
+               JOIN stage_names sn ON sn.id = perf.stage_name_id
+               WHERE perf.production_id = s.id
+           ), '') AS actors
+    FROM production_search_view s
+    WHERE s.parent_id = ANY(%s)
+    ORDER BY s.parent_id, s.code
+"""
+
+
+def group_segments(rows):
+    """PAGE_SEGMENTS_SQL 的結果依 parent_id 分組：{parent_id: [segment, ...]}"""
+    segments = {}
+    for row in rows:
+        normalize_array_fields(row)
+        segments.setdefault(row['parent_id'], []).append(row)
+    return segments
+
+
+# ==================== 關鍵字倒排索引（search_terms，見 migrations/0008） ====================
+
+# 與 search_tokens() 相同：英文字母、數字各自成詞，平假名 / 片假名 / 漢字連續的一段取 bigram
+SEARCH_TOKEN_PATTERN = re.compile(r'[a-z]+|[0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+# 關鍵字中中日文以外的片段（以空白與中日文字元分隔），各自以 ILIKE 比對子字串
+KEYWORD_CHUNK_SEPARATOR = re.compile(r'[\s\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 含有任一索引詞的作品與 BM25 分數，只保留必要的索引詞全部出現的作品：
+# 參數為 (索引詞陣列, 必要索引詞陣列, 必要索引詞數)
+KEYWORD_RELEVANCE_SQL = f"""
+    SELECT st.production_id,
+           SUM(w.idf * st.tf * {BM25_K1 + 1}
+               / (st.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * st.doc_length / w.average_length))) AS relevance
+    FROM (
+        SELECT t.term,
+               ln(1 + (s.documents - COUNT(*) + 0.5) / (COUNT(*) + 0.5)) AS idf,
+               s.total_length::float / GREATEST(s.documents, 1) AS average_length
+        FROM search_terms t
+        CROSS JOIN search_stats_current s
+        WHERE t.term = ANY(%s)
+        GROUP BY t.term, s.documents, s.total_length
+    ) w
+    JOIN search_terms st ON st.term = w.term
+    GROUP BY st.production_id
+    HAVING COUNT(*) FILTER (WHERE st.term = ANY(%s)) = %s
+"""
+
+
+def search_terms(keyword):
+    """
+    關鍵字 → 排序去重的索引詞；含有單獨一個漢字 / 假名（沒有 bigram）或沒有任何索引詞時回傳 None，
+    由呼叫端改用 ILIKE 比對
+    """
+    terms = set()
+    for run in SEARCH_TOKEN_PATTERN.findall(keyword.lower()):
+        if run.isascii():
+            terms.add(run)
+        elif len(run) == 1:
+            return None
+        else:
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return sorted(terms) or None
+
+
+def keyword_chunks(keyword):
+    """
+    關鍵字中中日文以外的片段（以空白與中日文字元分隔），各自需以 ILIKE 比對子字串：
+    英文與數字在索引中只有完整一詞，部分代碼（'GD-00' → 'GD-002'）與部分單字找不到；
+    韓文等其他文字與符號不在索引中，略過會讓篩選條件變寬
+    """
+    return [chunk for chunk in KEYWORD_CHUNK_SEPARATOR.split(keyword) if chunk]
+
+
+def build_search_query(args):
+    """
+    依查詢參數建立 production_search_view 查詢
+    回傳 (query, params, page, per_page)，query 尚未加上 LIMIT/OFFSET
+    """
+    studios = args.get('studios', '')
+    actors = args.get('actors', '')
+    types = args.get('types', '')
+    sex_acts = args.get('sex_acts', '')
+    styles = args.get('styles', '')
+    body_types = args.get('body_types', '')
+    sources = args.get('sources', '')
+    keyword = args.get('keyword', '')
+    ids = args.get('ids', '')
+    date_from = args.get('date_from', '')
+    date_to = args.get('date_to', '')
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 30))
+
+    sort_param = args.get('sort', DEFAULT_SEARCH_SORT)
+
+    # 建立基礎查詢：關鍵字可由倒排索引回答時附上 BM25 分數（relevance）。
+    # 中日文的 bigram 必須全部出現，由索引篩選；英文與數字只計入分數，篩選與其他文字由下方的 ILIKE 負責。
+    # 只有英文與數字、又不依相關度排序時不需要分數，不查詢索引
+    terms = search_terms(keyword) if keyword else None
+    required = [term for term in terms if not term.isascii()] if terms else []
+    with_relevance = bool(required) or (terms is not None and 'relevance' in sort_param)
+    if with_relevance:
+        query = f"""SELECT v.*, COALESCE(k.relevance, 0) AS relevance FROM production_search_view v
+            LEFT JOIN ({KEYWORD_RELEVANCE_SQL}) AS k ON k.production_id = v.id WHERE 1=1"""
+        params = [terms, required, len(required)]
+        if required:
+            query += " AND k.production_id IS NOT NULL"
+    else:
+        query = "SELECT * FROM production_search_view WHERE 1=1"
+        params = []
+
+    # 作品類型篩選
+    if types:
+        type_list = types.split(',')
+        expanded_types = []
+        for t in type_list:
+            if t == 'album':
+                expanded_types.extend(['album', 'segment'])
+            elif t == 'single':
+                expanded_types.append('single')
+
+        if expanded_types:
+            placeholders = ','.join(['%s'] * len(expanded_types))
+            query += f" AND type IN ({placeholders})"
+            params.extend(expanded_types)
+    elif not ids:
+        # 預設: 只顯示 album 和 single（指定 ids 時片段也會回傳）
+        query += " AND type IN ('album', 'single')"
+
+    # 指定作品 ID（頁面收到即時更新通知後只重新取得受影響的列）
+    if ids:
+        query += " AND id = ANY(%s)"
+        params.append([int(x) for x in ids.split(',')])
+
+    # 動態加入條件
+    if studios:
+        studio_list = studios.split(',')
+        placeholders = ','.join(['%s'] * len(studio_list))
+        query += f" AND studio IN ({placeholders})"
+        params.extend(studio_list)
+
+    if actors:
+        actor_ids = [int(x) for x in actors.split(',')]
+        query += " AND performer_ids && %s"
+        params.append(actor_ids)
+
+    if sex_acts:
+        tags = sex_acts.split(',')
+        query += " AND sex_acts && %s::varchar[]"
+        params.append(tags)
+
+    if styles:
+        tags = styles.split(',')
+        query += " AND styles && %s::varchar[]"
+        params.append(tags)
+
+    if body_types:
+        tags = body_types.split(',')
+        query += " AND body_types && %s::varchar[]"
+        params.append(tags)
+
+    if sources:
+        tags = sources.split(',')
+        query += " AND sources && %s::varchar[]"
+        params.append(tags)
+
+    # 沒有索引詞（如單獨一個漢字）時整個關鍵字以 ILIKE 比對；否則比對中日文以外的每個片段
+    for chunk in ([keyword] if keyword and not terms else keyword_chunks(keyword)):
+        query += " AND (code ILIKE %s OR title ILIKE %s OR comment ILIKE %s)"
+        keyword_pattern = f'%{chunk}%'
+        params.extend([keyword_pattern, keyword_pattern, keyword_pattern])
+
+    # 日期範圍以 release_month（片段沿用所屬專輯）比較，可使用 (release_month, code) 索引
+    month_from = parse_release_month(date_from)
+    if month_from:
+        query += " AND release_month >= %s"
+        params.append(month_from)
+
+    month_to = parse_release_month(date_to, end=True)
+    if month_to:
+        query += " AND release_month <= %s"
+        params.append(month_to)
+
+    # 動態排序
+    order_by_parts = []
+
+    for sort_item in sort_param.split(','):
+        if sort_item == 'relevance':
+            sort_item = 'relevance_desc'
+        if '_' in sort_item:
+            field, order = sort_item.rsplit('_', 1)
+            # 安全檢查
+            allowed_fields = {'studio': 'studio', 'code': 'code', 'title': 'title', 'date': 'release_month', 'updated': 'updated_at'}
+            # 只有查詢了索引時才有相關度分數，否則忽略
+            if with_relevance:
+                allowed_fields['relevance'] = 'relevance'
+            if field in allowed_fields and order in ['asc', 'desc']:
+                order_by_parts.append(f"{allowed_fields[field]} {order.upper()}")
+
+    if order_by_parts:
+        query += " ORDER BY " + ", ".join(order_by_parts)
+    else:
+        query += " ORDER BY studio, code, title, release_month"
+
+    return query, params, page, per_page
+
+
+def parse_release_month(value, end=False):
+    """
+    將日期篩選值轉為 release_month 的 date：'YYYY.MM' → 該月 1 日（'YYYY.00' 與 release_month_of() 相同視為 1 月）；
+    只有年份 'YYYY' 時，起始取 1 月、結束（end=True）取 12 月。格式不符時回傳 None（忽略此條件）
+    """
+    value = (value or '').strip()
+    if RELEASE_DATE_PATTERN.match(value):
+        return datetime.date(int(value[:4]), max(int(value[5:]), 1), 1)
+    if len(value) == 4 and value.isdigit() and value[0] != '0':
+        return datetime.date(int(value), 12 if end else 1, 1)
+    return None
+
+
+SEARCH_LIST_PARAMS = ['studios', 'types', 'actors', 'sex_acts', 'styles', 'body_types', 'sources', 'ids']
+DEFAULT_SEARCH_SORT = 'studio_asc,code_asc,title_asc,date_asc'
+
+
+def _sorted_list(value):
+    """逗號分隔清單 → 排序去重的 tuple（篩選條件為集合語意，順序不影響結果）"""
+    return tuple(sorted({item for item in value.split(',') if item}))
+
+
+def db_json_requested(args):
+    """是否由 Postgres 直接產生 JSON 回應（設定 DB_JSON_RESPONSES，可用 ?db_json=0/1 覆寫）"""
+    return args.get('db_json', '1' if DB_JSON_RESPONSES else '0') == '1'
+
+
+def search_cache_key(args):
+    """
+    /api/search 結果快取的鍵：清單排序、補上預設值，等價的參數組合得到相同的鍵
+    包含所有影響回應內容的參數（db_json 路徑的輸出格式與 Python 路徑不完全相同，分開快取）
+    """
+    with_facets = args.get('facets') == '1'
+    include_segments = args.get('include_segments') == '1'
+    return (
+        tuple(_sorted_list(args.get(name, '')) for name in SEARCH_LIST_PARAMS),
+        args.get('keyword', ''),
+        args.get('date_from', ''),
+        args.get('date_to', ''),
+        args.get('sort', '') or DEFAULT_SEARCH_SORT,
+        int(args.get('page', 1)),
+        int(args.get('per_page', 30)),
+        with_facets,
+        include_segments,
+        # facets 與 include_segments 一律走 Python 路徑
+        db_json_requested(args) and not with_facets and not include_segments,
+    )
+
+
+def _without_order_by(query):
+    """去掉 build_search_query 加在最後的 ORDER BY（計數與彙總不需要排序）"""
+    return query.rsplit(' ORDER BY ', 1)[0]
+
+
+def count_query(query):
+    """將查詢包成計算總數的查詢"""
+    return f"SELECT COUNT(*) as total FROM ({_without_order_by(query)}) as subquery"
+
+
+# 標籤類 facet（與篩選參數同名）
+TAG_FACETS = ['sex_acts', 'styles', 'body_types', 'sources']
+
+
+def facet_query(query):
+    """
+    在目前篩選條件下，一次彙總各公司、類型與各類標籤的作品數：
+    以 LATERAL 展開標籤陣列後用 GROUPING SETS 分組，參數與 query 相同
+    """
+    unnest = ' UNION ALL '.join(f"SELECT '{field}' AS facet, unnest(m.{field}) AS value" for field in TAG_FACETS)
+    return f"""
+        SELECT m.studio, m.type, t.facet, t.value,
+               GROUPING(m.studio) AS no_studio, GROUPING(m.type) AS no_type,
+               COUNT(DISTINCT m.id) AS count
+        FROM ({_without_order_by(query)}) AS m
+        LEFT JOIN LATERAL ({unnest}) AS t ON true
+        GROUP BY GROUPING SETS ((m.studio), (m.type), (t.facet, t.value))
+    """
+
+
+def build_facets(rows):
+    """
+    將 facet_query 的結果整理為 {'studios': {名稱: 數量}, 'types': {...}, 'sex_acts': {...}, ...}
+    rows 為 (studio, type, facet, value, no_studio, no_type, count)，各組依數量遞減排序
+    """
+    facets = {'studios': [], 'types': []}
+    facets.update({field: [] for field in TAG_FACETS})
+    for studio, production_type, facet, value, no_studio, no_type, count in rows:
+        if not no_studio:
+            if studio is not None:
+                facets['studios'].append((studio, count))
+        elif not no_type:
+            facets['types'].append((production_type, count))
+        elif facet is not None:
+            facets[facet].append((value, count))
+    return {key: dict(sorted(items, key=lambda item: (-item[1], item[0])))
+            for key, items in facets.items()}
+
+
+# ==================== 資料庫產生 JSON（DB_JSON_RESPONSES） ====================
+
+# 與 PRODUCTION_ACTORS_SQL 相同的角色排序
+_ROLE_ORDER_SQL = """
+    CASE perf.role
+        WHEN 'top' THEN 1
+        WHEN 'bottom' THEN 2
+        WHEN 'giver' THEN 3
+        WHEN 'receiver' THEN 4
+        ELSE 5
+    END"""
+
+
+def _like_patterns(hidden):
+    """將要隱藏的名稱轉為 LIKE ANY(...) 的模式陣列"""
+    return [f'%{name}%' for name in hidden]
+
+
+def _json_row_sql(alias, drop=()):
+    """
+    產生 production_search_view 一列的 jsonb 運算式，欄位與 Python 路徑一致：
+    NULL 陣列轉 []、移除內部欄位、updated_at 使用 HTTP 日期格式、actors 為合併後的演員名稱
+    需要兩個參數：專輯與單片/片段要隱藏的名稱模式陣列
+    """
+    removed = ''.join(f" - '{key}'" for key in INTERNAL_VIEW_COLUMNS + tuple(drop))
+    arrays = ',\n'.join(f"        '{key}', COALESCE({alias}.{key}, '{{}}')" for key in ARRAY_FIELDS)
+    return f"""(to_jsonb({alias}){removed}) || jsonb_build_object(
+{arrays},
+        'updated_at', to_char({alias}.updated_at, 'Dy, DD Mon YYYY HH24:MI:SS "GMT"'),
+        'actors', COALESCE(CASE WHEN {alias}.type = 'album' THEN
+            (SELECT string_agg(sn.stage_name, ', ' ORDER BY sn.stage_name)
+             FROM stage_names sn
+             WHERE sn.id = ANY({alias}.performer_ids)
+               AND NOT (sn.stage_name LIKE ANY(%s::text[])))
+        ELSE
+            (SELECT string_agg(sn.stage_name, ', ' ORDER BY {_ROLE_ORDER_SQL}, sn.stage_name)
+             FROM stage_names sn
+             JOIN performances perf ON sn.id = perf.stage_name_id
+             WHERE sn.id = ANY({alias}.performer_ids) AND perf.production_id = {alias}.id
+               AND NOT (sn.stage_name LIKE ANY(%s::text[])))
+        END, '')
+    )"""
+
+
+def build_search_json_query(query, params, page, per_page):
+    """
+    由 build_search_query 的結果產生單一語句：Postgres 直接組出整個分頁回應（含總數與演員名稱）的 JSON 文字
+    回傳 (sql, params)
+    """
+    sql = f"""
+        WITH page AS (
+            SELECT q.*, row_number() OVER () AS _ord
+            FROM ({query} LIMIT %s OFFSET %s) AS q
+        )
+        SELECT json_build_object(
+            'total', t.total,
+            'page', {int(page)},
+            'per_page', {int(per_page)},
+            'total_pages', (t.total + {int(per_page)} - 1) / {int(per_page)},
+            'results', COALESCE(
+                (SELECT json_agg({_json_row_sql('page', drop=('_ord',))} ORDER BY page._ord) FROM page),
+                '[]'::json)
+        )::text
+        FROM ({count_query(query)}) AS t
+    """
+    offset = (page - 1) * per_page
+    all_params = (list(params) + [per_page, offset]
+                  + [_like_patterns(ALBUM_HIDDEN_NAMES), _like_patterns(PRODUCTION_HIDDEN_NAMES)]
+                  + list(params))
+    return sql, all_params
+
+
+SEGMENTS_JSON_SQL = f"""
+    SELECT COALESCE(json_agg({_json_row_sql('s')} ORDER BY s.code), '[]'::json)::text
+    FROM production_search_view s
+    WHERE s.parent_id = %s
+"""
+
+
+def segments_json_params(parent_id):
+    """SEGMENTS_JSON_SQL 的參數（片段不隱藏匿名演員，與 Python 路徑相同）"""
+    return [_like_patterns(()), _like_patterns(()), parent_id]
+
+
+def normalize_array_fields(row):
+    """將 production_search_view 列中的 NULL 陣列轉為 []，並移除不輸出的內部欄位"""
+    for key in ARRAY_FIELDS:
+        if row[key] is None:
+            row[key] = []
+    for key in INTERNAL_VIEW_COLUMNS:
+        row.pop(key, None)
+    return row
+
+
+def join_actor_names(names, hidden=()):
+    """合併演員名稱，過濾掉含有 hidden 任一字串的匿名演員"""
+    return ', '.join(n for n in names if not any(h in n for h in hidden))
+
+
+# ==================== 演員查詢 ====================
+
+ACTOR_SEARCH_SQL = """
+    SELECT DISTINCT
+        a.id as actor_id,
+        sn.id as stage_name_id,
+        sn.stage_name,
+        a.actor_tag as actor_name,
+        s.name as studio_name
+    FROM stage_names sn
+    JOIN actors a ON sn.actor_id = a.id
+    LEFT JOIN studios s ON sn.studio_id = s.id
+    WHERE (sn.stage_name ILIKE %s OR a.actor_tag ILIKE %s)
+    ORDER BY sn.stage_name
+    LIMIT 20
+"""
+
+# 搜尋 actor_tag 和 stage_name（排除自動生成的演員）
+ACTOR_SUGGESTIONS_SQL = """
+    SELECT DISTINCT
+        a.id as actor_id,
+        a.actor_tag,
+        array_agg(DISTINCT sn.stage_name) as stage_names,
+        array_agg(DISTINCT s.name) as studios
+    FROM actors a
+    LEFT JOIN stage_names sn ON a.id = sn.actor_id
+    LEFT JOIN studios s ON sn.studio_id = s.id
+    WHERE (a.actor_tag ILIKE %s OR sn.stage_name ILIKE %s)
+        AND a.actor_tag NOT LIKE 'STUDIO_%%'
+    GROUP BY a.id, a.actor_tag
+    ORDER BY
+        CASE WHEN a.actor_tag ILIKE %s THEN 0 ELSE 1 END,
+        a.actor_tag
+    LIMIT 10
+"""
+
+ACTOR_SORT_OPTIONS = [
+    {'value': 'name', 'label': '按名字 (A-Z)'},
+    {'value': 'latest', 'label': '按最新作品'},
+    {'value': 'count', 'label': '按作品數量'},
+    {'value': 'newest_edit', 'label': '按最新編輯'}
+]
+
+ACTOR_BASIC_SQL = "SELECT id, actor_tag, gvdb_id, notes FROM actors WHERE id = %s"
+
+# 計算全局統計
+# 演員的作品數 = 單片數 + 專輯數（通過片段統計）
+# 角色統計 = 單片的角色 + 片段的角色（不包括專輯自身）
+ACTOR_GLOBAL_STATS_SQL = """
+    SELECT
+        COUNT(DISTINCT CASE
+            WHEN p.type = 'single' THEN p.id
+            WHEN p.type = 'segment' THEN p.parent_id
+        END) as total_productions,
+        COALESCE(SUM(CASE WHEN perf.role = 'top' THEN 1 ELSE 0 END), 0) as role_top,
+        COALESCE(SUM(CASE WHEN perf.role = 'bottom' THEN 1 ELSE 0 END), 0) as role_bottom,
+        COALESCE(SUM(CASE WHEN perf.role = 'giver' THEN 1 ELSE 0 END), 0) as role_giver,
+        COALESCE(SUM(CASE WHEN perf.role = 'receiver' THEN 1 ELSE 0 END), 0) as role_receiver,
+        COALESCE(SUM(CASE WHEN perf.role NOT IN ('top', 'bottom', 'giver', 'receiver') OR perf.role IS NULL THEN 1 ELSE 0 END), 0) as role_other
+    FROM performances perf
+    JOIN stage_names sn ON perf.stage_name_id = sn.id
+    JOIN productions p ON perf.production_id = p.id
+    WHERE sn.actor_id = %s AND p.type IN ('single', 'segment')
+"""
+
+# 取得最新作品信息（片段計為所屬專輯）
+# 片段的 effective_release_date / release_month 已沿用專輯，只有選出的一列才查詢專輯的代碼
+ACTOR_LATEST_PRODUCTION_SQL = """
+    SELECT COALESCE((SELECT code FROM productions WHERE id = latest.parent_id), latest.code) AS code,
+           latest.effective_release_date AS release_date
+    FROM (
+        SELECT p.code, p.parent_id, p.effective_release_date
+        FROM performances perf
+        JOIN stage_names sn ON perf.stage_name_id = sn.id
+        JOIN productions p ON perf.production_id = p.id
+        WHERE sn.actor_id = %s AND p.type IN ('single', 'segment')
+        ORDER BY p.release_month DESC
+        LIMIT 1
+    ) AS latest
+"""
+
+# 計算各公司的詳細統計
+# 顯示演員在所有公司的信息（即使沒有出演過）
+ACTOR_STUDIO_DETAILS_SQL = """
+    SELECT
+        s.id as studio_id,
+        s.name as studio_name,
+        sn.id as stage_name_id,
+        sn.stage_name,
+        COUNT(DISTINCT CASE
+            WHEN p.type = 'single' THEN p.id
+            WHEN p.type = 'segment' THEN p.parent_id
+        END) as productions,
+        COALESCE(SUM(CASE WHEN perf.role = 'top' THEN 1 ELSE 0 END), 0) as role_top,
+        COALESCE(SUM(CASE WHEN perf.role = 'bottom' THEN 1 ELSE 0 END), 0) as role_bottom,
+        COALESCE(SUM(CASE WHEN perf.role = 'giver' THEN 1 ELSE 0 END), 0) as role_giver,
+        COALESCE(SUM(CASE WHEN perf.role = 'receiver' THEN 1 ELSE 0 END), 0) as role_receiver,
+        COALESCE(SUM(CASE WHEN perf.role NOT IN ('top', 'bottom', 'giver', 'receiver') OR perf.role IS NULL THEN 1 ELSE 0 END), 0) as role_other,
+        (SELECT p2.effective_release_date FROM performances perf2
+         JOIN productions p2 ON perf2.production_id = p2.id
+         WHERE perf2.stage_name_id = sn.id AND p2.type IN ('single', 'segment')
+         ORDER BY p2.release_month DESC
+         LIMIT 1) as latest_date,
+        (SELECT COALESCE((SELECT code FROM productions WHERE id = p2.parent_id), p2.code) FROM performances perf2
+         JOIN productions p2 ON perf2.production_id = p2.id
+         WHERE perf2.stage_name_id = sn.id AND p2.type IN ('single', 'segment')
+         ORDER BY p2.release_month DESC
+         LIMIT 1) as latest_production_code
+    FROM stage_names sn
+    LEFT JOIN studios s ON sn.studio_id = s.id
+    LEFT JOIN performances perf ON sn.id = perf.stage_name_id
+    LEFT JOIN productions p ON perf.production_id = p.id AND p.type IN ('single', 'segment')
+    WHERE sn.actor_id = %s
+    GROUP BY s.id, s.name, sn.id, sn.stage_name
+    ORDER BY s.name
+"""
+
+
+def build_actor_query(args):
+    """
+    依查詢參數建立演員查詢
+    回傳 (count_sql, page_sql, params, page, per_page)
+    """
+    search = args.get('search', '').strip()
+    studios = args.get('studios', '')
+    sort = args.get('sort', 'name')
+    sort_order = args.get('sort_order', 'asc').lower()
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 20))
+    show_anonymous = args.get('show_anonymous', '0') == '1'
+
+    # 驗證參數
+    if sort not in ['name', 'latest', 'count', 'newest_edit']:
+        sort = 'name'
+    if sort_order not in ['asc', 'desc']:
+        sort_order = 'asc'
+    if page < 1:
+        page = 1
+    if per_page < 1 or per_page > 100:
+        per_page = 20
+
+    # 建立基礎查詢 - 查詢符合條件的演員（去重）
+    # 排除 STUDIO_ 開頭的自動生成演員
+    query_where = "a.actor_tag NOT LIKE 'STUDIO_%%'"
+
+    # 排除或包含匿名/特殊演員池
+    if not show_anonymous:
+        query_where += " AND a.actor_tag NOT IN ('ANONYMOUS_POOL', 'UNKNOWN_POOL', 'GIRL_POOL')"
+
+    params = []
+
+    # 搜尋條件
+    if search:
+        query_where += " AND (a.actor_tag ILIKE %s OR sn.stage_name ILIKE %s)"
+        search_pattern = f'%{search}%'
+        params.extend([search_pattern, search_pattern])
+
+    # 公司篩選
+    if studios:
+        try:
+            studio_ids = [int(x) for x in studios.split(',')]
+            placeholders = ','.join(['%s'] * len(studio_ids))
+            query_where += f" AND sn.studio_id IN ({placeholders})"
+            params.extend(studio_ids)
+        except ValueError:
+            pass
+
+    # 計算總數
+    count_sql = f"""
+        SELECT COUNT(DISTINCT a.id) as total
+        FROM actors a
+        LEFT JOIN stage_names sn ON a.id = sn.actor_id
+        WHERE {query_where}
+    """
+
+    # 排序子句
+    sort_by = "a.actor_tag"
+    if sort_order == 'desc' and sort == 'name':
+        sort_by = "a.actor_tag DESC"
+    elif sort_order == 'asc' and sort == 'name':
+        sort_by = "a.actor_tag ASC"
+    elif sort == 'latest':
+        # 按最新作品日期排序（片段的 release_month 已沿用所屬專輯）
+        sort_by = """(
+                (SELECT MAX(p.release_month)
+                FROM performances perf
+                JOIN productions p ON perf.production_id = p.id
+                WHERE perf.stage_name_id IN (SELECT id FROM stage_names WHERE actor_id = a.id)
+                AND p.type IN ('single', 'segment'))
+            ) DESC NULLS LAST"""
+    elif sort == 'count':
+        # 按作品數量排序
+        sort_by = """(
+            COALESCE(
+                (SELECT COUNT(DISTINCT CASE
+                    WHEN p.type IN ('single', 'album') THEN p.id
+                    WHEN p.type = 'segment' THEN p.parent_id
+                END)
+                FROM performances perf
+                JOIN productions p ON perf.production_id = p.id
+                WHERE perf.stage_name_id IN (SELECT id FROM stage_names WHERE actor_id = a.id)
+                AND p.type IN ('single', 'segment')), 0)
+            ) DESC"""
+    elif sort == 'newest_edit':
+        # 按最新編輯時間排序
+        sort_by = """(
+            COALESCE(
+                (SELECT MAX(p.updated_at)
+                FROM performances perf
+                JOIN productions p ON perf.production_id = p.id
+                WHERE perf.stage_name_id IN (SELECT id FROM stage_names WHERE actor_id = a.id)
+                AND p.type IN ('single', 'segment')), '1900-01-01')
+            ) DESC"""
+
+    # 分頁
+    offset = (page - 1) * per_page
+    # 使用 GROUP BY 避免 DISTINCT 與複雜 ORDER BY 的衝突
+    page_sql = f"""
+        SELECT a.id as actor_id
+        FROM actors a
+        LEFT JOIN stage_names sn ON a.id = sn.actor_id
+        WHERE {query_where}
+        GROUP BY a.id
+        ORDER BY {sort_by}
+        LIMIT {per_page} OFFSET {offset}
+    """
+
+    return count_sql, page_sql, params, page, per_page
+
+
+def actor_cache_key(args):
+    """/api/actors/query 結果快取的鍵（與 build_actor_query 相同的預設值與範圍檢查）"""
+    sort = args.get('sort', 'name')
+    sort_order = args.get('sort_order', 'asc').lower()
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 20))
+    if sort not in ['name', 'latest', 'count', 'newest_edit']:
+        sort = 'name'
+    # 只有依名稱排序時方向才有作用
+    if sort != 'name' or sort_order not in ['asc', 'desc']:
+        sort_order = 'asc'
+    if per_page < 1 or per_page > 100:
+        per_page = 20
+    return (
+        args.get('search', '').strip(),
+        _sorted_list(args.get('studios', '')),
+        sort, sort_order, max(page, 1), per_page,
+        args.get('show_anonymous', '0') == '1',
+    )
+
+
+def _role_counts(row):
+    return {
+        'top': row['role_top'],
+        'bottom': row['role_bottom'],
+        'giver': row['role_giver'],
+        'receiver': row['role_receiver'],
+        'other': row['role_other']
+    }
+
+
+def build_actor_result(actor, global_stats, latest_prod, studio_details):
+    """組裝單一演員的查詢結果（全局統計與各公司統計）"""
+    studio_details_list = []
+    for studio in studio_details:
+        breakdown = _role_counts(studio)
+        studio_total_roles = sum(breakdown.values()) or 1
+
+        studio_details_list.append({
+            'studio_id': studio['studio_id'],
+            'studio_name': studio['studio_name'],
+            'stage_name_id': studio['stage_name_id'],
+            'stage_name': studio['stage_name'],
+            'productions': studio['productions'],
+            'latest_date': studio['latest_date'],
+            'latest_production_code': studio['latest_production_code'],
+            'role_breakdown': breakdown,
+            'role_percentage': {
+                role: round((count / studio_total_roles) * 100) if count > 0 else 0
+                for role, count in breakdown.items()
+            }
+        })
+
+    return {
+        'actor_id': actor['id'],
+        'actor_tag': actor['actor_tag'],
+        'gvdb_id': actor['gvdb_id'],
+        'notes': actor['notes'],
+        'global_stats': {
+            'total_productions': global_stats['total_productions'],
+            'latest_production_code': latest_prod['code'] if latest_prod else None,
+            'latest_release_date': latest_prod['release_date'] if latest_prod else None,
+            'role_breakdown': _role_counts(global_stats)
+        },
+        'studio_details': studio_details_list
+    }
+
+
+# ==================== 演員合作關係（actor_costars，見 migrations/0005） ====================
+
+# 最常合作的演員
+COSTARS_SQL = """
+    SELECT c.costar_id AS actor_id, a.actor_tag,
+           (SELECT string_agg(DISTINCT sn.stage_name, ', ') FROM stage_names sn WHERE sn.actor_id = a.id) AS stage_names,
+           c.production_count, c.production_ids, c.role_pairs
+    FROM actor_costars c
+    JOIN actors a ON a.id = c.costar_id
+    WHERE c.actor_id = %s
+    ORDER BY c.production_count DESC, a.actor_tag
+    LIMIT %s
+"""
+
+COSTAR_NEIGHBORS_SQL = "SELECT actor_id, costar_id FROM actor_costars WHERE actor_id = ANY(%s)"
+
+# 路徑上相鄰兩位演員的合作資料：參數為 (actor_id 陣列, costar_id 陣列)
+COSTAR_LINKS_SQL = """
+    SELECT c.actor_id, c.costar_id, c.production_count, c.production_ids
+    FROM actor_costars c
+    JOIN unnest(%s::int[], %s::int[]) AS link(actor_id, costar_id)
+      ON c.actor_id = link.actor_id AND c.costar_id = link.costar_id
+"""
+
+ACTOR_BRIEF_SQL = """
+    SELECT a.id AS actor_id, a.actor_tag, string_agg(DISTINCT sn.stage_name, ', ') AS stage_names
+    FROM actors a
+    LEFT JOIN stage_names sn ON sn.actor_id = a.id
+    WHERE a.id = ANY(%s)
+    GROUP BY a.id
+"""
+
+
+def _join_path(parents, children, meet):
+    """由兩側的前後節點表組出經過 meet 的完整路徑"""
+    path = []
+    node = meet
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    node = children[meet]
+    while node is not None:
+        path.append(node)
+        node = children[node]
+    return path
+
+
+def find_costar_path(neighbors, source, target, max_depth):
+    """
+    雙向廣度優先搜尋兩位演員之間最短的合作路徑
+    neighbors(ids) 回傳 [(actor_id, costar_id), ...]；每一層只查詢一次（展開較小的一側）
+    回傳 actor_id 清單（含兩端），max_depth 步內找不到時回傳 None
+    """
+    if source == target:
+        return [source]
+
+    parents = {source: None}    # 由 source 展開：節點 → 前一個節點
+    children = {target: None}   # 由 target 展開：節點 → 後一個節點
+    forward, backward = {source}, {target}
+
+    for _ in range(max_depth):
+        if not forward or not backward:
+            return None
+        expand_forward = len(forward) <= len(backward)
+        frontier, seen, other = (forward, parents, children) if expand_forward else (backward, children, parents)
+
+        next_frontier = set()
+        meets = []
+        for actor_id, costar_id in neighbors(list(frontier)):
+            if costar_id in seen:
+                continue
+            seen[costar_id] = actor_id
+            next_frontier.add(costar_id)
+            if costar_id in other:
+                meets.append(costar_id)
+
+        # 另一側已展開的節點深度不一，取這一層所有交會點中最短的路徑
+        if meets:
+            return min((_join_path(parents, children, meet) for meet in meets), key=len)
+
+        if expand_forward:
+            forward = next_frontier
+        else:
+            backward = next_frontier
+    return None
+
+
+# ==================== 發行時間軸（timeline_*，見 migrations/0007） ====================
+
+# by → (彙總表, 鍵欄位, 名稱表, 名稱欄位)
+TIMELINE_DIMENSIONS = {
+    'studio': ('timeline_studio', 'studio_id', 'studios', 'name'),
+    'tag': ('timeline_tag', 'tag_id', 'tags', 'name'),
+    'actor': ('timeline_actor', 'actor_id', 'actors', 'actor_tag'),
+}
+
+# 月份為 'YYYY.MM'，年份取前四碼
+TIMELINE_GRANULARITIES = {
+    'month': 'r.period',
+    'year': 'left(r.period, 4)',
+}
+
+
+def build_timeline_query(by, granularity, ids, period_from, period_to, limit):
+    """
+    時間軸查詢：指定 ids 時只取這些對象，否則取期間內作品數最多的 limit 個
+    period_from / period_to 為 'YYYY' 或 'YYYY.MM'（含），可為 None
+    每列為 (id, name, total, period, productions)，依 total 由多到少、期間由舊到新排序
+    """
+    table, key, names, name_column = TIMELINE_DIMENSIONS[by]
+    conditions = []
+    params = []
+    if period_from:
+        conditions.append('r.period >= %s')
+        params.append(period_from)
+    if period_to:
+        # 只給年份時包含該年所有月份
+        conditions.append('r.period <= %s')
+        params.append(period_to if len(period_to) > 4 else period_to + '.99')
+    if ids:
+        conditions.append(f'r.{key} = ANY(%s)')
+        params.append(ids)
+    params.append(limit)
+
+    query = f"""
+        WITH counts AS (
+            SELECT r.{key} AS id, {TIMELINE_GRANULARITIES[granularity]} AS period, SUM(r.productions) AS productions
+            FROM {table} r
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            GROUP BY 1, 2
+        ),
+        top AS (
+            SELECT id, SUM(productions) AS total
+            FROM counts
+            GROUP BY id
+            ORDER BY total DESC, id
+            LIMIT %s
+        )
+        SELECT top.id, n.{name_column} AS name, top.total, c.period, c.productions
+        FROM top
+        JOIN counts c ON c.id = top.id
+        JOIN {names} n ON n.id = top.id
+        ORDER BY top.total DESC, top.id, c.period
+    """
+    return query, params
+
+
+def build_timeline(rows):
+    """組成 {'periods': [...], 'series': [{'id', 'name', 'total', 'counts': {period: n}}]}"""
+    series = {}
+    periods = set()
+    for row in rows:
+        entry = series.get(row['id'])
+        if entry is None:
+            entry = series[row['id']] = {'id': row['id'], 'name': row['name'], 'total': row['total'], 'counts': {}}
+        entry['counts'][row['period']] = row['productions']
+        periods.add(row['period'])
+    return {'periods': sorted(periods), 'series': list(series.values())}
+
+
+# ==================== 取得作品 ====================
+
+PRODUCTION_SQL = """
+    SELECT p.id, p.code, p.type, p.title, p.release_date, p.comment,
+           p.studio_id, s.name AS studio_name, p.parent_id
+    FROM productions p
+    LEFT JOIN studios s ON p.studio_id = s.id
+    WHERE p.id = %s
+"""
+
+PARENT_ALBUM_SQL = """
+    SELECT id, code, studio_id
+    FROM productions
+    WHERE id = %s
+"""
+
+PRODUCTION_PERFORMERS_SQL = """
+    SELECT perf.id, perf.stage_name_id, perf.role, perf.performer_type,
+           sn.stage_name, sn.studio_id, s.name AS studio_name
+    FROM performances perf
+    JOIN stage_names sn ON perf.stage_name_id = sn.id
+    LEFT JOIN studios s ON sn.studio_id = s.id
+    WHERE perf.production_id = %s
+    ORDER BY sn.stage_name
+"""
+
+PRODUCTION_TAGS_SQL = """
+    SELECT pt.tag_id, t.category, t.name
+    FROM production_tags pt
+    JOIN tags t ON pt.tag_id = t.id
+    WHERE pt.production_id = %s
+    ORDER BY t.category, t.name
+"""
+
+
+def build_production_result(production, parent_album, performers, tags, all_tags):
+    """組裝作品完整資料（用於編輯）"""
+    return {
+        'id': production['id'],
+        'code': production['code'],
+        'type': production['type'],
+        'title': production['title'],
+        'release_date': production['release_date'],
+        'comment': production['comment'],
+        'studio_id': production['studio_id'],
+        'studio_name': production['studio_name'],
+        'parent_id': production['parent_id'],
+        'parent_album': parent_album,
+        'performers': performers,
+        'tags': tags,
+        'available_tags': group_tags_by_category(all_tags)
+    }
+
+
+# ==================== 啟動預熱 ====================
+
+def _warmup_statements():
+    """預熱用語句：參考資料查詢，以及預設搜尋/演員查詢的 EXPLAIN（只規劃不執行）"""
+    search_sql, _, _, _ = build_search_query({})
+    actor_count_sql, actor_page_sql, _, _, _ = build_actor_query({})
+    plans = [search_sql, count_query(search_sql), actor_count_sql, actor_page_sql]
+    return [STUDIO_LIST_SQL, ALL_TAGS_SQL] + ['EXPLAIN ' + sql.replace('%%', '%') for sql in plans]
+
+
+WARMUP_SQL = _warmup_statements()
+
+
+# ==================== 資料版本（ETag / Last-Modified） ====================
+
+DATA_VERSION_SQL = "SELECT version, updated_at FROM data_version WHERE id = 1"
+BUMP_DATA_VERSION_SQL = """
+    UPDATE data_version
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1
+"""
+
+
+def make_etag(version):
+    """由資料版本產生 ETag（弱驗證：內容相同但壓縮方式可能不同）"""
+    return f'v{version}'
+
+
+def is_not_modified(req, etag, last_modified):
+    """依 If-None-Match / If-Modified-Since 判斷客戶端快取是否仍有效"""
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    if req.if_modified_since and last_modified is not None:
+        # HTTP 日期只精確到秒
+        return last_modified.replace(microsecond=0) <= req.if_modified_since
+    return False
@@ -0,0 +1,124 @@
+"""
+GVDB 回應層 - 快速 JSON 序列化與 gzip / brotli 壓縮
+
+- FastJSONProvider：以 orjson 序列化（未安裝時退回 Flask 預設），
+  日期、Decimal、UUID 的輸出格式與 Flask 預設相同，前端看到的 JSON 結構不變
+- compress_response：依 Accept-Encoding 壓縮超過 COMPRESS_MIN_SIZE 的文字回應
+
+app.py 與 async_app.py 共用（Quart 的 JSON provider 即 Flask 的 DefaultJSONProvider）
+"""
+
+import dataclasses
+import decimal
+import gzip
+import uuid
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from config import COMPRESS_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 退回標準函式庫
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 只提供 gzip
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/css', 'text/javascript', 'application/javascript'}
+
+
+def _default(o):
+    """orjson 無法原生處理的型別（與 Flask DefaultJSONProvider 的格式一致）"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """以 orjson 序列化的 JSON provider（輸出 UTF-8，不轉義中日文字）"""
+
+    # 鍵的順序沿用 SQL 欄位順序，省下排序成本
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            kwargs.setdefault('ensure_ascii', False)
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, indent=kwargs.get('indent')).decode('utf-8')
+
+    def dumps_bytes(self, obj, indent=None):
+        """直接輸出 bytes，省去 str 轉換"""
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent=indent), mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encodings):
+    """依 Accept-Encoding 選擇壓縮方式（優先 brotli）"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def should_compress(response):
+    """狀態碼、MIME 類型與既有 Content-Encoding 的檢查（Flask 與 Quart 共用）"""
+    return not (response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES)
+
+
+def compress_data(request, response, data):
+    """壓縮已取得的回應內容並設定標頭；不需壓縮時回傳 None"""
+    response.vary.add('Accept-Encoding')
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+        return None
+
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    response.headers['Content-Encoding'] = encoding
+    return data
+
+
+def compress_response(request, response):
+    """after_request：壓縮夠大的文字回應（Flask；async_app.py 另以 Quart 的非同步 get_data 呼叫上面兩個函式）"""
+    if response.direct_passthrough or response.is_streamed or not should_compress(response):
+        return response
+
+    data = compress_data(request, response, response.get_data())
+    if data is not None:
+        response.set_data(data)
+    return response
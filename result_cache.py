@@ -0,0 +1,80 @@
+"""
+GVDB 查詢結果快取（程序內 LRU + TTL）
+
+/api/search 與 /api/actors/query 的回應依正規化後的參數（清單排序、補上預設值）快取，
+命中時直接回傳已序列化的 JSON，不使用資料庫連線。
+
+資料版本（data_version）最多每 RESULT_CACHE_VERSION_INTERVAL 秒讀取一次；
+版本改變（任何寫入端點都會遞增）時清空全部項目。本程序的寫入請求完成後立即失效，
+其他 worker 最晚在下一次版本檢查時失效。
+
+只用於 app.py；async_app.py 的同名端點沒有結果快取，每次請求都查詢資料庫。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+class ResultCache:
+    def __init__(self, max_entries, ttl, version_interval, load_version):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_interval = version_interval
+        self._load_version = load_version
+        self._entries = OrderedDict()   # key -> (stored_at, body, mimetype)
+        self._lock = threading.Lock()
+        self._version_lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        # 每次清空時遞增；查詢期間若已失效，結果不寫入快取（避免存入寫入前的舊資料）
+        self.generation = 0
+
+    def _check_version(self):
+        """必要時重新讀取資料版本，版本改變則清空快取"""
+        if self._version is not None and time.monotonic() - self._checked_at < self.version_interval:
+            return
+        with self._version_lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.version_interval:
+                return
+            version = self._load_version()
+            with self._lock:
+                if version != self._version:
+                    self._entries.clear()
+                    self.generation += 1
+                    self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, route, key):
+        """回傳 (body, mimetype)，未命中或已過期回傳 None"""
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get((route, key))
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end((route, key))
+                metrics.RESULT_CACHE_REQUESTS.labels(route, 'hit').inc()
+                return entry[1], entry[2]
+            if entry is not None:
+                del self._entries[(route, key)]
+        metrics.RESULT_CACHE_REQUESTS.labels(route, 'miss').inc()
+        return None
+
+    def put(self, route, key, body, mimetype, generation):
+        """generation 為查詢開始前的 self.generation"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[(route, key)] = (time.monotonic(), body, mimetype)
+            self._entries.move_to_end((route, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.RESULT_CACHE_EVICTIONS.inc()
+
+    def invalidate(self):
+        """本程序寫入後呼叫：清空快取並於下次查詢時重新讀取資料版本"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self._version = None
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 負載測試腳本
+對執行中的管理系統（app.py / gunicorn / async_app.py）發送請求，
+量測各情境的吞吐量與 p50 / p95 / p99 延遲，並與基準結果比較
+
+Usage:
+    python scripts/generate_synthetic_data.py --scale medium --truncate
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python scripts/benchmark.py --url http://127.0.0.1:8000 --save-baseline
+    python scripts/benchmark.py --url http://127.0.0.1:8000            # compare to baseline
+
+Request parameters (studios, tags, stage names, production ids) are sampled from
+the database so every scenario hits real rows. Results are written to
+benchmarks/results/<timestamp>.json; --save-baseline also writes benchmarks/baseline.json.
+"""
+
+import argparse
+import http.client
+import io
+import json
+import random
+import sys
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG
+
+
+RESULTS_DIR = Path(__file__).parent.parent / 'benchmarks'
+ACTOR_SORTS = ['name', 'latest', 'count', 'newest_edit']
+TAG_PARAMS = {'sex_act': 'sex_acts', 'style': 'styles', 'body_type': 'body_types', 'source': 'sources'}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Samples:
+    """Values sampled from the database once, before the load starts"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def load(self):
+        conn = psycopg2.connect(**DB_CONFIG)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT id, name FROM studios ORDER BY id")
+            self.studios = cur.fetchall()
+            cur.execute("SELECT category, name FROM tags ORDER BY id")
+            self.tags = {}
+            for category, name in cur.fetchall():
+                self.tags.setdefault(category, []).append(name)
+            # Stage names that actually appear in performances, weighted by how often they do
+            cur.execute("""
+                SELECT sn.id, sn.stage_name
+                FROM performances perf TABLESAMPLE SYSTEM (10)
+                JOIN stage_names sn ON perf.stage_name_id = sn.id
+                LIMIT 2000
+            """)
+            self.stage_names = cur.fetchall()
+            if not self.stage_names:
+                cur.execute("SELECT id, stage_name FROM stage_names LIMIT 2000")
+                self.stage_names = cur.fetchall()
+            cur.execute("""
+                SELECT id FROM productions TABLESAMPLE SYSTEM (10)
+                WHERE type IN ('single', 'segment')
+                LIMIT 2000
+            """)
+            self.production_ids = [row[0] for row in cur.fetchall()]
+            if not self.production_ids:
+                cur.execute("SELECT id FROM productions WHERE type IN ('single', 'segment') LIMIT 2000")
+                self.production_ids = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT MIN(release_date), MAX(release_date) FROM productions")
+            self.date_range = cur.fetchone()
+        finally:
+            cur.close()
+            conn.close()
+
+        if not (self.studios and self.stage_names and self.production_ids):
+            raise RuntimeError("database has no catalog data; run generate_synthetic_data.py first")
+
+    def pick_tags(self, category, max_count=2):
+        names = self.tags.get(category, [])
+        return self.rng.sample(names, min(len(names), self.rng.randint(1, max_count)))
+
+
+class Client:
+    """One persistent HTTP connection per worker thread"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        headers = {'Accept-Encoding': 'gzip, br'}
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.conn is None:
+                conn_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.conn = conn_class(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                # Server closed the keep-alive connection: reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def get_json(self, path):
+        status, data = self.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(data)
+
+
+class Scenario:
+    """A named request generator; make_request(client) returns (method, path, body)"""
+
+    def __init__(self, name, samples):
+        self.name = name
+        self.samples = samples
+        self.rng = samples.rng
+
+    def make_request(self, client):
+        raise NotImplementedError
+
+
+class SearchScenario(Scenario):
+    """/api/search with a random combination of filters (including none)"""
+
+    def make_request(self, client):
+        s = self.samples
+        params = {}
+        rng = self.rng
+        if rng.random() < 0.4:
+            params['studios'] = ','.join(name for _, name in rng.sample(s.studios, min(len(s.studios), rng.randint(1, 3))))
+        if rng.random() < 0.3:
+            params['actors'] = ','.join(str(sid) for sid, _ in rng.sample(s.stage_names, rng.randint(1, 2)))
+        for category, param in TAG_PARAMS.items():
+            if rng.random() < 0.25:
+                params[param] = ','.join(s.pick_tags(category))
+        if rng.random() < 0.2:
+            params['types'] = rng.choice(['album', 'single', 'album,single'])
+        if rng.random() < 0.15:
+            params['keyword'] = rng.choice(s.stage_names)[1][:2]
+        if rng.random() < 0.2 and s.date_range[0]:
+            year = rng.randint(int(s.date_range[0][:4]), int(s.date_range[1][:4]))
+            params['date_from'] = f"{year}.01"
+            params['date_to'] = f"{year + rng.randint(0, 3)}.12"
+        params['page'] = rng.choice([1, 1, 1, 2, 3, 10])
+        return 'GET', '/api/search?' + urlencode(params), None
+
+
+class ActorQueryScenario(Scenario):
+    """/api/actors/query cycling through every sort and order"""
+
+    def __init__(self, name, samples):
+        super().__init__(name, samples)
+        self.combinations = [(sort, order) for sort in ACTOR_SORTS for order in ('asc', 'desc')]
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def make_request(self, client):
+        with self.lock:
+            sort, order = self.combinations[self.counter % len(self.combinations)]
+            self.counter += 1
+        params = {'sort': sort, 'sort_order': order, 'page': self.rng.choice([1, 1, 2, 5])}
+        if self.rng.random() < 0.3:
+            params['studios'] = str(self.rng.choice(self.samples.studios)[0])
+        if self.rng.random() < 0.2:
+            params['search'] = self.rng.choice(self.samples.stage_names)[1][:2]
+        return 'GET', '/api/actors/query?' + urlencode(params), None
+
+
+class AutocompleteScenario(Scenario):
+    """/api/actors/suggestions and /api/actors/search with 1-3 character prefixes"""
+
+    def make_request(self, client):
+        name = self.rng.choice(self.samples.stage_names)[1]
+        prefix = name[:self.rng.randint(1, 3)]
+        path = self.rng.choice(['/api/actors/suggestions', '/api/actors/search'])
+        return 'GET', f"{path}?{urlencode({'q': prefix})}", None
+
+
+class UpdateProductionScenario(Scenario):
+    """
+    PUT /api/production/<id> writing back the production's current values,
+    so the catalog is unchanged but the full write path (tags rewritten,
+    data version bumped) runs. The preparatory GET is not timed.
+    """
+
+    def make_request(self, client):
+        production = client.get_json(f"/api/production/{self.rng.choice(self.samples.production_ids)}")
+        body = {
+            'code': production['code'],
+            'title': production['title'],
+            'release_date': production['release_date'],
+            'comment': production['comment'],
+            'studio_id': production['studio_id'],
+            'tags': [tag['tag_id'] for tag in production['tags']],
+            'performers': [],
+            'delete_performers': [],
+        }
+        return 'PUT', f"/api/production/{production['id']}", body
+
+
+SCENARIOS = {
+    'search': SearchScenario,
+    'actors_query': ActorQueryScenario,
+    'autocomplete': AutocompleteScenario,
+    'update_production': UpdateProductionScenario,
+}
+
+
+def run_scenario(scenario, base_url, concurrency, duration, warmup, timeout):
+    """Closed-loop load: `concurrency` threads send requests back to back for `duration` seconds"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    measuring = threading.Event()
+    stop = threading.Event()
+
+    def worker():
+        client = Client(base_url, timeout)
+        local = []
+        local_errors = 0
+        while not stop.is_set():
+            try:
+                method, path, body = scenario.make_request(client)
+                start = time.perf_counter()
+                status, _ = client.request(method, path, body)
+                elapsed = time.perf_counter() - start
+                ok = 200 <= status < 400
+            except Exception:
+                ok, elapsed = False, None
+            if measuring.is_set():
+                if ok:
+                    local.append(elapsed)
+                else:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    wall = time.perf_counter() - started
+    for thread in threads:
+        thread.join(timeout + 1)
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        'p50_ms': round(1000 * percentile(latencies, 50), 2),
+        'p95_ms': round(1000 * percentile(latencies, 95), 2),
+        'p99_ms': round(1000 * percentile(latencies, 99), 2),
+    }
+
+
+def print_report(results, baseline):
+    header = f"{'scenario':<18}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    print("\n" + header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(f"{name:<18}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}")
+        base = (baseline or {}).get(name)
+        if base:
+            deltas = []
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if base[key]:
+                    deltas.append(f"{key.split('_')[0]} {100 * (r[key] - base[key]) / base[key]:+.1f}%")
+            print(f"{'  vs baseline':<18}" + ', '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load benchmark for the GVDB management API')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='base URL of the running server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per scenario (default: 8)')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per scenario (default: 30)')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds per scenario (default: 5)')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for request parameters')
+    parser.add_argument('--label', default='', help='free-form note stored with the results')
+    parser.add_argument('--baseline', type=Path, default=RESULTS_DIR / 'baseline.json',
+                        help='baseline file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    samples = Samples(args.seed)
+    try:
+        samples.load()
+    except (psycopg2.Error, RuntimeError) as e:
+        print(f"[ERROR] Could not sample request parameters: {e}")
+        sys.exit(1)
+    print(f"[OK] Sampled {len(samples.studios)} studios, {len(samples.stage_names)} stage names, "
+          f"{len(samples.production_ids)} productions")
+
+    results = {}
+    for name in names:
+        print(f"  Running {name} ({args.concurrency} clients, {args.duration:g}s)...", flush=True)
+        results[name] = run_scenario(SCENARIOS[name](name, samples), args.url, args.concurrency,
+                                     args.duration, args.warmup, args.timeout)
+
+    baseline = None
+    if args.baseline.exists() and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results')
+    print_report(results, baseline)
+
+    run = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'url': args.url,
+        'label': args.label,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'results': results,
+    }
+    output_dir = RESULTS_DIR / 'results'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+    print(f"\n[DONE] Results saved to: {output_file}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(run, f, ensure_ascii=False, indent=2)
+        print(f"  Baseline saved to: {args.baseline}")
+
+    if any(r['errors'] for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
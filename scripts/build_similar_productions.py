@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 相似作品全量計算
+以標籤、演員與公司的 IDF 加權稀疏向量計算每部作品最相似的作品（見 similarity.py），
+結果寫入 similar_productions 與 similarity_idf（需先套用 migrations/0006）
+
+Usage:
+    python scripts/build_similar_productions.py
+    python scripts/build_similar_productions.py --k 20 --max-df 0.05 --chunk-size 200
+
+Features that appear in more than --max-df of all productions (e.g. a tag used by
+most titles) carry almost no signal and are dropped; this also keeps the sparse
+products small. Lower --chunk-size if memory is tight. The tables are replaced in a
+single transaction, so readers keep seeing the previous results until it commits.
+"""
+
+import argparse
+import io
+import sys
+import os
+import time
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG, SIMILAR_TOP_K
+import similarity
+
+if similarity.np is None:
+    print("Error: numpy / scipy are not installed. Install with: pip install numpy scipy")
+    sys.exit(1)
+
+
+class SimilarityBuilder:
+    def __init__(self, k, max_df, chunk_size):
+        self.k = k
+        self.max_df = max_df
+        self.chunk_size = chunk_size
+        self.conn = None
+
+    def connect(self):
+        """Connect to PostgreSQL database"""
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            print(f"[OK] Connected to {DB_CONFIG['database']}")
+        except psycopg2.Error as e:
+            print(f"[ERROR] Failed to connect to database: {e}")
+            sys.exit(1)
+
+    def disconnect(self):
+        """Close database connection"""
+        if self.conn:
+            self.conn.close()
+
+    def load_features(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM productions")
+        total = cur.fetchone()[0]
+        cur.execute(similarity.FEATURES_SQL)
+        rows = cur.fetchall()
+        cur.close()
+        print(f"[OK] Loaded {len(rows)} features of {total} productions")
+        return rows, total
+
+    def copy_rows(self, cur, table, columns, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(str(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+    def build(self):
+        rows, total = self.load_features()
+        if not total:
+            print("[OK] No productions")
+            return
+
+        idf = similarity.compute_idf(rows, total, self.max_df)
+        dropped = sum(1 for weight in idf.values() if not weight)
+        print(f"[OK] {len(idf)} distinct features, {dropped} dropped as too common (> {self.max_df:.0%})")
+
+        start = time.perf_counter()
+        matrix, ids = similarity.build_matrix(rows, idf)
+        results = []
+        for row, neighbours in similarity.top_k(matrix, self.k, self.chunk_size):
+            production_id = ids[row]
+            results.extend((production_id, ids[column], f'{score:.6f}')
+                           for column, score in neighbours if score > 0)
+            if (row + 1) % 50000 == 0:
+                print(f"  {row + 1}/{len(ids)} productions")
+        print(f"[OK] Computed {len(results)} pairs in {time.perf_counter() - start:.1f}s")
+
+        cur = self.conn.cursor()
+        try:
+            cur.execute("DELETE FROM similarity_idf")
+            self.copy_rows(cur, 'similarity_idf', ['kind', 'feature_id', 'idf'],
+                           ((kind, feature_id, f'{weight:.6f}') for (kind, feature_id), weight in idf.items()))
+            cur.execute("DELETE FROM similar_productions")
+            self.copy_rows(cur, 'similar_productions', ['production_id', 'similar_id', 'score'], results)
+            self.conn.commit()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"[ERROR] Failed to write results: {e}")
+            sys.exit(1)
+        finally:
+            cur.close()
+
+        cur = self.conn.cursor()
+        cur.execute("ANALYZE similar_productions")
+        cur.execute("ANALYZE similarity_idf")
+        self.conn.commit()
+        cur.close()
+        print("[DONE] similar_productions rebuilt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the similar productions table')
+    parser.add_argument('--k', type=int, default=SIMILAR_TOP_K, help='neighbours kept per production')
+    parser.add_argument('--max-df', type=float, default=0.1,
+                        help='drop features used by more than this fraction of productions')
+    parser.add_argument('--chunk-size', type=int, default=500, help='rows per sparse matrix product')
+    args = parser.parse_args()
+
+    builder = SimilarityBuilder(args.k, args.max_df, args.chunk_size)
+    try:
+        builder.connect()
+        builder.build()
+    except KeyboardInterrupt:
+        print("\n[CANCELLED] Build cancelled by user")
+        sys.exit(1)
+    finally:
+        builder.disconnect()
+
+
+if __name__ == '__main__':
+    main()
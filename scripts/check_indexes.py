@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 索引檢查腳本
+以 EXPLAIN 檢查熱門查詢（由 queries.py 產生的實際 SQL）是否使用 migrations/0004 建立的索引
+
+Usage:
+    python scripts/migrate.py
+    python scripts/check_indexes.py            # is each index usable for its query shape?
+    python scripts/check_indexes.py --strict   # does the planner pick it with default costs?
+
+By default sequential scans are disabled for the session, so the check passes even on
+a tiny database as long as the index can serve the query. Use --strict on a database
+filled by generate_synthetic_data.py (medium scale or larger) to check the planner's
+real choice. Exits with status 1 if any check fails.
+"""
+
+import argparse
+import io
+import json
+import sys
+import os
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG
+from similarity import SIMILAR_SQL
+from queries import (
+    SEGMENTS_SQL, ACTOR_SUGGESTIONS_SQL, ACTOR_GLOBAL_STATS_SQL, PRODUCTION_TAGS_SQL,
+    COSTARS_SQL, COSTAR_NEIGHBORS_SQL,
+    build_search_query, build_actor_query, build_timeline_query,
+)
+
+
+def search(args, limit=30):
+    query, params, _, _ = build_search_query(args)
+    return query + " LIMIT %s", params + [limit]
+
+
+def actor_count(args):
+    count_sql, _, params, _, _ = build_actor_query(args)
+    return count_sql, params
+
+
+# (name, (sql, params), indexes of which at least one must appear in the plan)
+CHECKS = [
+    ('search: actor filter',
+     search({'actors': '1,2'}), ['productions_performer_ids_gin']),
+    ('search: sex_act filter',
+     search({'sex_acts': '肛'}), ['productions_sex_acts_gin']),
+    ('search: style filter',
+     search({'styles': '純愛'}), ['productions_styles_gin']),
+    ('search: body_type filter',
+     search({'body_types': '肌肉'}), ['productions_body_types_gin']),
+    ('search: source filter',
+     search({'sources': 'unseen'}), ['productions_sources_gin']),
+    ('search: keyword (inverted index)',
+     search({'keyword': '誘惑', 'sort': 'relevance'}), ['search_terms_pkey']),
+    ('search: single-character keyword',
+     search({'keyword': '誘'}), ['productions_code_trgm', 'productions_title_trgm', 'productions_comment_trgm']),
+    ('search: partial code keyword',
+     search({'keyword': 'GD-00'}), ['productions_code_trgm', 'productions_title_trgm', 'productions_comment_trgm']),
+    ('search: studio filter (segments via album)',
+     search({'studios': 'GD', 'types': 'album'}), ['productions_effective_studio_id_idx']),
+    ('search: sort by updated',
+     search({'sort': 'updated_desc'}), ['productions_updated_at_idx']),
+    ('search: date range, sort by date',
+     search({'date_from': '2020.01', 'date_to': '2020.12', 'sort': 'date_desc'}),
+     ['productions_release_month_code_idx']),
+    ('segments of an album',
+     (SEGMENTS_SQL, [1]), ['productions_parent_id_code_idx']),
+    ('production picker: studio filter (segments via album)',
+     ("SELECT id FROM productions WHERE effective_studio_id IN (%s)", [1]),
+     ['productions_effective_studio_id_idx']),
+    ('production code uniqueness check',
+     ("SELECT id FROM productions WHERE code = %s AND id != %s", ['GD-002', 1]), ['productions_code_key']),
+    ('production tags',
+     (PRODUCTION_TAGS_SQL, [1]), ['production_tags_pkey']),
+    ('actor suggestions',
+     (ACTOR_SUGGESTIONS_SQL, ['%翔%', '%翔%', '翔%']), ['stage_names_stage_name_trgm', 'actors_actor_tag_trgm']),
+    ('actor stats by stage name',
+     (ACTOR_GLOBAL_STATS_SQL, [1]), ['performances_stage_name_id_idx']),
+    ('actor query: studio filter',
+     actor_count({'studios': '1'}), ['stage_names_studio_id_idx']),
+    ('top co-stars',
+     (COSTARS_SQL, [1, 20]), ['actor_costars_count_idx', 'actor_costars_pkey']),
+    ('co-star path expansion',
+     (COSTAR_NEIGHBORS_SQL, [[1, 2, 3]]), ['actor_costars_pkey', 'actor_costars_count_idx']),
+    ('similar productions',
+     (SIMILAR_SQL, [1, 10]), ['similar_productions_score_idx']),
+    ('release timeline of chosen studios',
+     build_timeline_query('studio', 'month', [1, 2], '2015', None, 2), ['timeline_studio_studio_id_idx']),
+    ('release timeline of chosen actors',
+     build_timeline_query('actor', 'year', [1, 2], None, None, 2), ['timeline_actor_actor_id_idx']),
+]
+
+
+def plan_indexes(node, found=None):
+    """Collect every 'Index Name' in an EXPLAIN (FORMAT JSON) plan tree"""
+    if found is None:
+        found = set()
+    if 'Index Name' in node:
+        found.add(node['Index Name'])
+    for child in node.get('Plans', []):
+        plan_indexes(child, found)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that hot queries use the migration indexes')
+    parser.add_argument('--strict', action='store_true',
+                        help='keep default planner settings instead of disabling sequential scans')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of failing checks')
+    args = parser.parse_args()
+
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.Error as e:
+        print(f"[ERROR] Failed to connect to database: {e}")
+        sys.exit(1)
+
+    cur = conn.cursor()
+    if not args.strict:
+        cur.execute("SET enable_seqscan = off")
+
+    failures = 0
+    print(f"\n[START] Checking {len(CHECKS)} query plans ({'strict' if args.strict else 'index usable'})...")
+    for name, (sql, params), expected in CHECKS:
+        cur.execute("EXPLAIN (FORMAT JSON) " + cur.mogrify(sql, params).decode('utf-8'))
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        used = plan_indexes(plan[0]['Plan'])
+        if used & set(expected):
+            print(f"  [OK] {name}: {', '.join(sorted(used & set(expected)))}")
+        else:
+            failures += 1
+            print(f"  [FAIL] {name}: expected {' or '.join(expected)}, plan uses {sorted(used) or 'no index'}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+
+    cur.close()
+    conn.rollback()
+    conn.close()
+
+    print(f"\n[DONE] {len(CHECKS) - failures}/{len(CHECKS)} checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
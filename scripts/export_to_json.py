@@ -3,12 +3,16 @@
 """
 GVDB 資料庫導出 JSON 腳本
 將 PostgreSQL 資料庫中的資料導出為 JSON 檔案，供靜態網站使用
+
+設定 GVDB_EXPORT_METRICS_FILE 時，各資料表的導出時間與筆數會以 Prometheus
+文字格式寫入該檔案（供 node_exporter 的 textfile collector 收集）。
 """
 
 import json
 import sys
 import os
-from datetime import datetime
+import time
+from datetime import date, datetime
 from pathlib import Path
 
 # Fix encoding for Windows
@@ -23,6 +27,11 @@ except ImportError:
     print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
     sys.exit(1)
 
+try:
+    from prometheus_client import CollectorRegistry, Gauge, write_to_textfile
+except ImportError:
+    CollectorRegistry = None
+
 # Import config from parent directory
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import DB_CONFIG
@@ -32,6 +41,9 @@ class GVDBExporter:
     def __init__(self):
         self.conn = None
         self.output_dir = Path(__file__).parent.parent / 'view_only' / 'data'
+        self.metrics_file = os.environ.get('GVDB_EXPORT_METRICS_FILE')
+        # table -> (duration seconds, rows, success)
+        self.table_stats = {}
 
     def connect(self):
         """Connect to PostgreSQL database"""
@@ -77,7 +89,7 @@ class GVDBExporter:
             # Convert datetime and other special types to JSON-compatible formats
             for item in data:
                 for key, value in item.items():
-                    if isinstance(value, datetime):
+                    if isinstance(value, (datetime, date)):
                         item[key] = value.isoformat()
                     elif isinstance(value, list):
                         # Handle PostgreSQL arrays
@@ -91,6 +103,7 @@ class GVDBExporter:
     def export_table(self, table_name):
         """Export table to JSON file"""
         print(f"  Exporting {table_name}...", end=' ')
+        start = time.perf_counter()
         data = self.query_table(table_name)
 
         output_file = self.output_dir / f"{table_name}.json"
@@ -98,10 +111,44 @@ class GVDBExporter:
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             print(f"[OK] ({len(data)} records)")
-            return True
+            success = True
         except Exception as e:
             print(f"[ERROR] Error: {e}")
-            return False
+            success = False
+
+        self.table_stats[table_name] = (time.perf_counter() - start, len(data), success)
+        return success
+
+    def write_metrics(self, success):
+        """Write per-table export metrics in Prometheus text format"""
+        if not self.metrics_file:
+            return
+        if CollectorRegistry is None:
+            print("[WARN] prometheus_client is not installed, skipping metrics file")
+            return
+
+        registry = CollectorRegistry()
+        duration = Gauge('gvdb_export_table_duration_seconds', 'Time spent exporting a table',
+                         ['table'], registry=registry)
+        rows = Gauge('gvdb_export_table_rows', 'Rows exported from a table',
+                     ['table'], registry=registry)
+        table_success = Gauge('gvdb_export_table_success', '1 if the table was exported',
+                              ['table'], registry=registry)
+        for table, (seconds, count, ok) in self.table_stats.items():
+            duration.labels(table).set(seconds)
+            rows.labels(table).set(count)
+            table_success.labels(table).set(1 if ok else 0)
+
+        last_run = Gauge('gvdb_export_last_run_timestamp_seconds', 'Time of the last export run',
+                         registry=registry)
+        last_run.set_to_current_time()
+        if success:
+            last_success = Gauge('gvdb_export_last_success_timestamp_seconds',
+                                 'Time of the last fully successful export', registry=registry)
+            last_success.set_to_current_time()
+
+        write_to_textfile(self.metrics_file, registry)
+        print(f"  Metrics written to: {self.metrics_file}")
 
     def export_all(self):
         """Export all tables"""
@@ -126,7 +173,9 @@ class GVDBExporter:
         print(f"\n[DONE] Export complete: {success_count}/{len(tables)} tables exported")
         print(f"  Files saved to: {self.output_dir}")
 
-        return success_count == len(tables)
+        success = success_count == len(tables)
+        self.write_metrics(success)
+        return success
 
 
 def main():
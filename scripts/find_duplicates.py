@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 重複資料偵測
+以分組鍵找出疑似重複的作品與演員（見 duplicates.py），寫入 duplicate_candidates
+供 /admin/duplicates 審核（需先套用 migrations/0009）
+
+Usage:
+    python scripts/find_duplicates.py
+    python scripts/find_duplicates.py --kind production --workers 8 --threshold 0.7
+
+Only pairs that share a blocking key (a normalized code part, studio + release
+month, or one of the rarest title / name n-grams) are scored, so the work grows
+with the block sizes rather than with the square of the catalog. Blocks larger
+than --max-block carry little signal and are skipped. Pending candidates of each
+kind are replaced in a single transaction; pairs already marked duplicate or
+distinct are kept and never re-queued.
+"""
+
+import argparse
+import io
+import sys
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+    from psycopg2.extras import Json, execute_values
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG
+import duplicates
+
+# Roughly this many pairs are sent to a worker at a time
+PAIRS_PER_TASK = 50000
+
+DEFAULT_THRESHOLDS = {'production': 0.7, 'actor': 0.8}
+
+
+class DuplicateFinder:
+    def __init__(self, workers, threshold, max_block):
+        self.workers = workers
+        self.threshold = threshold
+        self.max_block = max_block
+        self.conn = None
+
+    def connect(self):
+        """Connect to PostgreSQL database"""
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            print(f"[OK] Connected to {DB_CONFIG['database']}")
+        except psycopg2.Error as e:
+            print(f"[ERROR] Failed to connect to database: {e}")
+            sys.exit(1)
+
+    def disconnect(self):
+        """Close database connection"""
+        if self.conn:
+            self.conn.close()
+
+    def load(self, kind):
+        cur = self.conn.cursor()
+        if kind == 'production':
+            cur.execute(duplicates.PRODUCTIONS_SQL)
+            records = duplicates.prepare_productions(cur.fetchall())
+        else:
+            cur.execute(duplicates.ACTORS_SQL)
+            records = duplicates.prepare_actors(cur.fetchall())
+        cur.close()
+        print(f"[OK] Loaded {len(records)} {kind} records")
+        return records
+
+    def tasks(self, blocks):
+        """Group blocks into tasks of about PAIRS_PER_TASK pairs each"""
+        task, pairs = [], 0
+        for ids in blocks:
+            task.append(ids)
+            pairs += len(ids) * (len(ids) - 1) // 2
+            if pairs >= PAIRS_PER_TASK:
+                yield task
+                task, pairs = [], 0
+        if task:
+            yield task
+
+    def score(self, kind, records, blocks, threshold):
+        """Score every pair within the blocks across a process pool"""
+        results = {}
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=duplicates.init_worker,
+                                 initargs=(kind, records, threshold)) as executor:
+            for batch in executor.map(duplicates.score_blocks, self.tasks(blocks)):
+                for left, right, score, details in batch:
+                    results[(left, right)] = (score, details)
+        return results
+
+    def write(self, kind, results):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("DELETE FROM duplicate_candidates WHERE kind = %s AND status = 'pending'", (kind,))
+            execute_values(
+                cur,
+                """
+                INSERT INTO duplicate_candidates (kind, left_id, right_id, score, details)
+                VALUES %s
+                ON CONFLICT (kind, left_id, right_id) DO NOTHING
+                """,
+                ((kind, left, right, round(score, 4), Json(details))
+                 for (left, right), (score, details) in results.items()),
+                page_size=1000,
+            )
+            self.conn.commit()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"[ERROR] Failed to write {kind} candidates: {e}")
+            sys.exit(1)
+        finally:
+            cur.close()
+
+    def run(self, kind):
+        records = self.load(kind)
+        if len(records) < 2:
+            print(f"[OK] Not enough {kind} records")
+            return
+
+        start = time.perf_counter()
+        if kind == 'production':
+            blocks = duplicates.production_blocks(records, self.max_block)
+        else:
+            blocks = duplicates.actor_blocks(records, self.max_block)
+        pairs = sum(len(ids) * (len(ids) - 1) // 2 for ids in blocks)
+        print(f"[OK] {len(blocks)} blocks, {pairs} pairs to score ({time.perf_counter() - start:.1f}s)")
+
+        start = time.perf_counter()
+        threshold = self.threshold if self.threshold is not None else DEFAULT_THRESHOLDS[kind]
+        results = self.score(kind, records, blocks, threshold)
+        print(f"[OK] {len(results)} {kind} candidates >= {threshold} ({time.perf_counter() - start:.1f}s)")
+
+        self.write(kind, results)
+        print(f"[DONE] {kind} candidates written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find candidate duplicate productions and actors')
+    parser.add_argument('--kind', choices=['production', 'actor', 'all'], default='all',
+                        help='which records to check')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='scoring processes')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='minimum score to keep (default: 0.7 for productions, 0.8 for actors)')
+    parser.add_argument('--max-block', type=int, default=duplicates.MAX_BLOCK_SIZE,
+                        help='skip blocking keys shared by more records than this')
+    args = parser.parse_args()
+
+    finder = DuplicateFinder(args.workers, args.threshold, args.max_block)
+    kinds = duplicates.KINDS if args.kind == 'all' else [args.kind]
+    try:
+        finder.connect()
+        for kind in kinds:
+            finder.run(kind)
+    except KeyboardInterrupt:
+        print("\n[CANCELLED] Detection cancelled by user")
+        sys.exit(1)
+    finally:
+        finder.disconnect()
+
+
+if __name__ == '__main__':
+    main()
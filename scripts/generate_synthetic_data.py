@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 合成資料產生腳本
+依指定規模產生 studios / actors / stage_names / productions（含專輯與片段）/
+performances / production_tags，用於效能測試與基準量測
+
+Usage:
+    python scripts/migrate.py
+    python scripts/generate_synthetic_data.py --scale medium --truncate
+    python scripts/generate_synthetic_data.py --productions 2000000 --seed 7 --truncate
+
+Distributions are skewed on purpose so the benchmark sees realistic hot spots:
+a few studios release most titles, a few actors appear in most scenes, and
+tag popularity follows a power law. The same --seed always yields the same data.
+"""
+
+import argparse
+import io
+import json
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG
+
+
+SCALES = {
+    'tiny': 1_000,
+    'small': 10_000,
+    'medium': 100_000,
+    'large': 1_000_000,
+    'xlarge': 3_000_000,
+}
+
+TABLES = ['production_tags', 'performances', 'productions', 'stage_names', 'actors', 'studios', 'tags']
+
+# Special actor pools created for every studio (same names add_studio uses)
+POOL_ACTORS = [
+    ('ANONYMOUS_POOL', '墨鏡男（{}）'),
+    ('UNKNOWN_POOL', '路人甲（{}）'),
+    ('GIRL_POOL', '女（{}）'),
+]
+
+TITLE_WORDS = [
+    '搬家工人', '健身教練', '大學生', '上班族', '消防員', '警察', '游泳隊', '按摩師',
+    '誘惑', '初體驗', '出差', '合宿', '溫泉', '夏日', '深夜', '秘密', '放課後', '特訓',
+    '筋肉', '野郎', '兄貴', '後輩', '先輩', 'ガチ', 'ノンケ', '男祭', '絶頂', '連続',
+    'Summer', 'Night', 'Gym', 'Office', 'Training', 'Private', 'Uncut', 'Special',
+]
+NAME_SYLLABLES = [
+    '翔', '拓', '真', '悠', '健', '大', '颯', '蓮', '陸', '遥', '亮', '優', '誠', '雄', '輝',
+    '太', '平', '介', '斗', '樹', '仁', '一', '聖', '司', '涼', '慶', '豪', '勇', '剛', '凱',
+]
+STUDIO_WORDS = ['KO', 'GAMES', 'COAT', 'Rush', 'BOT', 'JUSTICE', 'ACCEED', 'Gaydar', 'Men', 'Club', 'Studio', 'Works']
+
+
+def zipf_cum_weights(n, exponent=1.1):
+    """Cumulative weights for random.choices where rank r has weight 1 / r^exponent"""
+    total = 0.0
+    cum = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** exponent
+        cum.append(total)
+    return cum
+
+
+def copy_value(value):
+    """Format one value for COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, list):
+        return '{' + ','.join(str(v) for v in value) + '}'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class CopyWriter:
+    """
+    Buffer rows and stream them to Postgres with COPY in chunks.
+    Rows of `depends_on` (the referenced table) are flushed first so foreign keys hold.
+    """
+
+    def __init__(self, cursor, table, columns, chunk_size=50_000, depends_on=None):
+        self.cursor = cursor
+        self.table = table
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.depends_on = depends_on
+        self.buffer = io.StringIO()
+        self.pending = 0
+        self.count = 0
+
+    def write(self, *row):
+        self.buffer.write('\t'.join(copy_value(v) for v in row))
+        self.buffer.write('\n')
+        self.pending += 1
+        self.count += 1
+        if self.pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.depends_on is not None:
+            self.depends_on.flush()
+        self.buffer.seek(0)
+        self.cursor.copy_expert(
+            f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN", self.buffer)
+        self.buffer = io.StringIO()
+        self.pending = 0
+
+
+class SyntheticGenerator:
+    def __init__(self, productions, seed, album_ratio):
+        self.conn = None
+        self.target = productions
+        self.rng = random.Random(seed)
+        self.album_ratio = album_ratio
+        self.tags_file = Path(__file__).parent.parent / 'docs' / 'data' / 'tags.json'
+
+        # Derived sizes: roughly one studio per 5k productions, one actor per 4 productions
+        self.studio_count = min(400, max(8, productions // 5_000))
+        self.actor_count = max(50, productions // 4)
+
+        self.now = datetime(2026, 1, 1)
+
+    def connect(self):
+        """Connect to PostgreSQL database"""
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            print(f"[OK] Connected to {DB_CONFIG['database']}")
+        except psycopg2.Error as e:
+            print(f"[ERROR] Failed to connect to database: {e}")
+            sys.exit(1)
+
+    def disconnect(self):
+        """Close database connection"""
+        if self.conn:
+            self.conn.close()
+            print("[OK] Disconnected from database")
+
+    def ensure_empty(self, truncate):
+        """Refuse to write into a non-empty catalog unless --truncate is given"""
+        cur = self.conn.cursor()
+        if truncate:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+            print("[OK] Truncated existing data")
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM productions) OR EXISTS (SELECT 1 FROM actors)")
+            if cur.fetchone()[0]:
+                print("[ERROR] Database already contains data; re-run with --truncate to replace it")
+                sys.exit(1)
+        cur.close()
+
+    def random_timestamp(self, year):
+        """A timestamp inside the given release year (never in the future)"""
+        start = datetime(year, 1, 1)
+        end = min(datetime(year + 1, 1, 1), self.now)
+        return start + timedelta(seconds=self.rng.randrange(max(1, int((end - start).total_seconds()))))
+
+    def random_name(self, min_len=2, max_len=3):
+        return ''.join(self.rng.choice(NAME_SYLLABLES) for _ in range(self.rng.randint(min_len, max_len)))
+
+    # -------------------- reference data --------------------
+
+    def load_tags(self, cur):
+        """Insert the real tag vocabulary (same ids as docs/data/tags.json)"""
+        with open(self.tags_file, encoding='utf-8') as f:
+            tags = json.load(f)
+        writer = CopyWriter(cur, 'tags', ['id', 'category', 'name'])
+        for tag in tags:
+            writer.write(tag['id'], tag['category'], tag['name'])
+        writer.flush()
+
+        self.tags_by_category = {}
+        for tag in tags:
+            self.tags_by_category.setdefault(tag['category'], []).append(tag['id'])
+        self.tag_weights = {
+            category: zipf_cum_weights(len(ids), 1.0)
+            for category, ids in self.tags_by_category.items()
+        }
+        print(f"  tags: {writer.count}")
+
+    def generate_studios(self, cur):
+        writer = CopyWriter(cur, 'studios', ['id', 'name', 'country'])
+        self.studios = []
+        names = set()
+        for studio_id in range(1, self.studio_count + 1):
+            name = f"{self.rng.choice(STUDIO_WORDS)} {self.rng.choice(STUDIO_WORDS)}"
+            if name in names:
+                name = f"{name} {studio_id}"
+            names.add(name)
+            prefix = ''.join(w[0] for w in name.split()).upper() + str(studio_id)
+            writer.write(studio_id, name, self.rng.choice(['Japan', 'Japan', 'Japan', 'Taiwan', 'Thailand']))
+            self.studios.append((studio_id, name, prefix))
+        writer.flush()
+        # Studio popularity: a handful of studios release most titles
+        self.studio_weights = zipf_cum_weights(len(self.studios), 1.2)
+        print(f"  studios: {writer.count}")
+
+    def generate_actors(self, cur):
+        """Actors with 1-4 stage names each; popularity is Zipf-distributed per studio"""
+        actors = CopyWriter(cur, 'actors', ['id', 'actor_tag', 'notes', 'created_at'])
+        stage_names = CopyWriter(cur, 'stage_names', ['id', 'actor_id', 'studio_id', 'stage_name', 'created_at'],
+                                 depends_on=actors)
+
+        self.studio_stage_names = {studio_id: [] for studio_id, _, _ in self.studios}
+        self.pool_stage_names = {}
+        stage_name_id = 0
+
+        actor_id = 0
+        for actor_tag, template in POOL_ACTORS:
+            actor_id += 1
+            actors.write(actor_id, actor_tag, None, self.now)
+            for studio_id, studio_name, _ in self.studios:
+                stage_name_id += 1
+                stage_names.write(stage_name_id, actor_id, studio_id, template.format(studio_name), self.now)
+                self.pool_stage_names.setdefault(studio_id, []).append(stage_name_id)
+
+        for _ in range(self.actor_count):
+            actor_id += 1
+            name = self.random_name()
+            created = self.random_timestamp(self.rng.randint(2010, 2025))
+            actors.write(actor_id, f"ACTOR_{name}_{actor_id}", name, created)
+
+            home = self.rng.choices(self.studios, cum_weights=self.studio_weights)[0]
+            studios = [home]
+            while self.rng.random() < 0.3 and len(studios) < 4:
+                studio = self.rng.choice(self.studios)
+                if studio not in studios:
+                    studios.append(studio)
+            for studio_id, _, _ in studios:
+                stage_name_id += 1
+                stage_name = name if studio_id == home[0] else self.random_name()
+                stage_names.write(stage_name_id, actor_id, studio_id, stage_name, created)
+                self.studio_stage_names[studio_id].append(stage_name_id)
+
+        actors.flush()
+        stage_names.flush()
+
+        # Each studio has a few stars and a long tail of one-off performers
+        self.stage_name_weights = {
+            studio_id: zipf_cum_weights(len(ids), 1.05)
+            for studio_id, ids in self.studio_stage_names.items() if ids
+        }
+        print(f"  actors: {actors.count}, stage_names: {stage_names.count}")
+
+    # -------------------- productions --------------------
+
+    def pick_performers(self, studio_id):
+        """Mostly pairs, sometimes groups; occasionally includes the studio's anonymous pool"""
+        candidates = self.studio_stage_names.get(studio_id)
+        if not candidates:
+            candidates, weights = self.pool_stage_names[studio_id], None
+        else:
+            weights = self.stage_name_weights[studio_id]
+        size = self.rng.choices([1, 2, 3, 4], weights=[5, 70, 18, 7])[0]
+        picked = []
+        for _ in range(size * 2):
+            stage_name_id = self.rng.choices(candidates, cum_weights=weights)[0]
+            if stage_name_id not in picked:
+                picked.append(stage_name_id)
+            if len(picked) == size:
+                break
+        if self.rng.random() < 0.05:
+            pool_id = self.pool_stage_names[studio_id][self.rng.randrange(2)]
+            if pool_id not in picked:
+                picked.append(pool_id)
+        return picked
+
+    def pick_roles(self, count):
+        if count == 2:
+            return self.rng.choices(
+                [('top', 'bottom'), ('giver', 'receiver'), (None, None)], weights=[70, 15, 15])[0]
+        return [self.rng.choice(['top', 'bottom', None]) for _ in range(count)]
+
+    def pick_tags(self):
+        tag_ids = []
+        for category, (low, high) in (('sex_act', (1, 3)), ('style', (0, 2)),
+                                      ('body_type', (1, 2)), ('source', (1, 1))):
+            ids = self.tags_by_category.get(category)
+            if not ids:
+                continue
+            count = self.rng.randint(low, high)
+            if count:
+                chosen = self.rng.choices(ids, cum_weights=self.tag_weights[category], k=count)
+                tag_ids.extend(dict.fromkeys(chosen))
+        return tag_ids
+
+    def random_release_year(self):
+        # Output grows over time: recent years are much more frequent
+        return min(2025, 2005 + int(20 * self.rng.random() ** 0.5))
+
+    def random_title(self):
+        return ' '.join(self.rng.sample(TITLE_WORDS, self.rng.randint(2, 4)))
+
+    def generate_productions(self, cur):
+        productions = CopyWriter(cur, 'productions', [
+            'id', 'code', 'type', 'parent_id', 'studio_id', 'title', 'release_date',
+            'comment', 'created_at', 'updated_at', 'performer_ids'])
+        performances = CopyWriter(cur, 'performances', [
+            'production_id', 'stage_name_id', 'role', 'performer_type'], depends_on=productions)
+        production_tags = CopyWriter(cur, 'production_tags', ['production_id', 'tag_id'],
+                                     depends_on=productions)
+
+        studio_counters = {}
+        production_id = 0
+        started = time.perf_counter()
+
+        def write_scene(scene_id, performers, tags):
+            for stage_name_id, role in zip(performers, self.pick_roles(len(performers))):
+                performances.write(scene_id, stage_name_id, role, 'named')
+            for tag_id in tags:
+                production_tags.write(scene_id, tag_id)
+
+        while production_id < self.target:
+            studio_id, _, prefix = self.rng.choices(self.studios, cum_weights=self.studio_weights)[0]
+            studio_counters[studio_id] = studio_counters.get(studio_id, 0) + 1
+            code = f"{prefix}-{studio_counters[studio_id]:05d}"
+            year = self.random_release_year()
+            release_date = f"{year}.{self.rng.randint(1, 12):02d}"
+            created = self.random_timestamp(year)
+            updated = created if self.rng.random() < 0.8 else self.random_timestamp(max(year, 2024))
+            comment = self.random_title() if self.rng.random() < 0.05 else None
+
+            remaining = self.target - production_id
+            if remaining > 2 and self.rng.random() < self.album_ratio:
+                segment_count = min(remaining - 1, self.rng.choices(
+                    [2, 3, 4, 5, 6, 8, 12], weights=[15, 25, 25, 15, 10, 7, 3])[0])
+                album_id = production_id + 1
+                segments = []
+                album_performers = []
+                for index in range(1, segment_count + 1):
+                    performers = self.pick_performers(studio_id)
+                    segments.append((album_id + index, performers))
+                    album_performers.extend(p for p in performers if p not in album_performers)
+
+                productions.write(album_id, code, 'album', None, studio_id, self.random_title(),
+                                  release_date, comment, created, updated, sorted(album_performers))
+                for index, (segment_id, performers) in enumerate(segments, 1):
+                    # Segments inherit studio and release date from the album
+                    productions.write(segment_id, f"{code}_{index:02d}", 'segment', album_id, None,
+                                      self.random_title(), None, None, created, updated, performers)
+                    write_scene(segment_id, performers, self.pick_tags())
+                production_id = album_id + segment_count
+            else:
+                production_id += 1
+                performers = self.pick_performers(studio_id)
+                productions.write(production_id, code, 'single', None, studio_id, self.random_title(),
+                                  release_date, comment, created, updated, performers)
+                write_scene(production_id, performers, self.pick_tags())
+
+            if productions.pending == 0:
+                rate = productions.count / (time.perf_counter() - started)
+                print(f"  ... {productions.count:,} productions ({rate:,.0f}/s)")
+
+        productions.flush()
+        performances.flush()
+        production_tags.flush()
+        print(f"  productions: {productions.count:,}, performances: {performances.count:,}, "
+              f"production_tags: {production_tags.count:,}")
+
+    def finish(self, cur):
+        """Move serial sequences past the generated ids, bump the data version and ANALYZE"""
+        for table in ['studios', 'actors', 'stage_names', 'productions', 'performances', 'tags']:
+            cur.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'),
+                              COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)
+            """)
+        cur.execute("SELECT to_regclass('data_version') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+
+    def run(self, truncate):
+        print(f"\n[START] Generating ~{self.target:,} productions "
+              f"({self.studio_count} studios, {self.actor_count:,} actors)...")
+        started = time.perf_counter()
+        self.ensure_empty(truncate)
+
+        cur = self.conn.cursor()
+        self.load_tags(cur)
+        self.generate_studios(cur)
+        self.generate_actors(cur)
+        self.generate_productions(cur)
+        self.finish(cur)
+        self.conn.commit()
+
+        # ANALYZE outside the load transaction so the planner sees the new distribution
+        self.conn.autocommit = True
+        cur.execute("ANALYZE")
+        cur.close()
+        print(f"\n[DONE] Generated in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill the GVDB schema with synthetic, skewed data')
+    parser.add_argument('--scale', choices=SCALES, default='small',
+                        help='preset number of productions (default: small = 10,000)')
+    parser.add_argument('--productions', type=int, help='exact number of productions (overrides --scale)')
+    parser.add_argument('--album-ratio', type=float, default=0.25,
+                        help='probability that a release is an album with segments (default: 0.25)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed (default: 42)')
+    parser.add_argument('--truncate', action='store_true', help='delete all existing catalog data first')
+    args = parser.parse_args()
+
+    generator = SyntheticGenerator(args.productions or SCALES[args.scale], args.seed, args.album_ratio)
+
+    try:
+        generator.connect()
+        generator.run(args.truncate)
+    except KeyboardInterrupt:
+        print("\n[CANCELLED] Generation cancelled by user")
+        sys.exit(1)
+    except psycopg2.Error as e:
+        print(f"[ERROR] Database error: {e}")
+        sys.exit(1)
+    finally:
+        generator.disconnect()
+
+
+if __name__ == '__main__':
+    main()
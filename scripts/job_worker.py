@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 背景工作 worker
+執行網頁（/admin/jobs）或 API（POST /api/jobs）排入 jobs 的工作（需先套用 migrations/0010）
+
+Usage:
+    python scripts/job_worker.py                  # GVDB_JOB_WORKERS worker processes
+    python scripts/job_worker.py --workers 4
+    python scripts/job_worker.py --once           # run what is queued, then exit (cron)
+
+Each worker process claims one job at a time with FOR UPDATE SKIP LOCKED, so any
+number of workers (on any number of hosts) can share the queue. Idle workers wait
+on NOTIFY gvdb_jobs and re-check the queue every GVDB_JOB_POLL_INTERVAL seconds.
+
+Jobs reuse the maintenance scripts (export_to_json, build_similar_productions,
+find_duplicates); everything a job prints goes to job_logs. A running job updates
+its heartbeat; if a worker dies, the supervisor re-queues jobs whose heartbeat is
+older than GVDB_JOB_STALE_SECONDS (up to GVDB_JOB_MAX_ATTEMPTS attempts). Stopping
+the worker with Ctrl+C or SIGTERM puts its running jobs straight back in the queue.
+"""
+
+import argparse
+import io
+import multiprocessing
+import select
+import signal
+import socket
+import sys
+import os
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    DB_CONFIG, JOB_WORKERS, JOB_POLL_INTERVAL, JOB_HEARTBEAT_INTERVAL, JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS,
+)
+import jobs
+
+
+class JobFailed(Exception):
+    """A job finished without raising but did not succeed"""
+
+
+# ==================== Job context ====================
+
+class JobOutput(io.TextIOBase):
+    """File-like object that writes each printed line to job_logs"""
+
+    def __init__(self, job):
+        self.job = job
+        self.buffer = ''
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            if line.strip():
+                self.job.log(line.rstrip())
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def close_line(self):
+        if self.buffer.strip():
+            self.job.log(self.buffer.rstrip())
+        self.buffer = ''
+
+
+class JobContext:
+    """Passed to job handlers: parameters, progress reporting and logging"""
+
+    def __init__(self, conn, job_id, kind, params):
+        self.conn = conn
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.lock = threading.Lock()
+
+    def log(self, message):
+        with self.lock, self.conn.cursor() as cur:
+            cur.execute(jobs.LOG_SQL, (self.id, message))
+
+    def progress(self, fraction, message=None):
+        with self.lock, self.conn.cursor() as cur:
+            cur.execute(jobs.PROGRESS_SQL, (min(max(fraction, 0.0), 1.0), message, self.id))
+
+    def heartbeat(self):
+        with self.lock, self.conn.cursor() as cur:
+            cur.execute(jobs.HEARTBEAT_SQL, (self.id,))
+
+    def connect(self):
+        """A separate connection for the job's own queries"""
+        return psycopg2.connect(**DB_CONFIG)
+
+
+# ==================== Job handlers ====================
+
+def run_export_json(job):
+    from export_to_json import GVDBExporter
+
+    exporter = GVDBExporter()
+    try:
+        exporter.connect()
+        if not exporter.export_all():
+            raise JobFailed('some tables failed to export')
+    finally:
+        exporter.disconnect()
+
+
+def run_sql_function(function):
+    def handler(job):
+        conn = job.connect()
+        try:
+            with conn.cursor() as cur:
+                print(f"[START] SELECT {function}()")
+                start = time.perf_counter()
+                cur.execute(f"SELECT {function}()")
+                conn.commit()
+                print(f"[DONE] {function} finished in {time.perf_counter() - start:.1f}s")
+        finally:
+            conn.close()
+    return handler
+
+
+def run_build_similar_productions(job):
+    from build_similar_productions import SimilarityBuilder
+
+    builder = SimilarityBuilder(job.params['k'], job.params['max_df'], job.params['chunk_size'])
+    try:
+        builder.connect()
+        builder.build()
+    finally:
+        builder.disconnect()
+
+
+def run_find_duplicates(job):
+    import duplicates
+    from find_duplicates import DuplicateFinder
+
+    params = job.params
+    kinds = duplicates.KINDS if params['kind'] == 'all' else [params['kind']]
+    finder = DuplicateFinder(params['workers'], params['threshold'], params['max_block'])
+    try:
+        finder.connect()
+        for index, kind in enumerate(kinds):
+            finder.run(kind)
+            job.progress((index + 1) / len(kinds), f'{kind} done')
+    finally:
+        finder.disconnect()
+
+
+HANDLERS = {
+    'export_json': run_export_json,
+    'rebuild_timeline': run_sql_function('rebuild_timeline'),
+    'rebuild_search_terms': run_sql_function('rebuild_search_terms'),
+    'compact_search_stats': run_sql_function('compact_search_stats'),
+    'build_similar_productions': run_build_similar_productions,
+    'find_duplicates': run_find_duplicates,
+}
+
+
+# ==================== Worker process ====================
+
+def raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class JobWorker:
+    def __init__(self, index, once):
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.index = index
+        self.once = once
+        self.conn = None
+
+    def connect(self):
+        self.conn = psycopg2.connect(**DB_CONFIG)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {jobs.CHANNEL}")
+
+    def claim(self):
+        with self.conn.cursor() as cur:
+            cur.execute(jobs.CLAIM_JOB_SQL, (self.name,))
+            return cur.fetchone()
+
+    def wait(self):
+        """Sleep until a job is enqueued (NOTIFY) or the poll interval passes"""
+        if select.select([self.conn], [], [], JOB_POLL_INTERVAL) != ([], [], []):
+            self.conn.poll()
+            self.conn.notifies.clear()
+
+    def run(self):
+        self.connect()
+        print(f"[OK] Worker {self.index} ({self.name}) waiting for jobs")
+        while True:
+            job = self.claim()
+            if job is not None:
+                self.execute(*job)
+            elif self.once:
+                return
+            else:
+                self.wait()
+
+    def execute(self, job_id, kind, params, attempts):
+        print(f"[START] Job {job_id} {kind} (attempt {attempts})")
+        job = JobContext(self.conn, job_id, kind, params)
+        output = JobOutput(job)
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, stop_heartbeat), daemon=True)
+        heartbeat.start()
+
+        start = time.perf_counter()
+        status, message = 'failed', None
+        try:
+            handler = HANDLERS.get(kind)
+            if handler is None:
+                raise JobFailed(f'unknown job kind: {kind}')
+            with redirect_stdout(output), redirect_stderr(output):
+                try:
+                    handler(job)
+                finally:
+                    output.close_line()
+            status = 'succeeded'
+        except KeyboardInterrupt:
+            stop_heartbeat.set()
+            with self.conn.cursor() as cur:
+                cur.execute(jobs.RELEASE_JOB_SQL, (job_id,))
+            job.log('interrupted, job returned to the queue')
+            print(f"[CANCELLED] Job {job_id} returned to the queue")
+            raise
+        except SystemExit as e:
+            # The scripts exit(1) after printing an [ERROR] line
+            message = f'exited with status {e.code}'
+        except JobFailed as e:
+            message = str(e)
+        except Exception as e:
+            message = f'{type(e).__name__}: {e}'
+            job.log(traceback.format_exc().rstrip())
+        finally:
+            stop_heartbeat.set()
+
+        with self.conn.cursor() as cur:
+            cur.execute(jobs.FINISH_JOB_SQL, (status, message, status, job_id))
+        label = '[OK]' if status == 'succeeded' else '[ERROR]'
+        print(f"{label} Job {job_id} {kind} {status} in {time.perf_counter() - start:.1f}s"
+              + (f": {message}" if message else ''))
+
+    def heartbeat(self, job, stop):
+        while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                job.heartbeat()
+            except psycopg2.Error as e:
+                print(f"[ERROR] Heartbeat for job {job.id} failed: {e}")
+
+
+def worker_main(index, once):
+    signal.signal(signal.SIGTERM, raise_interrupt)
+    worker = JobWorker(index, once)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    except psycopg2.Error as e:
+        print(f"[ERROR] Worker {index}: {e}")
+        sys.exit(1)
+    finally:
+        if worker.conn is not None:
+            worker.conn.close()
+
+
+# ==================== Supervisor ====================
+
+class JobSupervisor:
+    def __init__(self, workers, once):
+        self.workers = workers
+        self.once = once
+        self.processes = []
+        self.conn = None
+
+    def connect(self):
+        """Connect to PostgreSQL database"""
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            self.conn.autocommit = True
+            print(f"[OK] Connected to {DB_CONFIG['database']}")
+        except psycopg2.Error as e:
+            print(f"[ERROR] Failed to connect to database: {e}")
+            sys.exit(1)
+
+    def disconnect(self):
+        """Close database connection"""
+        if self.conn:
+            self.conn.close()
+
+    def requeue_stale(self):
+        with self.conn.cursor() as cur:
+            cur.execute(jobs.REQUEUE_STALE_SQL, (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS,
+                                                 JOB_STALE_SECONDS))
+            for job_id, status in cur.fetchall():
+                print(f"[WARN] Job {job_id} lost its worker, now {status}")
+
+    def compact_search_stats(self):
+        """Fold committed search_stats_deltas rows into search_stats (keeps keyword queries' sum short)"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT compact_search_stats()")
+        except psycopg2.Error as e:
+            print(f"[WARN] compact_search_stats failed: {e}")
+
+    def spawn(self, index):
+        # spawn rather than fork so workers never share the supervisor's connection;
+        # not daemonic because jobs such as find_duplicates start their own process pools
+        process = multiprocessing.get_context('spawn').Process(
+            target=worker_main, args=(index, self.once), name=f'job-worker-{index}')
+        process.start()
+        return process
+
+    def run(self):
+        self.requeue_stale()
+        self.processes = [self.spawn(index) for index in range(self.workers)]
+        while True:
+            for process in self.processes:
+                process.join(timeout=JOB_POLL_INTERVAL / len(self.processes))
+            self.requeue_stale()
+            self.compact_search_stats()
+            if self.once:
+                if not any(process.is_alive() for process in self.processes):
+                    break
+            else:
+                self.restart_dead()
+        print("[DONE] Queue is empty")
+
+    def restart_dead(self):
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                print(f"[WARN] Worker {index} exited with code {process.exitcode}, restarting")
+                self.processes[index] = self.spawn(index)
+
+    def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued background jobs')
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS, help='jobs run at the same time')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, raise_interrupt)
+    supervisor = JobSupervisor(max(args.workers, 1), args.once)
+    try:
+        supervisor.connect()
+        supervisor.run()
+    except KeyboardInterrupt:
+        # Workers receive SIGTERM and put their running jobs back in the queue
+        supervisor.stop()
+        print("\n[CANCELLED] Workers stopped by user")
+        sys.exit(1)
+    finally:
+        supervisor.disconnect()
+
+
+if __name__ == '__main__':
+    main()
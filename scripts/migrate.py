@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GVDB 資料庫遷移腳本
+依序套用 migrations/ 下的 NNNN_name.sql，已套用的版本記錄在 schema_migrations
+
+Usage:
+    python scripts/migrate.py                 # apply pending migrations
+    python scripts/migrate.py --status        # list applied / pending migrations
+    python scripts/migrate.py --baseline 1    # mark 0001 as applied without running it
+                                              # (databases whose tables were created by hand)
+
+Each migration runs in its own transaction together with its schema_migrations row,
+so a failing migration leaves the database at the previous version.
+"""
+
+import argparse
+import hashlib
+import io
+import re
+import sys
+import os
+from pathlib import Path
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+try:
+    import psycopg2
+except ImportError:
+    print("Error: psycopg2 is not installed. Install with: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Import config from parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DB_CONFIG
+
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / 'migrations'
+MIGRATION_RE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+# Arbitrary key so two migrate runs never interleave
+ADVISORY_LOCK_KEY = 0x67766462
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     INTEGER PRIMARY KEY,
+        name        TEXT NOT NULL,
+        checksum    TEXT NOT NULL,
+        applied_at  TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class Migration:
+    def __init__(self, path):
+        match = MIGRATION_RE.match(path.name)
+        self.path = path
+        self.version = int(match.group(1))
+        self.name = match.group(2)
+        self.sql = path.read_text(encoding='utf-8')
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+    def __str__(self):
+        return f"{self.version:04d}_{self.name}"
+
+
+def load_migrations():
+    """All migration files, ordered by version"""
+    migrations = [Migration(path) for path in sorted(MIGRATIONS_DIR.glob('*.sql'))
+                  if MIGRATION_RE.match(path.name)]
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("duplicate migration version numbers in migrations/")
+    return migrations
+
+
+class Migrator:
+    def __init__(self):
+        self.conn = None
+
+    def connect(self):
+        """Connect to PostgreSQL database"""
+        try:
+            self.conn = psycopg2.connect(**DB_CONFIG)
+            print(f"[OK] Connected to {DB_CONFIG['database']}")
+        except psycopg2.Error as e:
+            print(f"[ERROR] Failed to connect to database: {e}")
+            sys.exit(1)
+
+    def disconnect(self):
+        """Close database connection"""
+        if self.conn:
+            self.conn.close()
+
+    def applied(self):
+        """{version: checksum} of applied migrations"""
+        cur = self.conn.cursor()
+        cur.execute(CREATE_TABLE_SQL)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        applied = dict(cur.fetchall())
+        cur.close()
+        self.conn.commit()
+        return applied
+
+    def lock(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+        cur.close()
+        self.conn.commit()
+
+    def status(self, migrations):
+        applied = self.applied()
+        for migration in migrations:
+            checksum = applied.get(migration.version)
+            if checksum is None:
+                state = 'pending'
+            elif checksum != migration.checksum:
+                state = 'applied (file changed since)'
+            else:
+                state = 'applied'
+            print(f"  {migration}: {state}")
+
+    def warn_changed(self, migrations, applied):
+        for migration in migrations:
+            checksum = applied.get(migration.version)
+            if checksum is not None and checksum != migration.checksum:
+                print(f"[WARN] {migration} was modified after it was applied; "
+                      f"add a new migration instead of editing old ones")
+
+    def apply(self, migration, run=True):
+        cur = self.conn.cursor()
+        try:
+            if run:
+                cur.execute(migration.sql)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum))
+            self.conn.commit()
+        except psycopg2.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def migrate(self, migrations, baseline=None):
+        self.lock()
+        applied = self.applied()
+        self.warn_changed(migrations, applied)
+
+        pending = [m for m in migrations if m.version not in applied]
+        if not pending:
+            print("[OK] Database is up to date")
+            return True
+
+        for migration in pending:
+            if baseline is not None and migration.version <= baseline:
+                self.apply(migration, run=False)
+                print(f"  {migration}: marked as applied (baseline)")
+                continue
+            print(f"  Applying {migration}...", end=' ', flush=True)
+            try:
+                self.apply(migration)
+            except psycopg2.Error as e:
+                print(f"[ERROR]\n{e}")
+                return False
+            print("[OK]")
+        print(f"[DONE] Database at version {pending[-1].version:04d}")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply GVDB schema migrations')
+    parser.add_argument('--status', action='store_true', help='show migration status and exit')
+    parser.add_argument('--baseline', type=int, metavar='VERSION',
+                        help='mark migrations up to VERSION as applied without running them')
+    args = parser.parse_args()
+
+    migrations = load_migrations()
+    migrator = Migrator()
+    try:
+        migrator.connect()
+        if args.status:
+            migrator.status(migrations)
+            sys.exit(0)
+        sys.exit(0 if migrator.migrate(migrations, args.baseline) else 1)
+    except KeyboardInterrupt:
+        print("\n[CANCELLED] Migration cancelled by user")
+        sys.exit(1)
+    finally:
+        migrator.disconnect()
+
+
+if __name__ == '__main__':
+    main()
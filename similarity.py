@@ -0,0 +1,267 @@
+"""
+GVDB 相似作品
+
+每部作品（單片、片段、專輯）以稀疏向量表示，特徵為標籤、演員（跨公司的藝名視為同一人）
+與公司（片段沿用所屬專輯的公司），權重為 IDF 並正規化為單位長度，相似度為餘弦值。
+
+- 全量計算：scripts/build_similar_productions.py 以 SciPy 稀疏矩陣乘法分批算出每部作品的
+  前 SIMILAR_TOP_K 名，寫入 similar_productions，並將各特徵的 IDF 存入 similarity_idf
+- 增量更新：update_production / add_production 後由背景執行緒（SimilarityRefresher）
+  只對共用特徵的候選作品重算該作品的清單，並把新分數合併進候選作品的清單
+- 查詢：/api/production/<id>/similar 依 (production_id, score) 索引取前 k 筆
+
+增量更新不會為因此掉出前 k 名的作品補上新的第 k 名，定期重新執行全量計算即可。
+未安裝 NumPy / SciPy 時不做增量更新（查詢仍可使用既有的結果）。
+"""
+
+import logging
+import math
+import queue
+import threading
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+except ImportError:
+    np = sp = None
+
+from config import SIMILAR_TOP_K
+
+logger = logging.getLogger(__name__)
+
+# 每部作品的特徵 (production_id, kind, feature_id)：t = 標籤、a = 演員、s = 公司
+FEATURES_SQL = """
+    SELECT pt.production_id, 't' AS kind, pt.tag_id AS feature_id
+    FROM production_tags pt
+    UNION ALL
+    SELECT DISTINCT p.id, 'a', sn.actor_id
+    FROM productions p
+    JOIN stage_names sn ON sn.id = ANY(p.performer_ids)
+    UNION ALL
+    SELECT p.id, 's', COALESCE(p.studio_id, parent.studio_id)
+    FROM productions p
+    LEFT JOIN productions parent ON parent.id = p.parent_id
+    WHERE COALESCE(p.studio_id, parent.studio_id) IS NOT NULL
+"""
+
+PRODUCTION_FEATURES_SQL = f"""
+    SELECT f.production_id, f.kind, f.feature_id
+    FROM ({FEATURES_SQL}) AS f
+    WHERE f.production_id = ANY(%s)
+"""
+
+# 與指定作品共用最多特徵的候選作品（只看 IDF > 0 的特徵，也就是全量計算時保留的特徵）
+# 各類特徵分開查詢，才能使用 production_tags / performer_ids GIN / studio_id 的索引
+CANDIDATES_SQL = f"""
+    WITH target AS (
+        SELECT f.kind, f.feature_id
+        FROM ({FEATURES_SQL}) AS f
+        JOIN similarity_idf i ON i.kind = f.kind AND i.feature_id = f.feature_id
+        WHERE f.production_id = %s AND i.idf > 0
+    ),
+    shared AS (
+        SELECT pt.production_id
+        FROM target t
+        JOIN production_tags pt ON pt.tag_id = t.feature_id
+        WHERE t.kind = 't'
+        UNION ALL
+        SELECT p.id
+        FROM target t
+        JOIN stage_names sn ON sn.actor_id = t.feature_id
+        JOIN productions p ON p.performer_ids @> ARRAY[sn.id]
+        WHERE t.kind = 'a'
+        UNION ALL
+        SELECT p.id
+        FROM target t
+        JOIN productions p ON p.studio_id = t.feature_id
+        WHERE t.kind = 's'
+        UNION ALL
+        SELECT seg.id
+        FROM target t
+        JOIN productions p ON p.studio_id = t.feature_id
+        JOIN productions seg ON seg.parent_id = p.id AND seg.studio_id IS NULL
+        WHERE t.kind = 's'
+    )
+    SELECT production_id
+    FROM shared
+    WHERE production_id <> %s
+    GROUP BY production_id
+    ORDER BY COUNT(*) DESC
+    LIMIT %s
+"""
+
+IDF_SQL = "SELECT kind, feature_id, idf FROM similarity_idf"
+
+SIMILAR_SQL = """
+    SELECT s.similar_id AS id, p.code, p.type, p.title, st.name AS studio, p.release_date, s.score
+    FROM similar_productions s
+    JOIN productions p ON p.id = s.similar_id
+    LEFT JOIN studios st ON st.id = p.studio_id
+    WHERE s.production_id = %s
+    ORDER BY s.score DESC
+    LIMIT %s
+"""
+
+# 候選作品數上限（增量更新時）
+MAX_CANDIDATES = 2000
+
+
+def build_matrix(rows, idf):
+    """
+    由特徵列建立 L2 正規化的 CSR 矩陣
+    rows: [(production_id, kind, feature_id)]；idf: {(kind, feature_id): 權重}，不在其中或權重為 0 的特徵忽略
+    回傳 (matrix, production_ids)，第 i 列對應 production_ids[i]
+    """
+    row_index = {}
+    feature_index = {}
+    r, c, v = [], [], []
+    for production_id, kind, feature_id in rows:
+        weight = idf.get((kind, feature_id))
+        if not weight:
+            continue
+        i = row_index.setdefault(production_id, len(row_index))
+        j = feature_index.setdefault((kind, feature_id), len(feature_index))
+        r.append(i)
+        c.append(j)
+        v.append(weight)
+
+    matrix = sp.csr_matrix((np.array(v, dtype=np.float32), (r, c)),
+                           shape=(len(row_index), len(feature_index)))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sp.diags(1 / norms).dot(matrix).tocsr()
+    return matrix, list(row_index)
+
+
+def compute_idf(rows, total, max_df):
+    """
+    各特徵的 IDF（log(N / df)）；出現在超過 max_df 比例作品中的特徵幾乎沒有區辨力，權重設為 0
+    （仍寫入 similarity_idf，增量更新時才能與尚未出現過的新特徵區分）
+    """
+    df = {}
+    for _, kind, feature_id in rows:
+        df[(kind, feature_id)] = df.get((kind, feature_id), 0) + 1
+    limit = max_df * total
+    return {key: math.log(total / count) if count <= limit else 0.0 for key, count in df.items()}
+
+
+def top_k(matrix, k, chunk_size=500):
+    """
+    分批計算 matrix · matrixᵀ，逐列取出相似度最高的 k 筆（排除自己）
+    產生 (row, [(column, score), ...])
+    """
+    transposed = matrix.T.tocsc()
+    for start in range(0, matrix.shape[0], chunk_size):
+        block = (matrix[start:start + chunk_size] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            row = start + offset
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            columns = block.indices[lo:hi]
+            scores = block.data[lo:hi]
+            keep = columns != row
+            columns, scores = columns[keep], scores[keep]
+            if len(scores) > k:
+                best = np.argpartition(-scores, k)[:k]
+                columns, scores = columns[best], scores[best]
+            order = np.argsort(-scores)
+            yield row, [(int(columns[i]), float(scores[i])) for i in order]
+
+
+def refresh(conn, production_id, k=SIMILAR_TOP_K):
+    """重算單一作品的相似清單，並將其分數合併到候選作品的清單（在 conn 上 commit）"""
+    cur = conn.cursor()
+    cur.execute(IDF_SQL)
+    idf = {(kind, feature_id): weight for kind, feature_id, weight in cur.fetchall()}
+    if not idf:
+        # 尚未執行過全量計算
+        cur.close()
+        return
+
+    cur.execute(CANDIDATES_SQL, (production_id, production_id, MAX_CANDIDATES))
+    candidates = [row[0] for row in cur.fetchall()]
+    cur.execute(PRODUCTION_FEATURES_SQL, ([production_id] + candidates,))
+    rows = cur.fetchall()
+
+    # 新的特徵（例如新演員）不在 IDF 表中，視為最少見的特徵
+    rare = max(idf.values())
+    for _, kind, feature_id in rows:
+        idf.setdefault((kind, feature_id), rare)
+
+    scored = []
+    if candidates:
+        matrix, ids = build_matrix(rows, idf)
+        if production_id in ids:
+            target = ids.index(production_id)
+            scores = (matrix @ matrix[target].T).toarray().ravel()
+            scored = [(ids[i], float(scores[i])) for i in range(len(ids)) if i != target and scores[i] > 0]
+    scored.sort(key=lambda item: -item[1])
+
+    cur.execute("DELETE FROM similar_productions WHERE production_id = %s OR similar_id = %s",
+                (production_id, production_id))
+    if scored:
+        best = scored[:k]
+        cur.execute("""
+            INSERT INTO similar_productions (production_id, similar_id, score)
+            SELECT %s, u.similar_id, u.score FROM unnest(%s::int[], %s::real[]) AS u(similar_id, score)
+        """, (production_id, [i for i, _ in best], [s for _, s in best]))
+        # 相似度對稱：把此作品放進候選作品的清單，再截斷為前 k 名
+        cur.execute("""
+            INSERT INTO similar_productions (production_id, similar_id, score)
+            SELECT u.production_id, %s, u.score FROM unnest(%s::int[], %s::real[]) AS u(production_id, score)
+        """, (production_id, [i for i, _ in scored], [s for _, s in scored]))
+        cur.execute("""
+            DELETE FROM similar_productions sp
+            USING (
+                SELECT production_id, similar_id,
+                       row_number() OVER (PARTITION BY production_id ORDER BY score DESC) AS rank
+                FROM similar_productions
+                WHERE production_id = ANY(%s)
+            ) ranked
+            WHERE sp.production_id = ranked.production_id AND sp.similar_id = ranked.similar_id
+              AND ranked.rank > %s
+        """, ([i for i, _ in scored], k))
+    conn.commit()
+    cur.close()
+
+
+class SimilarityRefresher:
+    """寫入端點只把作品 ID 放入佇列；增量更新在背景執行緒以主庫連線完成"""
+
+    def __init__(self, connect, max_pending=1000):
+        self._connect = connect
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def schedule(self, production_id):
+        if np is None:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(production_id)
+        except queue.Full:
+            logger.warning('相似作品更新佇列已滿，略過作品 %s', production_id)
+
+    def _ensure_thread(self):
+        # gunicorn fork 之後執行緒不會被複製，因此在第一次使用時才啟動
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='similarity-refresh', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            production_id = self._queue.get()
+            conn = None
+            try:
+                conn = self._connect()
+                refresh(conn, production_id)
+            except Exception:
+                logger.exception('相似作品更新失敗：%s', production_id)
+                if conn is not None:
+                    conn.rollback()
+            finally:
+                if conn is not None:
+                    conn.close()
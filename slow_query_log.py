@@ -0,0 +1,196 @@
+"""
+GVDB 慢查詢記錄（SLOW_QUERY_MS > 0 時啟用）
+
+超過門檻的語句記錄正規化後的 SQL、參數、耗時與呼叫的路由，
+並由背景執行緒以獨立連線補抓 EXPLAIN (ANALYZE, BUFFERS) 執行計畫，
+全部寫入本機 SQLite（SLOW_QUERY_DB），不佔用請求執行緒與連線池。
+/admin/slow_queries 依總耗時列出最慢的查詢形狀。
+
+EXPLAIN ANALYZE 會再執行一次語句，因此只對 SELECT / WITH 擷取，
+且在會被 rollback 的交易中執行；同一形狀在 SLOW_QUERY_PLAN_INTERVAL 秒內只擷取一次。
+"""
+
+import hashlib
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+import psycopg2
+
+from config import DB_CONFIG, SLOW_QUERY_MS, SLOW_QUERY_DB, SLOW_QUERY_PLAN_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_TIMEOUT_MS = 30000
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS slow_queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fingerprint TEXT NOT NULL,
+        query TEXT NOT NULL,
+        params TEXT,
+        duration_ms REAL NOT NULL,
+        route TEXT,
+        captured_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS slow_queries_fingerprint ON slow_queries (fingerprint, captured_at);
+    CREATE TABLE IF NOT EXISTS query_plans (
+        fingerprint TEXT PRIMARY KEY,
+        sql TEXT NOT NULL,
+        plan TEXT NOT NULL,
+        captured_at REAL NOT NULL
+    );
+"""
+
+SHAPES_SQL = """
+    SELECT fingerprint, query,
+           COUNT(*) AS calls,
+           SUM(duration_ms) AS total_ms,
+           AVG(duration_ms) AS mean_ms,
+           MAX(duration_ms) AS max_ms,
+           GROUP_CONCAT(DISTINCT route) AS routes,
+           datetime(MAX(captured_at), 'unixepoch', 'localtime') AS last_seen
+    FROM slow_queries
+    GROUP BY fingerprint
+    ORDER BY total_ms DESC
+    LIMIT ?
+"""
+
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize(query):
+    """正規化 SQL：合併空白，IN (%s, %s, ...) 不論個數視為同一形狀"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = _WHITESPACE_RE.sub(' ', str(query)).strip()
+    return _IN_LIST_RE.sub('IN (...)', query)
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _is_explainable(normalized):
+    head = normalized.lstrip('( ').split(' ', 1)[0].upper()
+    return head in ('SELECT', 'WITH')
+
+
+class SlowQueryRecorder:
+    """請求執行緒只把記錄放入佇列；寫入 SQLite 與 EXPLAIN 都在背景執行緒完成"""
+
+    def __init__(self, path, plan_interval, max_pending=1000):
+        self.path = path
+        self.plan_interval = plan_interval
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._plan_times = {}
+
+    def record(self, cursor, query, params, duration, route):
+        """由 db.InstrumentedCursorMixin 在語句超過門檻時呼叫"""
+        normalized = normalize(query)
+        try:
+            # 參數已在請求端代入，背景執行緒才能以完全相同的語句執行 EXPLAIN
+            sql = cursor.mogrify(query, params).decode('utf-8', 'replace')
+        except (psycopg2.Error, TypeError, ValueError):
+            sql = None
+        item = (normalized, json.dumps(params, ensure_ascii=False, default=str),
+                duration * 1000, route, time.time(), sql)
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning('慢查詢記錄佇列已滿，略過一筆記錄')
+
+    def _ensure_thread(self):
+        # gunicorn fork 之後執行緒不會被複製，因此在第一次使用時才啟動
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                    self._thread.start()
+
+    def connect_store(self):
+        store = sqlite3.connect(self.path, timeout=10)
+        store.executescript(SCHEMA_SQL)
+        return store
+
+    def _run(self):
+        store = self.connect_store()
+        explain_conn = None
+        while True:
+            normalized, params, duration_ms, route, captured_at, sql = self._queue.get()
+            key = fingerprint(normalized)
+            try:
+                with store:
+                    store.execute(
+                        "INSERT INTO slow_queries (fingerprint, query, params, duration_ms, route, captured_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, normalized, params, duration_ms, route, captured_at))
+                if sql and _is_explainable(normalized) and self._plan_due(key, captured_at):
+                    explain_conn = self._capture_plan(store, explain_conn, key, sql)
+            except Exception:
+                logger.exception('慢查詢記錄失敗')
+
+    def _plan_due(self, key, now):
+        last = self._plan_times.get(key)
+        if last is not None and now - last < self.plan_interval:
+            return False
+        self._plan_times[key] = now
+        return True
+
+    def _capture_plan(self, store, conn, key, sql):
+        """以獨立連線（不經過連線池與查詢統計）執行 EXPLAIN，回傳可重用的連線"""
+        try:
+            if conn is None or conn.closed:
+                conn = psycopg2.connect(**DB_CONFIG)
+            cur = conn.cursor()
+            cur.execute("SET LOCAL statement_timeout = %s", (EXPLAIN_TIMEOUT_MS,))
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql)
+            plan = '\n'.join(row[0] for row in cur.fetchall())
+            cur.close()
+        except psycopg2.Error as e:
+            plan = f'EXPLAIN 失敗：{e}'
+        finally:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+        with store:
+            store.execute(
+                "INSERT OR REPLACE INTO query_plans (fingerprint, sql, plan, captured_at) VALUES (?, ?, ?, ?)",
+                (key, sql, plan, time.time()))
+        return conn
+
+    # ---------- 管理頁面查詢 ----------
+
+    def worst_shapes(self, limit=50):
+        store = self.connect_store()
+        store.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in store.execute(SHAPES_SQL, (limit,))]
+        finally:
+            store.close()
+
+    def shape_detail(self, key, limit=20):
+        """單一查詢形狀的最近記錄與執行計畫"""
+        store = self.connect_store()
+        store.row_factory = sqlite3.Row
+        try:
+            samples = [dict(row) for row in store.execute(
+                "SELECT query, params, duration_ms, route, datetime(captured_at, 'unixepoch', 'localtime') AS captured "
+                "FROM slow_queries WHERE fingerprint = ? ORDER BY captured_at DESC LIMIT ?",
+                (key, limit))]
+            plan = store.execute(
+                "SELECT sql, plan, datetime(captured_at, 'unixepoch', 'localtime') AS captured "
+                "FROM query_plans WHERE fingerprint = ?", (key,)).fetchone()
+            return samples, dict(plan) if plan else None
+        finally:
+            store.close()
+
+
+recorder = SlowQueryRecorder(SLOW_QUERY_DB, SLOW_QUERY_PLAN_INTERVAL) if SLOW_QUERY_MS > 0 else None
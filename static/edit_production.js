@@ -11,54 +11,61 @@ const state = {
     availableTags: {},
     studios: [],
     keyboardSelectedIndex: -1,
-    performerSearchKeyboardIndex: -1
+    performerSearchKeyboardIndex: -1,
+    savingProductionId: null // 自己正在儲存的作品（忽略自己送出的即時更新通知）
 };
 
 // 初始化
 document.addEventListener('DOMContentLoaded', async () => {
-    await loadStudios();
-    await loadFilterOptions();
+    await loadInitialData();
     generateStudioCheckboxes();
     setupEventListeners();
+    setupLiveUpdates();
 });
 
-// 載入公司清單
-async function loadStudios() {
-    try {
-        const response = await fetch('/api/studios');
-        state.studios = await response.json();
-
-        // 填充公司下拉選單
-        const select = document.getElementById('studioId');
-        state.studios.forEach(studio => {
-            const option = document.createElement('option');
-            option.value = studio.id;
-            option.textContent = studio.name;
-            select.appendChild(option);
-        });
-
-        // 填充演員公司下拉選單
-        const performerStudioSelect = document.getElementById('performerStudioId');
-        state.studios.forEach(studio => {
-            const option = document.createElement('option');
-            option.value = studio.id;
-            option.textContent = studio.name;
-            performerStudioSelect.appendChild(option);
-        });
-    } catch (error) {
-        console.error('載入公司清單失敗:', error);
-    }
+// 即時更新：正在編輯的作品被其他使用者修改時提示（不覆蓋表單中尚未儲存的內容）
+function setupLiveUpdates() {
+    subscribeChanges({
+        production: change => {
+            const current = state.currentProduction;
+            if (!current || current.id !== change.id || state.savingProductionId === change.id) return;
+            showFlashMessage(`此作品已被其他使用者修改（${change.fields.join(', ')}），請重新載入後再編輯`, 'warning', 10000);
+        }
+    });
 }
 
-// 載入篩選選項（用於標籤）
-async function loadFilterOptions() {
+// 以一次批次請求載入公司清單與標籤選項
+async function loadInitialData() {
     try {
-        const response = await fetch('/api/filter-options');
-        const data = await response.json();
-        state.availableTags = data.tags;
+        const [studios, filterOptions] = await fetchBatch(['/api/studios', '/api/filter-options']);
+        state.studios = studios;
+        state.availableTags = filterOptions.tags;
     } catch (error) {
-        console.error('載入標籤選項失敗:', error);
+        console.error('載入公司清單與標籤選項失敗:', error);
+        return;
     }
+    renderStudioOptions();
+}
+
+// 填充公司清單
+function renderStudioOptions() {
+    // 填充公司下拉選單
+    const select = document.getElementById('studioId');
+    state.studios.forEach(studio => {
+        const option = document.createElement('option');
+        option.value = studio.id;
+        option.textContent = studio.name;
+        select.appendChild(option);
+    });
+
+    // 填充演員公司下拉選單
+    const performerStudioSelect = document.getElementById('performerStudioId');
+    state.studios.forEach(studio => {
+        const option = document.createElement('option');
+        option.value = studio.id;
+        option.textContent = studio.name;
+        performerStudioSelect.appendChild(option);
+    });
 }
 
 // 生成公司複選框（預設不選，表示搜尋全部）
@@ -343,12 +350,49 @@ function hideProductionSuggestions() {
     state.keyboardSelectedIndex = -1;
 }
 
+// 渲染相似作品（點選後載入該作品）
+function renderSimilarProductions(similar) {
+    const section = document.getElementById('similarSection');
+    const list = document.getElementById('similarList');
+    list.innerHTML = '';
+    section.style.display = similar.length ? 'block' : 'none';
+
+    similar.forEach(prod => {
+        const li = document.createElement('li');
+        li.innerHTML = `
+            <span class="similar-code">${escapeHtml(prod.code)}</span>
+            ${escapeHtml(prod.title || '(無標題)')} | ${escapeHtml(prod.studio || '?')}
+            <span class="similar-score">${Math.round(prod.score * 100)}%</span>
+        `;
+        li.addEventListener('click', () => selectProduction(prod.id));
+        list.appendChild(li);
+    });
+}
+
+// 等待相似作品的回應後渲染（期間已切換到其他作品時略過）
+async function showSimilarProductions(productionId, request) {
+    let similar = [];
+    try {
+        const response = await request;
+        if (response.ok) {
+            similar = await response.json();
+        }
+    } catch (error) {
+        console.error('載入相似作品失敗:', error);
+    }
+    if (state.currentProduction && state.currentProduction.id === productionId) {
+        renderSimilarProductions(similar);
+    }
+}
+
 // 選擇作品
 async function selectProduction(productionId) {
     hideProductionSuggestions();
     document.getElementById('productionSearch').value = '';
 
     try {
+        // 相似作品另外請求：與作品資料同時送出，失敗時不影響編輯
+        const similarRequest = fetch(`/api/production/${productionId}/similar`);
         const response = await fetch(`/api/production/${productionId}`);
         const productionData = await response.json();
 
@@ -363,6 +407,7 @@ async function selectProduction(productionId) {
 
         // 填充表單
         populateForm(productionData);
+        showSimilarProductions(productionId, similarRequest);
 
         // 顯示編輯區域
         document.getElementById('editSection').style.display = 'block';
@@ -751,6 +796,7 @@ async function saveProduction() {
         delete_performers: state.performerToDelete
     };
 
+    state.savingProductionId = parseInt(productionId);
     try {
         const response = await fetch(`/api/production/${productionId}`, {
             method: 'PUT',
@@ -768,10 +814,12 @@ async function saveProduction() {
                 clearForm();
             }, 1000);
         } else {
+            state.savingProductionId = null;
             showFlashMessage('儲存失敗: ' + (result.error || '未知錯誤'), 'error');
         }
 
     } catch (error) {
+        state.savingProductionId = null;
         console.error('儲存失敗:', error);
         showFlashMessage('儲存失敗，請稱後再試', 'error');
     }
@@ -781,6 +829,7 @@ async function saveProduction() {
 function clearForm() {
     // 清空狀態
     state.currentProduction = null;
+    state.savingProductionId = null;
     state.performers = [];
     state.performerToDelete = [];
     state.tags = [];
@@ -18,4 +18,36 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }, 5000);
     }
-});
\ No newline at end of file
+});
+
+// 以 /api/batch 一次取得多個 GET API 的結果，回傳與 paths 順序相同的 body 陣列
+async function fetchBatch(paths) {
+    const params = new URLSearchParams();
+    paths.forEach(path => params.append('path', path));
+    
+    const response = await fetch(`/api/batch?${params.toString()}`);
+    const data = await response.json();
+    return data.results.map(result => {
+        if (result.status !== 200) {
+            throw new Error(`${result.path}: ${result.status}`);
+        }
+        return result.body;
+    });
+}
+
+// 即時更新：訂閱 /api/events（Server-Sent Events），handlers 依通知類型（production / actor / studio）
+// 收到 {kind, id, fields}；reset（可能遺漏了通知，包括斷線重連）不帶資料，頁面應重新查詢
+function subscribeChanges(handlers) {
+    if (!window.EventSource) return null;
+
+    const source = new EventSource('/api/events');
+    let opened = false;
+    Object.entries(handlers).forEach(([kind, handler]) => {
+        source.addEventListener(kind, event => handler(kind === 'reset' ? null : JSON.parse(event.data)));
+    });
+    source.addEventListener('open', () => {
+        if (opened && handlers.reset) handlers.reset(null);
+        opened = true;
+    });
+    return source;
+}
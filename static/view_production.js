@@ -16,6 +16,7 @@ const state = {
     },
     selectedActors: [], // { stage_name_id, stage_name, studio_name }
     expandedAlbums: new Set(), // 已展開的 album IDs
+    segments: new Map(), // album ID → 搜尋結果附帶的片段（include_segments）
     filterOptions: null, // 儲存所有可用的篩選選項（包含圖示和排序）
     keyboardSelectedIndex: -1, // 鍵盤選擇的建議索引
     sortFields: ['studio', 'code', 'title', 'date'], // 排序欄位
@@ -24,7 +25,8 @@ const state = {
         code: 'asc',
         title: 'asc',
         date: 'asc',
-        updated: 'desc'
+        updated: 'desc',
+        relevance: 'desc'
     }
 };
 
@@ -34,8 +36,57 @@ document.addEventListener('DOMContentLoaded', async () => {
     setupEventListeners();
     updateSortButtons();
     await performSearch();
+    setupLiveUpdates();
 });
 
+// 即時更新：其他使用者修改了本頁顯示的作品時，只重新取得受影響的列
+const pendingRowUpdates = new Set();
+const flushRowUpdates = debounce(refreshRows, 300);
+
+function setupLiveUpdates() {
+    subscribeChanges({
+        production: change => {
+            // 專輯的片段有增減：清除附帶的片段，已展開時重新載入
+            if (change.fields.includes('segments')) {
+                state.segments.delete(change.id);
+                if (state.expandedAlbums.has(change.id)) {
+                    renderSegments(change.id);
+                }
+            }
+            if (findResultRow(change.id)) {
+                pendingRowUpdates.add(change.id);
+                flushRowUpdates();
+            }
+        },
+        reset: () => performSearch()
+    });
+}
+
+function findResultRow(productionId) {
+    return document.querySelector(`#resultsBody .toggle-btn[data-id="${productionId}"]`)?.closest('tr');
+}
+
+async function refreshRows() {
+    const ids = [...pendingRowUpdates];
+    pendingRowUpdates.clear();
+    if (ids.length === 0) return;
+
+    try {
+        const params = new URLSearchParams({ ids: ids.join(','), per_page: ids.length });
+        const response = await fetch(`/api/search?${params.toString()}`);
+        const data = await response.json();
+        data.results.forEach(item => {
+            const row = findResultRow(item.id);
+            if (!row) return;
+            const updatedRow = createResultRow(item);
+            updatedRow.classList.add('live-updated');
+            row.replaceWith(updatedRow);
+        });
+    } catch (error) {
+        console.error('更新作品列失敗:', error);
+    }
+}
+
 // 載入篩選選項
 async function loadFilterOptions() {
     try {
@@ -375,7 +426,8 @@ function clearAllFilters() {
         code: 'asc',
         title: 'asc',
         date: 'asc',
-        updated: 'desc'
+        updated: 'desc',
+        relevance: 'desc'
     };
     
     // 重置排序按鈕狀態和文字
@@ -443,13 +495,23 @@ async function performSearch() {
         if (state.filters.date_to) {
             params.append('date_to', state.filters.date_to);
         }
+        params.append('facets', '1');
+        params.append('include_segments', '1');
         
         const response = await fetch(`/api/search?${params.toString()}`);
         const data = await response.json();
         
+        state.segments = new Map();
+        data.results.forEach(item => {
+            if (item.segments) {
+                state.segments.set(item.id, item.segments);
+            }
+        });
+        
         renderResults(data);
         renderPagination(data);
         updateResultCount(data.total);
+        renderFacetCounts(data.facets);
         
     } catch (error) {
         console.error('搜尋失敗:', error);
@@ -457,6 +519,27 @@ async function performSearch() {
     }
 }
 
+// 在每個篩選選項旁顯示目前條件下的作品數
+function renderFacetCounts(facets) {
+    if (!facets) return;
+    
+    document.querySelectorAll('input[type="checkbox"][data-filter]').forEach(input => {
+        const counts = facets[input.dataset.filter];
+        if (!counts) return;
+        
+        const label = input.closest('label');
+        let span = label.querySelector('.facet-count');
+        if (!span) {
+            span = document.createElement('span');
+            span.className = 'facet-count';
+            label.appendChild(span);
+        }
+        const count = counts[input.value] || 0;
+        span.textContent = `(${count})`;
+        label.classList.toggle('facet-empty', count === 0 && !input.checked);
+    });
+}
+
 // 顯示載入中
 function showLoading() {
     const tbody = document.getElementById('resultsBody');
@@ -572,8 +655,12 @@ async function toggleAlbum(albumId) {
 // 渲染片段
 async function renderSegments(albumId, tbody = null) {
     try {
-        const response = await fetch(`/api/segments/${albumId}`);
-        const segments = await response.json();
+        // 搜尋結果已附帶片段時不必另外請求
+        let segments = state.segments.get(albumId);
+        if (!segments) {
+            const response = await fetch(`/api/segments/${albumId}`);
+            segments = await response.json();
+        }
         
         if (!tbody) {
             tbody = document.getElementById('resultsBody');
@@ -712,7 +799,8 @@ function handleSortClick(field) {
         // 如果不是第一個，將其移到最前面，並重置為遞增
         state.sortFields = state.sortFields.filter(f => f !== field);
         state.sortFields.unshift(field);
-        state.sortOrders[field] = 'asc';
+        // 相關度由高到低才有意義
+        state.sortOrders[field] = field === 'relevance' ? 'desc' : 'asc';
     }
     
     // 更新所有排序按鈕的視覺狀態
@@ -0,0 +1,169 @@
+"""/api/batch and db.SharedConnection, run against in-memory fake connections"""
+
+import collections
+import datetime
+from unittest import mock
+
+import psycopg2.extensions
+import pytest
+
+import app as gvdb
+import db
+
+Column = collections.namedtuple('Column', 'name')
+
+UPDATED_AT = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+# (SQL fragment, columns, rows) - the first fragment found in the statement answers it
+RESULTS = [
+    ('FROM data_version', ['version', 'updated_at'], [(7, UPDATED_AT)]),
+    ('FROM studios ORDER BY name', ['id', 'name'], [(1, 'GD'), (2, 'KO')]),
+    ('FROM tags', ['id', 'category', 'name'], [(1, 'style', '純愛')]),
+    ('FROM stage_names sn', ['id', 'stage_name', 'actor_tag'], [(5, '翔', 'SHO')]),
+    ('FROM similar_productions', ['id', 'code', 'type', 'title', 'studio', 'release_date', 'score'],
+     [(2, 'GD-002', 'single', 'B', 'GD', '2020.01', 0.5)]),
+]
+
+
+class FakeCursor:
+    def __init__(self, conn, as_dicts):
+        self.conn = conn
+        self.as_dicts = as_dicts
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+        for fragment, columns, rows in RESULTS:
+            if fragment in sql:
+                self.description = [Column(name) for name in columns]
+                self.rows = [dict(zip(columns, row)) if self.as_dicts else row for row in rows]
+                return
+        raise AssertionError(f'unexpected SQL: {sql}')
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.closed = 0
+        self.rolled_back = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self, cursor_factory is not None)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.fixture
+def client():
+    gvdb.invalidate_reference_data()
+    gvdb.result_cache.invalidate()
+    return gvdb.app.test_client()
+
+
+def batch(client, *paths, **kwargs):
+    return client.get('/api/batch', query_string=[('path', path) for path in paths], **kwargs)
+
+
+def test_batch_runs_db_backed_routes_on_one_connection(client):
+    conn = FakeConnection()
+    with mock.patch.object(db, 'get_read_connection', return_value=conn) as get_read, \
+            mock.patch.object(db, 'get_connection') as get_primary:
+        response = batch(client, '/api/studios', '/api/filter-options',
+                         '/api/studio_actors/1', '/api/production/1/similar')
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['status'] for r in results] == [200, 200, 200, 200]
+    assert results[0]['body'] == [{'id': 1, 'name': 'GD'}, {'id': 2, 'name': 'KO'}]
+    assert results[1]['body']['studios'] == ['GD', 'KO']
+    assert results[2]['body'] == [{'id': 5, 'stage_name': '翔', 'actor_tag': 'SHO'}]
+    assert results[3]['body'][0]['code'] == 'GD-002'
+
+    # One pooled connection for the whole batch, returned exactly once
+    assert get_read.call_count == 1
+    get_primary.assert_not_called()
+    assert conn.closed == 1
+    # The batch request's own query statistics survive the sub-requests
+    assert 'Server-Timing' in response.headers
+
+
+def test_batch_uses_primary_after_a_write(client):
+    conn = FakeConnection()
+    client.set_cookie(gvdb.WROTE_AT_COOKIE, f'{gvdb.time.time():.3f}')
+    with mock.patch.object(db, 'get_connection', return_value=conn) as get_primary, \
+            mock.patch.object(db, 'get_read_connection') as get_read:
+        response = batch(client, '/api/studio_actors/1')
+
+    assert response.get_json()['results'][0]['status'] == 200
+    assert get_primary.call_count == 1
+    get_read.assert_not_called()
+
+
+def test_batch_rejects_streams_and_unlisted_routes(client):
+    with mock.patch.object(gvdb.change_feed, 'subscribe') as subscribe, \
+            mock.patch.object(db, 'get_read_connection') as get_read:
+        response = batch(client, '/api/events', '/api/batch?path=/api/studios', '/api/jobs/1',
+                         '/admin/jobs', '/api/no-such-route')
+
+    statuses = [r['status'] for r in response.get_json()['results']]
+    assert statuses == [400, 400, 400, 400, 404]
+    subscribe.assert_not_called()
+    get_read.assert_not_called()
+
+
+def test_batch_limits(client):
+    assert client.get('/api/batch').status_code == 400
+    paths = ['/api/studios'] * (gvdb.BATCH_MAX_REQUESTS + 1)
+    assert batch(client, *paths).status_code == 400
+
+
+def test_shared_connection_connects_lazily_and_releases_once():
+    conn = FakeConnection()
+    connect = mock.Mock(return_value=conn)
+    shared = db.SharedConnection(connect)
+    connect.assert_not_called()
+
+    shared.cursor().close()
+    shared.cursor().close()
+    shared.close()
+    assert connect.call_count == 1
+    assert conn.closed == 0
+
+    shared.release()
+    shared.release()
+    assert conn.closed == 1
+
+
+def test_shared_connection_rolls_back_failed_transaction_on_close():
+    conn = FakeConnection()
+    shared = db.SharedConnection(lambda: conn)
+    shared.cursor()
+    conn.status = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+    shared.close()
+    assert conn.rolled_back == 1
+
+
+def test_shared_connection_unused_is_not_opened():
+    connect = mock.Mock()
+    shared = db.SharedConnection(connect)
+    shared.close()
+    shared.release()
+    connect.assert_not_called()
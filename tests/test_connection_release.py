@@ -0,0 +1,113 @@
+"""處理函式提早返回或發生錯誤時，借出的連線仍在請求結束時歸還連線池"""
+
+from unittest import mock
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+import app as gvdb
+import db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.row = None
+
+    def execute(self, sql, params=None):
+        self.conn.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        if self.conn.fail:
+            self.conn.status = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+            raise psycopg2.errors.QueryCanceled('canceling statement due to statement timeout')
+        if 'SELECT type, studio_id' in sql:
+            self.row = {'type': 'single', 'studio_id': 1, 'parent_id': None, 'code': 'GD-001',
+                        'title': None, 'release_date': '2020.01', 'comment': None}
+        else:
+            self.row = None
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakePooledConnection:
+    """與 db.PooledConnection 相同的歸還規則：close() 交給連線池，重複 close() 不重複歸還"""
+
+    def __init__(self, pool, fail):
+        self.pool = pool
+        self.fail = fail
+        self.idle = False
+        self.lease = 0
+        self.closed = False
+        self.rolled_back = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rolled_back += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        if not self.idle:
+            self.pool.release(self)
+
+
+def make_pool(fail=False):
+    pool = db.ConnectionPool(0, 1, 0.1, name='test')
+    pool._connect = lambda: FakePooledConnection(pool, fail)
+    return pool
+
+
+@pytest.fixture
+def client():
+    with mock.patch.object(gvdb, 'result_cache', None):
+        yield gvdb.app.test_client()
+
+
+def use_pool(pool):
+    return mock.patch.multiple(db, get_connection=pool.get, get_read_connection=pool.get)
+
+
+def test_early_400_returns_connection(client):
+    pool = make_pool()
+    with use_pool(pool):
+        # 池只有一條連線：沒有歸還時第二次請求會等到 PoolTimeout
+        for _ in range(3):
+            response = client.put('/api/production/1', json={'code': 'GD-001', 'release_date': '2020-01'})
+            assert response.status_code == 400
+    assert pool.size == 1
+    conn = pool._idle[0]
+    assert conn.idle and conn.lease == 3
+    # 主庫連線留下的交易已回復，不會 idle in transaction
+    assert conn.rolled_back == 3 and conn.status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_query_actors_error_returns_connection(client):
+    pool = make_pool(fail=True)
+    with use_pool(pool), mock.patch.object(gvdb.logger, 'exception') as log:
+        for _ in range(2):
+            response = client.get('/api/actors/query')
+            assert response.status_code == 500
+    assert log.call_count == 2
+    assert len(pool._idle) == 1 and pool._idle[0].idle
+
+
+def test_released_connection_reused_by_another_request_is_not_closed():
+    pool = make_pool()
+    with use_pool(pool), gvdb.app.test_request_context('/api/actors/query'):
+        conn = gvdb.get_db_connection()
+        conn.close()
+        # 同一條連線被其他地方借走後，本請求結束時不可再歸還
+        again = pool.get()
+        assert again is conn and not again.idle
+        gvdb.release_db_connections(None)
+        assert not again.idle
+        again.close()
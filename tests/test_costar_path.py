@@ -0,0 +1,35 @@
+"""find_costar_path：雙向廣度優先搜尋的最短路徑與每層查詢次數"""
+
+from queries import find_costar_path
+
+# 1-2-3-4-5 一條鏈，另有 1-6-5 的捷徑與孤立的 9
+EDGES = {(1, 2), (2, 3), (3, 4), (4, 5), (1, 6), (6, 5), (7, 8)}
+
+
+def make_neighbors(edges):
+    calls = []
+
+    def neighbors(ids):
+        calls.append(sorted(ids))
+        return [(a, b) for a, b in sorted(edges | {(b, a) for a, b in edges}) if a in ids]
+    return neighbors, calls
+
+
+def test_shortest_path():
+    neighbors, _ = make_neighbors(EDGES)
+    assert find_costar_path(neighbors, 1, 5, 6) == [1, 6, 5]
+    assert find_costar_path(neighbors, 2, 4, 6) == [2, 3, 4]
+    assert find_costar_path(neighbors, 3, 3, 6) == [3]
+
+
+def test_one_query_per_level():
+    neighbors, calls = make_neighbors(EDGES)
+    assert find_costar_path(neighbors, 2, 4, 6) == [2, 3, 4]
+    assert len(calls) == 2
+
+
+def test_unreachable_and_depth_limit():
+    neighbors, _ = make_neighbors(EDGES)
+    assert find_costar_path(neighbors, 1, 8, 6) is None
+    assert find_costar_path(neighbors, 2, 5, 1) is None
+    assert find_costar_path(neighbors, 2, 5, 3) in ([2, 3, 4, 5], [2, 1, 6, 5])
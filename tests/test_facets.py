@@ -0,0 +1,28 @@
+"""build_facets：facet_query 的 GROUPING SETS 結果整理為各組計數"""
+
+from queries import build_facets, facet_query, TAG_FACETS
+
+
+def test_groups_and_ordering():
+    rows = [
+        ('B', None, None, None, 0, 1, 3),
+        ('A', None, None, None, 0, 1, 3),
+        (None, None, None, None, 0, 1, 2),     # 沒有公司的作品不列入
+        (None, 'single', None, None, 1, 0, 5),
+        (None, 'album', None, None, 1, 0, 1),
+        (None, None, 'styles', 'BDSM', 1, 1, 2),
+        (None, None, 'styles', '熟', 1, 1, 4),
+        (None, None, None, None, 1, 1, 6),     # 沒有標籤的作品
+    ]
+    facets = build_facets(rows)
+    assert list(facets['studios'].items()) == [('A', 3), ('B', 3)]
+    assert list(facets['types'].items()) == [('single', 5), ('album', 1)]
+    assert list(facets['styles'].items()) == [('熟', 4), ('BDSM', 2)]
+    assert set(facets) == {'studios', 'types', *TAG_FACETS}
+    assert facets['sex_acts'] == {}
+
+
+def test_facet_query_drops_order_by():
+    sql = facet_query('SELECT * FROM production_search_view WHERE 1=1 ORDER BY studio, code')
+    assert 'ORDER BY' not in sql
+    assert 'GROUPING SETS' in sql
@@ -0,0 +1,24 @@
+"""parse_release_month：日期篩選值轉為 release_month（與 migrations/0011 的 release_month_of() 一致）"""
+
+import datetime
+
+from queries import parse_release_month
+
+
+def test_year_month():
+    assert parse_release_month('2024.05') == datetime.date(2024, 5, 1)
+    assert parse_release_month(' 2024.12 ', end=True) == datetime.date(2024, 12, 1)
+
+
+def test_unknown_month_is_january():
+    assert parse_release_month('2024.00') == datetime.date(2024, 1, 1)
+
+
+def test_year_only():
+    assert parse_release_month('2024') == datetime.date(2024, 1, 1)
+    assert parse_release_month('2024', end=True) == datetime.date(2024, 12, 1)
+
+
+def test_invalid_values_are_ignored():
+    for value in ['', None, '2024.13', '2024-05', '0999', '24.05', '2024.5', 'abcd']:
+        assert parse_release_month(value) is None, value
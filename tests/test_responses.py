@@ -0,0 +1,70 @@
+"""responses.py：orjson 序列化與壓縮在 Flask (app.py) 與 Quart (async_app.py) 上的行為"""
+
+import asyncio
+import gzip
+import json
+
+import pytest
+
+import app as flask_module
+import async_app
+from config import COMPRESS_MIN_SIZE
+
+ROWS = [{'id': i, 'title': f'作品標題 {i}', 'code': f'GD-{i:04d}'} for i in range(200)]
+
+
+@flask_module.app.route('/_test/rows')
+def flask_rows():
+    return flask_module.jsonify(ROWS)
+
+
+@async_app.app.route('/_test/rows')
+async def quart_rows():
+    return async_app.jsonify(ROWS)
+
+
+@async_app.app.route('/_test/small')
+async def quart_small():
+    return async_app.jsonify({'ok': True})
+
+
+def quart_get(path, headers):
+    async def run():
+        client = async_app.app.test_client()
+        response = await client.get(path, headers=headers)
+        return response, await response.get_data()
+    return asyncio.run(run())
+
+
+def test_flask_gzip_and_utf8():
+    response = flask_module.app.test_client().get('/_test/rows', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = gzip.decompress(response.get_data())
+    assert '作品標題'.encode('utf-8') in body
+    assert json.loads(body) == ROWS
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_quart_compresses_with_orjson(encoding):
+    response, data = quart_get('/_test/rows', {'Accept-Encoding': encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    if encoding == 'gzip':
+        body = gzip.decompress(data)
+    else:
+        body = pytest.importorskip('brotli').decompress(data)
+    # orjson 輸出 UTF-8，不轉義中日文字，鍵依原順序
+    assert '作品標題'.encode('utf-8') in body
+    assert body.startswith(b'[{"id":0,"title"')
+    assert json.loads(body) == ROWS
+
+
+def test_quart_skips_small_and_unaccepted():
+    response, data = quart_get('/_test/small', {'Accept-Encoding': 'gzip'})
+    assert len(data) < COMPRESS_MIN_SIZE
+    assert 'Content-Encoding' not in response.headers
+
+    response, data = quart_get('/_test/rows', {})
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(data) == ROWS
@@ -0,0 +1,103 @@
+"""結果快取：ResultCache 的版本 / TTL / 世代檢查，以及 search_cache_key 涵蓋所有影響回應的參數"""
+
+from unittest import mock
+
+from werkzeug.datastructures import MultiDict
+
+import queries
+from queries import search_cache_key, actor_cache_key
+from result_cache import ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(versions, clock, max_entries=10, ttl=60, version_interval=5):
+    versions = iter(versions)
+    with mock.patch('result_cache.time.monotonic', clock):
+        cache = ResultCache(max_entries, ttl, version_interval, lambda: next(versions))
+    return cache
+
+
+def test_hit_ttl_and_version_change():
+    clock = Clock()
+    cache = make_cache([1, 1, 1, 2], clock)
+    with mock.patch('result_cache.time.monotonic', clock):
+        assert cache.get('/api/search', 'k') is None
+        cache.put('/api/search', 'k', b'[]', 'application/json', cache.generation)
+        assert cache.get('/api/search', 'k') == (b'[]', 'application/json')
+
+        # 版本未變：超過 TTL 才過期
+        clock.now += 10
+        assert cache.get('/api/search', 'k') == (b'[]', 'application/json')
+        clock.now += 60
+        assert cache.get('/api/search', 'k') is None
+
+        # 版本改變時清空
+        cache.put('/api/search', 'k', b'[]', 'application/json', cache.generation)
+        clock.now += 10
+        assert cache.get('/api/search', 'k') is None
+
+
+def test_put_skipped_after_invalidate():
+    clock = Clock()
+    cache = make_cache([1, 1], clock)
+    with mock.patch('result_cache.time.monotonic', clock):
+        cache.get('/api/search', 'k')
+        generation = cache.generation
+        cache.invalidate()
+        # 查詢期間發生寫入：結果可能是寫入前的資料，不寫入快取
+        cache.put('/api/search', 'k', b'old', 'application/json', generation)
+        assert cache.get('/api/search', 'k') is None
+
+
+def test_lru_eviction():
+    clock = Clock()
+    cache = make_cache([1], clock, max_entries=2)
+    with mock.patch('result_cache.time.monotonic', clock):
+        for key in 'abc':
+            cache.get('/api/search', key)
+            cache.put('/api/search', key, key.encode(), 'application/json', cache.generation)
+        assert cache.get('/api/search', 'a') is None
+        assert cache.get('/api/search', 'c') == (b'c', 'application/json')
+
+
+def test_search_key_normalizes_equivalent_args():
+    assert search_cache_key(MultiDict({'studios': 'B,A', 'page': '1'})) == \
+        search_cache_key(MultiDict({'studios': 'A,B,A'}))
+    assert search_cache_key(MultiDict({'sort': ''})) == \
+        search_cache_key(MultiDict({'sort': queries.DEFAULT_SEARCH_SORT}))
+
+
+def test_search_key_includes_db_json_variant():
+    with mock.patch.object(queries, 'DB_JSON_RESPONSES', True):
+        assert search_cache_key(MultiDict()) == search_cache_key(MultiDict({'db_json': '1'}))
+        assert search_cache_key(MultiDict()) != search_cache_key(MultiDict({'db_json': '0'}))
+        # facets / include_segments 一律走 Python 路徑，db_json 不影響結果
+        assert search_cache_key(MultiDict({'facets': '1'})) == \
+            search_cache_key(MultiDict({'facets': '1', 'db_json': '0'}))
+    with mock.patch.object(queries, 'DB_JSON_RESPONSES', False):
+        assert search_cache_key(MultiDict()) == search_cache_key(MultiDict({'db_json': '0'}))
+
+
+def test_search_key_covers_result_shaping_params():
+    base = search_cache_key(MultiDict())
+    for name, value in [('ids', '5'), ('keyword', 'GD'), ('date_from', '2020'), ('date_to', '2021'),
+                        ('sort', 'date_desc'), ('page', '2'), ('per_page', '50'),
+                        ('facets', '1'), ('include_segments', '1')] + \
+                       [(name, 'x') for name in queries.SEARCH_LIST_PARAMS]:
+        assert search_cache_key(MultiDict({name: value})) != base, name
+
+
+def test_actor_key_defaults():
+    assert actor_cache_key(MultiDict()) == actor_cache_key(
+        MultiDict({'sort': 'bogus', 'per_page': '500'}))
+    # 只有依名稱排序時方向才有作用
+    assert actor_cache_key(MultiDict({'sort': 'count', 'sort_order': 'desc'})) == \
+        actor_cache_key(MultiDict({'sort': 'count'}))
+    assert actor_cache_key(MultiDict({'sort': 'name', 'sort_order': 'desc'})) != actor_cache_key(MultiDict())
@@ -0,0 +1,122 @@
+"""Query-side keyword tokenizer (queries.search_terms) against search_tokens() in migrations/0008"""
+
+import os
+import re
+
+import pytest
+
+import queries
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'migrations', '0008_search_terms.sql')
+
+SAMPLES = [
+    'GD-002',
+    '[COCODV488][COAT1804]',
+    '誘惑的夜晚',
+    'Love Story 純愛 2024',
+    'ボーイズ・ラブ',
+    'ＧＤ全形 abc123def',
+    '誘惑 GD-00',
+]
+
+
+def sql_token_pattern():
+    with open(MIGRATION, encoding='utf-8') as f:
+        sql = f.read()
+    match = re.search(r"regexp_matches\(lower\(COALESCE\(content, ''\)\),\s*'([^']+)', 'g'\)", sql)
+    assert match, 'search_tokens() regex not found in 0008'
+    return match.group(1)
+
+
+def sql_search_tokens(content):
+    """search_tokens() as written in 0008: runs starting with [a-z0-9] whole, other runs as bigrams"""
+    tokens = []
+    for run in re.findall(sql_token_pattern(), content.lower()):
+        if re.match(r'^[a-z0-9]', run):
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def test_token_patterns_match():
+    assert sql_token_pattern() == queries.SEARCH_TOKEN_PATTERN.pattern
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_query_terms_match_indexed_tokens(text):
+    assert queries.search_terms(text) == sorted(set(sql_search_tokens(text)))
+
+
+def test_search_terms():
+    assert queries.search_terms('GD-002 誘惑的') == ['002', 'gd', '惑的', '誘惑']
+    assert queries.search_terms('誘') is None
+    assert queries.search_terms('誘 惑的') is None
+    assert queries.search_terms('---') is None
+
+
+@pytest.mark.skipif(not os.environ.get('GVDB_TEST_DSN'), reason='GVDB_TEST_DSN not set')
+@pytest.mark.parametrize('text', SAMPLES)
+def test_query_terms_match_database(text):
+    psycopg2 = pytest.importorskip('psycopg2')
+    with psycopg2.connect(os.environ['GVDB_TEST_DSN']) as conn, conn.cursor() as cur:
+        cur.execute("SELECT search_tokens(%s)", (text,))
+        assert queries.search_terms(text) == sorted(set(cur.fetchone()[0]))
+
+
+ACTUAL_STATS_SQL = """
+    SELECT COUNT(*), COALESCE(SUM(doc_length), 0)
+    FROM (SELECT DISTINCT production_id, doc_length FROM search_terms) d
+"""
+
+
+@pytest.mark.skipif(not os.environ.get('GVDB_TEST_DSN'), reason='GVDB_TEST_DSN not set')
+def test_search_stats_deltas_match_index():
+    psycopg2 = pytest.importorskip('psycopg2')
+    conn = psycopg2.connect(os.environ['GVDB_TEST_DSN'])
+    try:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO productions (code, type, title) VALUES ('ZZ-TEST-1', 'single', '統計の確認')")
+            cur.execute("UPDATE productions SET comment = 'delta check' WHERE code = 'ZZ-TEST-1'")
+            # 寫入只新增差額列，不更新 search_stats
+            cur.execute("SELECT COUNT(*) FROM search_stats_deltas")
+            assert cur.fetchone()[0] >= 3
+            cur.execute(ACTUAL_STATS_SQL)
+            actual = cur.fetchone()
+            cur.execute("SELECT documents, total_length FROM search_stats_current")
+            assert cur.fetchone() == actual
+
+            cur.execute("SELECT compact_search_stats()")
+            cur.execute("SELECT COUNT(*) FROM search_stats_deltas")
+            assert cur.fetchone()[0] == 0
+            cur.execute("SELECT documents, total_length FROM search_stats")
+            assert cur.fetchone() == actual
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def test_partial_codes_are_matched_as_substrings():
+    query, params, _, _ = queries.build_search_query({'keyword': 'GD-00'})
+    assert 'search_terms' not in query
+    assert params == ['%GD-00%'] * 3
+
+    query, params, _, _ = queries.build_search_query({'keyword': '誘惑 DV48', 'sort': 'relevance'})
+    assert 'k.production_id IS NOT NULL' in query
+    assert params == [['48', 'dv', '誘惑'], ['誘惑'], 1] + ['%DV48%'] * 3
+    assert query.endswith('ORDER BY relevance DESC')
+
+
+def test_other_scripts_are_not_dropped():
+    # 韓文不在索引中：不可只以「日本」的 bigram 篩選，另需 ILIKE 比對
+    query, params, _, _ = queries.build_search_query({'keyword': '日本 한국어'})
+    assert 'k.production_id IS NOT NULL' in query
+    assert params == [['日本'], ['日本'], 1] + ['%한국어%'] * 3
+
+    assert queries.keyword_chunks('日本 한국어 GD-00 ★映画') == ['한국어', 'GD-00', '★']
+
+
+def test_relevance_sort_ignored_without_index():
+    query, _, _, _ = queries.build_search_query({'keyword': '誘', 'sort': 'relevance'})
+    assert 'relevance' not in query
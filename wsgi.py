@@ -0,0 +1,12 @@
+"""
+GVDB 正式環境 WSGI 入口
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+設定由環境變數（或 .env）讀取，見 config.py 與 gunicorn.conf.py。
+"""
+
+from app import app
+
+# 正式環境一律關閉除錯模式，不受 GVDB_DEBUG（開發用，預設開啟）影響
+app.debug = False